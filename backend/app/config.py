@@ -7,14 +7,172 @@ from dotenv import load_dotenv
 # Carrega variáveis de ambiente
 load_dotenv()
 
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Lê uma variável de ambiente booleana ("1", "true", "yes", "on")"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Settings:
     """Configurações da aplicação"""
     
     # API Keys
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY", "")
     
+    # Orçamento de tokens do email nos prompts de classificação (0 = sem limite)
+    PROMPT_MAX_TOKENS: int = int(os.getenv("PROMPT_MAX_TOKENS", "8000"))
+    # Quantas vezes o orçamento do prompt é extraído de uploads (PDF, .txt,
+    # .eml) quando a análise detalhada não é pedida: a folga permite que o
+    # pré-processamento descarte boilerplate e faça o corte head+tail sobre o
+    # documento, e não sobre o início dele (0 = extrai o documento inteiro)
+    EXTRACTION_BUDGET_FACTOR: float = float(os.getenv("EXTRACTION_BUDGET_FACTOR", "4"))
+    
+    # Pré-processamento do email: remove histórico citado, assinaturas e avisos
+    # legais antes de aplicar o orçamento acima (corte head+tail)
+    EMAIL_PREPROCESSING_ENABLED: bool = _env_bool("EMAIL_PREPROCESSING_ENABLED", True)
+    
+    # Backend de classificação: "gemini" ou "fake" (offline, para testes de carga)
+    CLASSIFIER_BACKEND: str = os.getenv("CLASSIFIER_BACKEND", "gemini")
+    FAKE_BACKEND_LATENCY_MEDIAN_MS: float = float(os.getenv("FAKE_BACKEND_LATENCY_MEDIAN_MS", "200"))
+    FAKE_BACKEND_LATENCY_SIGMA: float = float(os.getenv("FAKE_BACKEND_LATENCY_SIGMA", "0.5"))
+    FAKE_BACKEND_ERROR_RATE: float = float(os.getenv("FAKE_BACKEND_ERROR_RATE", "0.0"))
+    FAKE_BACKEND_OUTPUTS_PATH: str = os.getenv("FAKE_BACKEND_OUTPUTS_PATH", "")
+    FAKE_BACKEND_SEED: int = int(os.getenv("FAKE_BACKEND_SEED", "42"))
+    
     # Gemini Model
     GEMINI_MODEL: str = "gemini-1.5-flash"
+    # Obtém categoria, prioridade, análise e resposta em uma única chamada JSON
+    GEMINI_STRUCTURED_OUTPUT: bool = _env_bool("GEMINI_STRUCTURED_OUTPUT", True)
+    # Usa o client assíncrono do SDK em vez de threads do executor padrão
+    GEMINI_ASYNC_ENABLED: bool = _env_bool("GEMINI_ASYNC_ENABLED", True)
+    # Limite de chamadas simultâneas ao Gemini no caminho assíncrono. O limite
+    # efetivo é adaptativo (AIMD) entre o mínimo e este máximo
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "256"))
+    GEMINI_AIMD_INITIAL_CONCURRENCY: int = int(os.getenv("GEMINI_AIMD_INITIAL_CONCURRENCY", "32"))
+    GEMINI_AIMD_MIN_CONCURRENCY: int = int(os.getenv("GEMINI_AIMD_MIN_CONCURRENCY", "1"))
+    # Cotas do projeto por minuto (0 = sem limite no cliente)
+    GEMINI_RPM_LIMIT: float = float(os.getenv("GEMINI_RPM_LIMIT", "1000"))
+    GEMINI_TPM_LIMIT: float = float(os.getenv("GEMINI_TPM_LIMIT", "1000000"))
+    # Tokens de saída assumidos por chamada ao reservar a cota de tokens
+    GEMINI_EXPECTED_OUTPUT_TOKENS: int = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "256"))
+    # Retentativas de erros transitórios (429, 5xx) com backoff exponencial e jitter
+    GEMINI_MAX_RETRIES: int = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+    GEMINI_RETRY_BASE_SECONDS: float = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "0.5"))
+    GEMINI_RETRY_MAX_SECONDS: float = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "30"))
+    # Timeout de cada chamada individual ao Gemini (cada tentativa)
+    GEMINI_CALL_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_CALL_TIMEOUT_SECONDS", "20"))
+    # Hedging: sem resposta até o percentil da latência recente, envia uma
+    # cópia da classificação e usa a primeira que responder
+    GEMINI_HEDGE_ENABLED: bool = _env_bool("GEMINI_HEDGE_ENABLED", False)
+    GEMINI_HEDGE_PERCENTILE: float = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+    GEMINI_HEDGE_MIN_SAMPLES: int = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+    GEMINI_HEDGE_MIN_DELAY_MS: float = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_MS", "250"))
+    GEMINI_HEDGE_MAX_PER_MINUTE: float = float(os.getenv("GEMINI_HEDGE_MAX_PER_MINUTE", "60"))
+    # Timeout de cada etapa paralela (análise detalhada / resposta). No caminho
+    # síncrono a resposta sai no prazo, mas a thread só termina no timeout HTTP
+    # da chamada em andamento (GEMINI_CALL_TIMEOUT_SECONDS), sem novas tentativas
+    GEMINI_BRANCH_TIMEOUT_SECONDS: float = float(os.getenv("GEMINI_BRANCH_TIMEOUT_SECONDS", "30"))
+    GEMINI_BRANCH_WORKERS: int = int(os.getenv("GEMINI_BRANCH_WORKERS", "8"))
+    
+    # Micro-lotes: agrupa classificações simples simultâneas em um único prompt
+    GEMINI_MICROBATCH_ENABLED: bool = _env_bool("GEMINI_MICROBATCH_ENABLED", False)
+    GEMINI_MICROBATCH_WINDOW_MS: float = float(os.getenv("GEMINI_MICROBATCH_WINDOW_MS", "20"))
+    GEMINI_MICROBATCH_MAX_ITEMS: int = int(os.getenv("GEMINI_MICROBATCH_MAX_ITEMS", "20"))
+    GEMINI_MICROBATCH_MAX_TOKENS: int = int(os.getenv("GEMINI_MICROBATCH_MAX_TOKENS", "8000"))
+    
+    # Cache de resultados da classificação
+    RESULT_CACHE_ENABLED: bool = _env_bool("RESULT_CACHE_ENABLED", True)
+    RESULT_CACHE_MAX_SIZE: int = int(os.getenv("RESULT_CACHE_MAX_SIZE", "1024"))
+    RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+    # Segundo nível em disco (SQLite), compartilhado pelos workers e mantido entre reinícios
+    RESULT_CACHE_DISK_ENABLED: bool = _env_bool("RESULT_CACHE_DISK_ENABLED", True)
+    RESULT_CACHE_DISK_PATH: str = os.getenv("RESULT_CACHE_DISK_PATH", "autou_result_cache.sqlite3")
+    RESULT_CACHE_DISK_MAX_MB: int = int(os.getenv("RESULT_CACHE_DISK_MAX_MB", "256"))
+    RESULT_CACHE_DISK_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_DISK_TTL_SECONDS", str(7 * 24 * 3600)))
+    
+    # Classificador local (primeiro estágio da cascata)
+    LOCAL_CLASSIFIER_ENABLED: bool = _env_bool("LOCAL_CLASSIFIER_ENABLED", False)
+    # Confiança mínima para responder sem chamar o Gemini
+    LOCAL_CLASSIFIER_THRESHOLD: float = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+    # Pesos treinados offline (JSON); vazio usa app/data/local_classifier_model.json,
+    # gerado por train_local_classifier.py a partir do conjunto semente
+    LOCAL_CLASSIFIER_MODEL_PATH: str = os.getenv("LOCAL_CLASSIFIER_MODEL_PATH", "")
+    
+    # Circuit breaker do backend de classificação: aberto, as requisições são
+    # atendidas pelo classificador local e marcadas como 'degraded'
+    CIRCUIT_BREAKER_ENABLED: bool = _env_bool("CIRCUIT_BREAKER_ENABLED", True)
+    CIRCUIT_BREAKER_FAILURE_RATE: float = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", "0.5"))
+    CIRCUIT_BREAKER_SLOW_CALL_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "10"))
+    CIRCUIT_BREAKER_SLOW_CALL_RATE: float = float(os.getenv("CIRCUIT_BREAKER_SLOW_CALL_RATE", "0.5"))
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = int(os.getenv("CIRCUIT_BREAKER_WINDOW_SIZE", "50"))
+    CIRCUIT_BREAKER_MIN_CALLS: int = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "10"))
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "3"))
+    # Tempo máximo de uma classificação pelo backend (com retentativas) antes do fallback.
+    # Libera a requisição, mas não interrompe a thread do executor no caminho síncrono
+    CIRCUIT_BREAKER_CALL_TIMEOUT_SECONDS: float = float(os.getenv("CIRCUIT_BREAKER_CALL_TIMEOUT_SECONDS", "45"))
+    
+    # Requisições idênticas simultâneas compartilham uma única classificação
+    SINGLE_FLIGHT_ENABLED: bool = _env_bool("SINGLE_FLIGHT_ENABLED", True)
+    
+    # Limites de upload: por arquivo e por corpo de requisição (0 = sem limite)
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+    MAX_REQUEST_BYTES: int = int(os.getenv("MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+    # PDFs acima deste tamanho são copiados para disco e mapeados em memória
+    UPLOAD_SPOOL_THRESHOLD_BYTES: int = int(os.getenv("UPLOAD_SPOOL_THRESHOLD_BYTES", str(4 * 1024 * 1024)))
+    
+    # Cache do texto extraído de PDFs (por hash do documento); o nível em
+    # disco só é usado se PDF_TEXT_CACHE_DISK_PATH for definido
+    PDF_TEXT_CACHE_ENABLED: bool = _env_bool("PDF_TEXT_CACHE_ENABLED", True)
+    PDF_TEXT_CACHE_MAX_ITEMS: int = int(os.getenv("PDF_TEXT_CACHE_MAX_ITEMS", "256"))
+    PDF_TEXT_CACHE_TTL_SECONDS: float = float(os.getenv("PDF_TEXT_CACHE_TTL_SECONDS", str(24 * 3600)))
+    PDF_TEXT_CACHE_DISK_PATH: str = os.getenv("PDF_TEXT_CACHE_DISK_PATH", "")
+    PDF_TEXT_CACHE_DISK_MAX_MB: int = int(os.getenv("PDF_TEXT_CACHE_DISK_MAX_MB", "512"))
+    
+    # Anexos PDF de arquivos .eml acima deste tamanho são ignorados (0 = sem limite)
+    EML_MAX_ATTACHMENT_BYTES: int = int(os.getenv("EML_MAX_ATTACHMENT_BYTES", str(10 * 1024 * 1024)))
+    
+    # Ordem de tentativa das bibliotecas de PDF (mais rápida primeiro)
+    PDF_LIBRARY_ORDER: str = os.getenv("PDF_LIBRARY_ORDER", "PyMuPDF,PyPDF2,pdfplumber")
+    
+    # Extração de PDF em pool de processos dedicado
+    PDF_POOL_ENABLED: bool = _env_bool("PDF_POOL_ENABLED", True)
+    PDF_POOL_WORKERS: int = int(os.getenv("PDF_POOL_WORKERS", "2"))
+    PDF_EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("PDF_EXTRACTION_TIMEOUT_SECONDS", "30"))
+    # Limite de memória por worker (0 = sem limite)
+    PDF_WORKER_MEMORY_LIMIT_MB: int = int(os.getenv("PDF_WORKER_MEMORY_LIMIT_MB", "1024"))
+    # PDFs completos com pelo menos este número de páginas são extraídos em
+    # paralelo por intervalos de páginas (0 = desativado)
+    PDF_PARALLEL_MIN_PAGES: int = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+    
+    # Classificação em lote
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+    
+    # Jobs assíncronos (POST /api/jobs): banco SQLite, workers e webhook
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", "autou_jobs.sqlite3")
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "4"))
+    # Execuções máximas de um job interrompido por reinícios
+    JOBS_MAX_ATTEMPTS: int = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+    # Validade do lease de um job em execução (renovado a cada 1/3 do prazo);
+    # vencido, outro worker ou processo o devolve à fila
+    JOBS_LEASE_SECONDS: float = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+    JOBS_RETENTION_HOURS: float = float(os.getenv("JOBS_RETENTION_HOURS", "72"))
+    JOBS_CALLBACK_TIMEOUT_SECONDS: float = float(os.getenv("JOBS_CALLBACK_TIMEOUT_SECONDS", "10"))
+    JOBS_CALLBACK_MAX_ATTEMPTS: int = int(os.getenv("JOBS_CALLBACK_MAX_ATTEMPTS", "3"))
+    # Hosts aceitos em callback_url, separados por vírgula ('.exemplo.com'
+    # inclui subdomínios). Vazio: qualquer host que resolva só para IPs públicos
+    JOBS_CALLBACK_ALLOWED_HOSTS: list = [
+        host.strip() for host in os.getenv("JOBS_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()
+    ]
+    
+    # Endpoint /metrics (formato Prometheus) e métricas por requisição
+    METRICS_ENABLED: bool = _env_bool("METRICS_ENABLED", True)
+    # Cabeçalho Server-Timing com o tempo de cada etapa em /api/classify
+    SERVER_TIMING_ENABLED: bool = _env_bool("SERVER_TIMING_ENABLED", True)
     
     # CORS Settings
     CORS_ORIGINS: list = ["https://classificador-de-emails-seven.vercel.app",
@@ -1,7 +1,9 @@
 """
 Aplicação principal FastAPI - Classificador de Emails AutoU
 """
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
@@ -9,8 +11,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from app.config import settings
+from app.middleware import MetricsMiddleware, RequestSizeLimitMiddleware
 from app.routes.email_routes import router as email_router
 from app.routes.health_routes import router as health_router
+from app.routes.job_routes import router as job_router
+from app.routes.metrics_routes import router as metrics_router
+from app.services.job_queue import job_queue
+from app.services.local_classifier import local_classifier
+from app.utils.pdf_pool import pdf_pool
 
 # Configurar logger
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +43,23 @@ def normalize_origins(origins: List[str]) -> List[str]:
             cleaned.append(o)
     return cleaned
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicialização e encerramento dos recursos da aplicação
+    """
+    if settings.LOCAL_CLASSIFIER_ENABLED:
+        # Carrega o classificador local antes da primeira requisição
+        await asyncio.to_thread(local_classifier.predict, "")
+    if settings.PDF_POOL_ENABLED:
+        await pdf_pool.start()
+    # Retoma jobs que ficaram na fila ou em execução antes do reinício
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    pdf_pool.shutdown()
+
+
 def create_app() -> FastAPI:
     """
     Factory function para criar a aplicação FastAPI
@@ -42,7 +67,8 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.APP_TITLE,
         version=settings.APP_VERSION,
-        description="API para classificação automática de emails usando Gemini AI"
+        description="API para classificação automática de emails usando Gemini AI",
+        lifespan=lifespan
     )
 
     # Normaliza as origens do settings e adiciona origens de dev úteis
@@ -62,6 +88,16 @@ def create_app() -> FastAPI:
 
     logger.info("CORS will allow origins: %s", cors_allow)
 
+    # O último middleware adicionado é o mais externo. O CORS fica por fora
+    # de todos, para que os 413 do limite de tamanho e os erros medidos pelas
+    # métricas também levem os cabeçalhos CORS (senão o navegador esconde o erro)
+
+    # Rejeita corpos grandes demais antes de o multipart ser processado
+    app.add_middleware(RequestSizeLimitMiddleware, max_bytes=settings.MAX_REQUEST_BYTES)
+    if settings.METRICS_ENABLED:
+        # Por fora do limite de tamanho: os 413 também são contados
+        app.add_middleware(MetricsMiddleware)
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=cors_allow,
@@ -73,6 +109,9 @@ def create_app() -> FastAPI:
     # Registrar rotas existentes
     app.include_router(health_router)
     app.include_router(email_router)
+    app.include_router(job_router)
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics_router)
 
     # Endpoint de teste leve para isolar CORS / 502 (NÃO utilizar em produção permanente)
     @app.post("/classify_test")
@@ -1,21 +1,43 @@
 """
 Rotas para classificação de emails
 """
-from typing import Optional
+import math
+from typing import List, Optional
 from fastapi import APIRouter, Form, File, UploadFile
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 
+from app.config import settings
 from app.services.email_service import email_service
+from app.services.rate_limiter import RateLimitedError
+from app.utils.responses import build_classification_response
+from app.utils.tracing import span, start_trace
 
 router = APIRouter(prefix="/api", tags=["email"])
 
 
+class BatchClassifyRequest(BaseModel):
+    """Corpo JSON da classificação em lote"""
+    emails: List[str]
+    gen_reply: bool = False
+    detailed_analysis: bool = False
+
+
+def rate_limited_response(error: RateLimitedError) -> JSONResponse:
+    """Resposta 429 (com Retry-After quando conhecido) para cota do Gemini esgotada"""
+    headers = {}
+    if error.retry_after is not None:
+        headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return JSONResponse(status_code=429, content={"error": str(error)}, headers=headers)
+
+
 @router.post("/classify")
 async def classify_email(
     text: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
     gen_reply: Optional[bool] = Form(False),
-    detailed_analysis: Optional[bool] = Form(False)
+    detailed_analysis: Optional[bool] = Form(False),
+    debug: Optional[str] = Form(None)
 ):
     """
     Classifica um email como Produtivo ou Improdutivo
@@ -24,57 +46,123 @@ async def classify_email(
         text: Texto do email (opcional)
         file: Arquivo com o email (.txt ou .pdf) (opcional)
         gen_reply: Se deve gerar uma resposta automática
+        debug: 'timing' inclui no JSON o detalhamento de tempos por etapa
         
     Returns:
-        JSONResponse: Resultado da classificação
+        JSONResponse: Resultado da classificação, com o cabeçalho Server-Timing
     """
-    try:
-        result = await email_service.process_email_request(
-            text=text,
-            file=file,
-            generate_reply=bool(gen_reply),
-            detailed_analysis=bool(detailed_analysis)
-        )
-        
-        # Se não conseguiu classificar com confiança
-        # if result.get("categoria") is None:
-        #     return JSONResponse(
-        #         status_code=200,
-        #         content={
-        #             "categoria": None,
-        #             "gemini_raw": result.get("gemini_raw"),
-        #             "message": "Não foi possível classificar com confiança"
-        #         }
-        #     )
+    with start_trace() as trace:
+        try:
+            result = await email_service.process_email_request(
+                text=text,
+                file=file,
+                generate_reply=bool(gen_reply),
+                detailed_analysis=bool(detailed_analysis)
+            )
+            
+            # Se não conseguiu classificar com confiança
+            # if result.get("categoria") is None:
+            #     return JSONResponse(
+            #         status_code=200,
+            #         content={
+            #             "categoria": None,
+            #             "gemini_raw": result.get("gemini_raw"),
+            #             "message": "Não foi possível classificar com confiança"
+            #         }
+            #     )
+            
+            # Resposta de sucesso (o JSON é serializado ao criar a resposta)
+            with span("serialization"):
+                response_data = build_classification_response(result)
+                if debug == "timing":
+                    # Não inclui a própria serialização, só presente no cabeçalho
+                    response_data["timing"] = trace.as_dict()
+                response = JSONResponse(status_code=200, content=response_data)
+            
+        except RateLimitedError as e:
+            response = rate_limited_response(e)
+        except ValueError as e:
+            response = JSONResponse(
+                status_code=400,
+                content={"error": str(e)}
+            )
+        except RuntimeError as e:
+            response = JSONResponse(
+                status_code=500,
+                content={"error": str(e)}
+            )
+        except Exception as e:
+            response = JSONResponse(
+                status_code=500,
+                content={"error": f"Erro interno: {e}"}
+            )
         
-        # Resposta de sucesso
-        response_data = {
-            "categoria": result["categoria"],
-            "prioridade": result.get("prioridade"),
-            "label": "GEMINI",
-            "gemini_raw": result.get("gemini_raw")
+        if settings.SERVER_TIMING_ENABLED:
+            response.headers["Server-Timing"] = trace.server_timing()
+        return response
+
+
+async def _run_batch(items: list, generate_reply: bool, detailed_analysis: bool) -> JSONResponse:
+    """Executa o lote e formata os resultados na ordem de entrada"""
+    if not items:
+        return JSONResponse(status_code=400, content={"error": "Nenhum email enviado."})
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Lote excede o limite de {settings.BATCH_MAX_ITEMS} emails."}
+        )
+    
+    outcomes = await email_service.process_batch(items, generate_reply, detailed_analysis)
+    
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if outcome["ok"]:
+            results.append({"index": index, "ok": True, **build_classification_response(outcome["result"])})
+        else:
+            failure = {"index": index, "ok": False, "status": outcome["status"], "error": outcome["error"]}
+            if outcome.get("retry_after") is not None:
+                failure["retry_after"] = outcome["retry_after"]
+            results.append(failure)
+    
+    return JSONResponse(
+        status_code=200,
+        content={
+            "total": len(results),
+            "succeeded": sum(1 for r in results if r["ok"]),
+            "results": results
         }
+    )
+
+
+@router.post("/classify/batch")
+async def classify_batch(payload: BatchClassifyRequest):
+    """
+    Classifica vários emails enviados como array JSON
+    
+    Args:
+        payload: Lista de textos e flags de geração
         
-        if "reply" in result:
-            response_data["reply"] = result["reply"]
-        
-        if "detailed_analysis" in result:
-            response_data["detailed_analysis"] = result["detailed_analysis"]
-        
-        return JSONResponse(status_code=200, content=response_data)
+    Returns:
+        JSONResponse: Resultados na ordem de entrada, com erros por item
+    """
+    return await _run_batch(payload.emails, payload.gen_reply, payload.detailed_analysis)
+
+
+@router.post("/classify/batch/files")
+async def classify_batch_files(
+    files: List[UploadFile] = File(...),
+    gen_reply: Optional[bool] = Form(False),
+    detailed_analysis: Optional[bool] = Form(False)
+):
+    """
+    Classifica vários arquivos (.txt ou .pdf) enviados via multipart
+    
+    Args:
+        files: Arquivos de email
+        gen_reply: Se deve gerar respostas automáticas
+        detailed_analysis: Se deve gerar análises detalhadas
         
-    except ValueError as e:
-        return JSONResponse(
-            status_code=400,
-            content={"error": str(e)}
-        )
-    except RuntimeError as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": str(e)}
-        )
-    except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": f"Erro interno: {e}"}
-        )
+    Returns:
+        JSONResponse: Resultados na ordem de entrada, com erros por item
+    """
+    return await _run_batch(files, bool(gen_reply), bool(detailed_analysis))
@@ -1,12 +1,19 @@
 """
 Rotas para health check e status da aplicação
 """
+from datetime import datetime, timezone
+
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
 from app.config import settings
 from app.services.gemini_service import gemini_service, GEMINI_AVAILABLE
+from app.services.circuit_breaker import CIRCUIT_CLOSED
+from app.services.email_service import email_service
+from app.services.job_queue import job_queue
 from app.utils.pdf_extractor import get_available_pdf_libraries
+from app.utils.pdf_cache import pdf_text_cache
+from app.utils.pdf_pool import pdf_pool
 
 router = APIRouter(tags=["health"])
 
@@ -46,23 +53,41 @@ async def detailed_health():
     pdf_libs = get_available_pdf_libraries()
     pdf_status = "ok" if pdf_libs else "no_libraries"
     
-    overall_status = "ok" if gemini_status == "ok" else "degraded"
+    backend_status = "ok" if email_service.backend.is_available() else "unavailable"
+    breaker = email_service.circuit_breaker
+    breaker_stats = breaker.stats() if breaker is not None else {"enabled": False}
+    overall_status = "ok" if backend_status == "ok" else "degraded"
+    # Circuito aberto: a instância continua atendendo (classificação local)
+    if overall_status == "ok" and breaker_stats.get("state", CIRCUIT_CLOSED) != CIRCUIT_CLOSED:
+        overall_status = "degraded"
     
     return JSONResponse(
-        status_code=200 if overall_status == "ok" else 503,
+        status_code=503 if backend_status != "ok" else 200,
         content={
             "status": overall_status,
             "services": {
                 "gemini": {
                     "status": gemini_status,
                     "sdk_available": GEMINI_AVAILABLE,
-                    "api_key_configured": settings.has_gemini_key
+                    "api_key_configured": settings.has_gemini_key,
+                    "rate_limit": gemini_service.rate_limit_stats()
                 },
                 "pdf_extraction": {
                     "status": pdf_status,
-                    "available_libraries": pdf_libs
-                }
+                    "available_libraries": pdf_libs,
+                    "process_pool": pdf_pool.stats() if settings.PDF_POOL_ENABLED else {"enabled": False},
+                    "text_cache": pdf_text_cache.stats() if pdf_text_cache is not None else {"enabled": False}
+                },
+                "classifier_backend": email_service.backend.stats(),
+                "circuit_breaker": breaker_stats,
+                "result_cache": gemini_service.cache_stats(),
+                "micro_batch": (
+                    gemini_service.micro_batcher.stats()
+                    if gemini_service.micro_batcher is not None
+                    else {"enabled": False}
+                ),
+                "jobs": await job_queue.stats()
             },
-            "timestamp": "2025-09-15T14:43:57-03:00"
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
     )
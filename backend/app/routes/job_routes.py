@@ -0,0 +1,83 @@
+"""
+Rotas da classificação assíncrona (jobs)
+"""
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.services.email_service import email_service
+from app.services.job_queue import job_queue, job_status_payload
+from app.utils.webhooks import validate_callback_url
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+
+@router.post("/jobs")
+async def create_job(
+    text: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    gen_reply: Optional[bool] = Form(False),
+    detailed_analysis: Optional[bool] = Form(False),
+    callback_url: Optional[str] = Form(None)
+):
+    """
+    Enfileira uma classificação e retorna imediatamente o id do job
+
+    Args:
+        text: Texto do email (opcional)
+        file: Arquivo com o email (.txt, .pdf ou .eml) (opcional)
+        gen_reply: Se deve gerar uma resposta automática
+        detailed_analysis: Se deve gerar a análise detalhada
+        callback_url: URL que recebe um POST com o resultado ao fim do job
+            (apenas endereços públicos, ou os hosts de JOBS_CALLBACK_ALLOWED_HOSTS)
+
+    Returns:
+        JSONResponse: 202 com o id e a URL de consulta do job
+    """
+    if callback_url:
+        try:
+            # Resolve o host (DNS) para recusar destinos na rede interna
+            await asyncio.to_thread(validate_callback_url, callback_url, settings.JOBS_CALLBACK_ALLOWED_HOSTS)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+    try:
+        # O arquivo é lido agora; o job guarda apenas o texto extraído
+        content = await email_service.resolve_content(text, file, bool(detailed_analysis))
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    job = job_queue.submit(
+        {
+            "content": content,
+            "generate_reply": bool(gen_reply),
+            "detailed_analysis": bool(detailed_analysis),
+        },
+        callback_url=callback_url or None,
+    )
+    status_url = f"/api/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "status": job["status"], "status_url": status_url},
+        headers={"Location": status_url},
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Consulta o estado de um job
+
+    Args:
+        job_id: Id retornado por POST /api/jobs
+
+    Returns:
+        JSONResponse: Estado do job e, quando concluído, o resultado ou o erro
+    """
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job não encontrado."})
+    return JSONResponse(status_code=200, content=job_status_payload(job))
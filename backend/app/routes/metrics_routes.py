@@ -0,0 +1,116 @@
+"""
+Rota /metrics no formato de exposição do Prometheus
+"""
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.circuit_breaker import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+from app.services.email_service import email_service
+from app.services.gemini_service import branch_queue_depth, gemini_service
+from app.services.job_queue import job_queue
+from app.utils.metrics import executor_queue_depth, registry
+from app.utils.pdf_cache import pdf_text_cache
+from app.utils.pdf_pool import pdf_pool
+
+router = APIRouter(tags=["metrics"])
+
+
+# Os valores abaixo vêm dos contadores que os serviços já mantêm e só são
+# lidos na coleta
+
+def _cache_requests():
+    samples = {}
+    if gemini_service.cache is not None:
+        stats = gemini_service.cache.stats()
+        samples[("result_memory", "hit")] = stats["hits"]
+        samples[("result_memory", "miss")] = stats["misses"]
+    if gemini_service.disk_cache is not None:
+        samples[("result_disk", "hit")] = gemini_service.disk_cache.hits
+        samples[("result_disk", "miss")] = gemini_service.disk_cache.misses
+    if pdf_text_cache is not None:
+        samples[("pdf_text", "hit")] = pdf_text_cache.hits
+        samples[("pdf_text", "miss")] = pdf_text_cache.misses
+    return samples
+
+
+def _pdf_cache_seconds_saved():
+    if pdf_text_cache is None:
+        return {}
+    return {(): pdf_text_cache.seconds_saved}
+
+
+def _pdf_cache_hit_ratio():
+    if pdf_text_cache is None:
+        return {}
+    lookups = pdf_text_cache.hits + pdf_text_cache.misses
+    return {(): pdf_text_cache.hits / lookups if lookups else 0.0}
+
+
+def _executor_queue_depth():
+    try:
+        default_executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    except RuntimeError:
+        default_executor = None
+    return {
+        ("default",): executor_queue_depth(default_executor),
+        ("gemini_branch",): branch_queue_depth(),
+        ("pdf_pool",): pdf_pool.queue_depth(),
+    }
+
+
+def _gemini_concurrency():
+    stats = gemini_service.rate_limit_stats()["concurrency"]
+    if stats is None:
+        return {}
+    return {(key,): stats[key] for key in ("limit", "in_flight", "waiting")}
+
+
+def _gemini_events():
+    samples = {
+        ("retry",): gemini_service.retries,
+        ("overload",): gemini_service.overloads,
+        ("timeout",): gemini_service.timeouts,
+        ("rate_limited",): gemini_service.rate_limit_failures,
+    }
+    if gemini_service.hedger is not None:
+        samples[("hedge_sent",)] = gemini_service.hedger.hedges_sent
+        samples[("hedge_won",)] = gemini_service.hedger.hedges_won
+        samples[("hedge_skipped",)] = gemini_service.hedger.hedges_skipped
+    return samples
+
+
+def _circuit_state():
+    breaker = email_service.circuit_breaker
+    if breaker is None:
+        return {}
+    state = breaker.state
+    return {(name,): int(state == name) for name in (CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN)}
+
+
+def _jobs():
+    # Contagem atualizada pela rota antes da coleta (o COUNT no SQLite não roda no event loop)
+    return {(status,): total for status, total in job_queue.cached_counts().items()}
+
+
+registry.callback("autou_cache_requests_total", "Consultas aos caches por resultado", ("cache", "result"), _cache_requests, kind="counter")
+registry.callback("autou_pdf_cache_seconds_saved_total", "Tempo de extração de PDF evitado por acertos no cache de textos", (), _pdf_cache_seconds_saved, kind="counter")
+registry.callback("autou_pdf_cache_hit_ratio", "Fração das consultas ao cache de textos de PDF que acertaram", (), _pdf_cache_hit_ratio)
+registry.callback("autou_executor_queue_depth", "Tarefas aguardando um worker nos executores", ("executor",), _executor_queue_depth)
+registry.callback("autou_gemini_concurrency", "Limite adaptativo e chamadas ao Gemini em andamento", ("value",), _gemini_concurrency)
+registry.callback("autou_gemini_events_total", "Retentativas, sobrecargas, timeouts e hedges do Gemini", ("event",), _gemini_events, kind="counter")
+registry.callback("autou_circuit_breaker_state", "Estado atual do circuit breaker (1 = ativo)", ("state",), _circuit_state)
+registry.callback("autou_jobs", "Jobs assíncronos por estado", ("status",), _jobs)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas da aplicação para coleta pelo Prometheus
+    
+    Returns:
+        PlainTextResponse: Texto no formato de exposição 0.0.4
+    """
+    await job_queue.refresh_counts()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,201 @@
+"""
+Circuit breaker do backend de classificação: abre com taxa de erros ou de
+chamadas lentas acima do limite e passa a falhar imediatamente
+"""
+import asyncio
+import collections
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+# Estados do circuito
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada recusada porque o circuito está aberto"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Janela com os resultados das últimas chamadas. Quando a fração de
+    falhas (erros e timeouts) ou de chamadas lentas passa do limite, o
+    circuito abre por open_seconds e as chamadas são recusadas sem esperar
+    o backend. Depois disso, algumas chamadas de teste (meio aberto) decidem
+    se ele fecha de novo ou volta a abrir.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 50,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 3,
+        call_timeout_seconds: Optional[float] = None,
+        ignored_exceptions: Tuple[Type[BaseException], ...] = (),
+        is_failure: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        """
+        Args:
+            failure_rate_threshold: Fração de falhas na janela que abre o circuito
+            slow_call_seconds: Duração a partir da qual uma chamada é considerada lenta
+            slow_call_rate_threshold: Fração de chamadas lentas que abre o circuito
+            window_size: Quantidade de chamadas consideradas na janela
+            min_calls: Mínimo de chamadas na janela antes de avaliar as taxas
+            open_seconds: Tempo aberto antes das chamadas de teste
+            half_open_max_calls: Chamadas de teste simultâneas no estado meio aberto
+            call_timeout_seconds: Timeout de cada chamada (None = sem limite)
+            ignored_exceptions: Erros que não indicam falha do backend (ex.: cota)
+            is_failure: Decide se um erro conta como falha do backend; os
+                demais não entram na janela (padrão: todos contam)
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.call_timeout_seconds = call_timeout_seconds
+        self.ignored_exceptions = ignored_exceptions
+        self.is_failure = is_failure
+        # (falhou, lenta) das chamadas mais recentes
+        self._window: "collections.deque[Tuple[bool, bool]]" = collections.deque(maxlen=max(1, window_size))
+        self._state = CIRCUIT_CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == CIRCUIT_OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = CIRCUIT_HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        return self._state
+
+    def _open(self, now: float) -> None:
+        self._state = CIRCUIT_OPEN
+        self._opened_at = now
+        self._window.clear()
+        self.times_opened += 1
+
+    def _acquire(self) -> bool:
+        """Decide se a chamada pode seguir; no meio aberto, reserva uma vaga de teste"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CIRCUIT_CLOSED:
+                return False
+            if state == CIRCUIT_HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+        raise CircuitOpenError("Circuito aberto: backend de classificação indisponível.", retry_after=max(0.0, remaining))
+
+    def _record(self, probe: bool, failed: Optional[bool], duration: float) -> None:
+        """
+        Registra o resultado de uma chamada
+
+        Args:
+            probe: Se a chamada era de teste (meio aberto)
+            failed: True/False, ou None para não contabilizar (erro ignorado, cancelamento)
+            duration: Duração da chamada em segundos
+        """
+        now = time.monotonic()
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if probe:
+                self._probes -= 1
+                if failed is None or self._state != CIRCUIT_HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._open(now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_max_calls:
+                    self._state = CIRCUIT_CLOSED
+                    self._window.clear()
+                return
+            if failed is None or self._state != CIRCUIT_CLOSED:
+                return
+            self._window.append((failed, slow))
+            if len(self._window) < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._window if f)
+            slow_calls = sum(1 for _, s in self._window if s)
+            if (
+                failures / len(self._window) >= self.failure_rate_threshold
+                or slow_calls / len(self._window) >= self.slow_call_rate_threshold
+            ):
+                self._open(now)
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa a chamada protegida pelo circuito
+
+        Args:
+            factory: Cria a corrotina da chamada
+
+        Returns:
+            Any: Resultado da chamada
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto
+            asyncio.TimeoutError: Se a chamada passar de call_timeout_seconds
+        """
+        probe = self._acquire()
+        started = time.monotonic()
+        failed: Optional[bool] = None
+        try:
+            if self.call_timeout_seconds:
+                result = await asyncio.wait_for(factory(), self.call_timeout_seconds)
+            else:
+                result = await factory()
+            failed = False
+            return result
+        except self.ignored_exceptions:
+            raise
+        except Exception as e:
+            if self.is_failure is not None and not self.is_failure(e):
+                raise
+            failed = True
+            self.last_failure = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            self._record(probe, failed, time.monotonic() - started)
+
+    def stats(self) -> Dict:
+        """Estado do circuito e taxas da janela atual para o /health"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            calls = len(self._window)
+            failures = sum(1 for f, _ in self._window if f)
+            slow_calls = sum(1 for _, s in self._window if s)
+            return {
+                "state": state,
+                "window_calls": calls,
+                "failure_rate": round(failures / calls, 4) if calls else 0.0,
+                "slow_call_rate": round(slow_calls / calls, 4) if calls else 0.0,
+                "open_for_seconds": round(max(0.0, self.open_seconds - (now - self._opened_at)), 1) if state == CIRCUIT_OPEN else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "last_failure": self.last_failure,
+            }
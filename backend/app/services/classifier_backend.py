@@ -0,0 +1,84 @@
+"""
+Abstração do backend de classificação usado pelo EmailService
+"""
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Dict
+
+from app.config import settings
+from app.services.gemini_service import gemini_service
+from app.utils.tracing import traced_callable
+
+
+class ClassifierBackend(ABC):
+    """Interface comum dos backends de classificação"""
+
+    #: Nome reportado em 'stage' nas respostas e no /health
+    name: str = "base"
+
+    @abstractmethod
+    async def classify(self, content: str, generate_reply: bool = False, detailed_analysis: bool = False) -> Dict:
+        """
+        Classifica um email e opcionalmente gera análise e resposta
+
+        Args:
+            content: Conteúdo do email
+            generate_reply: Se deve gerar uma resposta automática
+            detailed_analysis: Se deve gerar análise detalhada
+
+        Returns:
+            Dict: Resultado com 'categoria', 'prioridade', 'gemini_raw' e
+            opcionalmente 'reply' e 'detailed_analysis'
+        """
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        """Verifica se o backend está pronto para uso"""
+
+    def stats(self) -> Dict:
+        """Informações do backend para o /health"""
+        return {"name": self.name, "available": self.is_available()}
+
+
+class GeminiBackend(ClassifierBackend):
+    """Backend que delega ao GeminiService"""
+
+    name = "gemini"
+
+    def __init__(self, service=gemini_service):
+        self.service = service
+
+    async def classify(self, content: str, generate_reply: bool = False, detailed_analysis: bool = False) -> Dict:
+        if settings.GEMINI_ASYNC_ENABLED and self.service.has_async_client:
+            return await self.service.classify_email_async(content, generate_reply, detailed_analysis)
+
+        loop = asyncio.get_running_loop()
+        # traced_callable leva o trace para a thread e mede a espera na fila
+        return await loop.run_in_executor(
+            None, traced_callable(self.service.classify_email, content, generate_reply, detailed_analysis)
+        )
+
+    def is_available(self) -> bool:
+        return self.service.is_available()
+
+
+def create_backend(name: str) -> ClassifierBackend:
+    """
+    Cria o backend configurado
+
+    Args:
+        name: 'gemini' ou 'fake'
+
+    Returns:
+        ClassifierBackend: Instância do backend
+
+    Raises:
+        ValueError: Se o nome não for reconhecido
+    """
+    name = (name or "gemini").strip().lower()
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "fake":
+        from app.services.fake_backend import FakeBackend
+        return FakeBackend.from_settings()
+    raise ValueError(f"Backend de classificação desconhecido: {name}")
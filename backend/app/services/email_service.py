@@ -2,44 +2,200 @@
 Serviço para processamento de emails
 """
 import asyncio
-from typing import Optional, Dict
+import copy
+import logging
+import os
+import time
+from email.message import EmailMessage
+from typing import Optional, Dict, List, Sequence, Tuple, Union
 from fastapi import UploadFile
 
-from app.utils.pdf_extractor import extract_text_from_pdf_bytes
-from app.services.gemini_service import gemini_service
+from app.config import settings
+from app.utils.email_preprocessing import preprocess_email
+from app.utils.eml_parser import compose_eml_content, eml_headers, extract_eml_body, iter_pdf_attachments, parse_eml_stream
+from app.utils.metrics import errors_total, extraction_seconds, upload_read_seconds
+from app.utils.pdf_extractor import extract_pdf_file_text, extract_pdf_text
+from app.utils.pdf_cache import pdf_digest, pdf_text_cache
+from app.utils.pdf_pool import pdf_pool
+from app.utils.single_flight import SingleFlight
+from app.utils.text import content_hash, extraction_char_budget, prompt_char_budget
+from app.utils.tracing import span
+from app.utils.uploads import decode_text_upload, read_upload_bytes, spool_upload_to_temp_file, upload_size
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.classifier_backend import ClassifierBackend, create_backend
+from app.services.local_classifier import local_classifier
+from app.services.rate_limiter import RateLimitedError, is_transient_failure
+
+logger = logging.getLogger("autou")
 
 
 class EmailService:
     """Serviço para processamento e classificação de emails"""
     
-    async def extract_content_from_file(self, file: UploadFile) -> str:
+    def __init__(self, backend: Optional[ClassifierBackend] = None):
+        self.backend = backend or create_backend(settings.CLASSIFIER_BACKEND)
+        self.single_flight = SingleFlight()
+        self.circuit_breaker: Optional[CircuitBreaker] = None
+        if settings.CIRCUIT_BREAKER_ENABLED:
+            self.circuit_breaker = CircuitBreaker(
+                failure_rate_threshold=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+                slow_call_seconds=settings.CIRCUIT_BREAKER_SLOW_CALL_SECONDS,
+                slow_call_rate_threshold=settings.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+                window_size=settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+                min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+                open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+                half_open_max_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+                call_timeout_seconds=settings.CIRCUIT_BREAKER_CALL_TIMEOUT_SECONDS,
+                # Cota esgotada é respondida com 429, não indica backend fora do ar
+                ignored_exceptions=(RateLimitedError,),
+                # Erros de configuração ou de requisição não abrem o circuito
+                is_failure=is_transient_failure,
+            )
+    
+    async def extract_content_from_file(self, file: UploadFile, max_chars: Optional[int] = None) -> str:
         """
-        Extrai conteúdo de um arquivo enviado
+        Extrai conteúdo de um arquivo enviado, sem carregá-lo inteiro em memória
         
         Args:
             file: Arquivo enviado via upload
+            max_chars: Orçamento de caracteres; a extração para ao atingi-lo
+                (None = documento inteiro)
             
         Returns:
             str: Conteúdo extraído do arquivo
             
         Raises:
-            ValueError: Se o arquivo estiver vazio ou formato não suportado
+            ValueError: Se o arquivo estiver vazio, grande demais ou em formato não suportado
         """
         filename = (file.filename or "").lower()
-        raw_bytes = await file.read()
+        size = await upload_size(file)
         
-        if not raw_bytes:
+        if not size:
             raise ValueError("Arquivo vazio ou upload falhou.")
+        if settings.MAX_UPLOAD_BYTES > 0 and size > settings.MAX_UPLOAD_BYTES:
+            raise ValueError(
+                f"Arquivo excede o limite de {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+            )
         
         if filename.endswith(".txt"):
-            return raw_bytes.decode("utf-8", errors="ignore")
+            with upload_read_seconds.labels("txt").time():
+                return await decode_text_upload(file, max_chars)
+        elif filename.endswith(".eml"):
+            content = await self._extract_eml_upload(file, max_chars)
+            if not content:
+                raise ValueError("Não foi possível extrair texto deste email.")
+            return content
         elif filename.endswith(".pdf"):
-            content = extract_text_from_pdf_bytes(raw_bytes)
+            content = await self._extract_pdf_upload(file, size, max_chars)
             if not content:
                 raise ValueError("Não foi possível extrair texto deste PDF (pode ser escaneado).")
             return content
         else:
-            raise ValueError("Formato não suportado. Envie .txt ou .pdf")
+            raise ValueError("Formato não suportado. Envie .txt, .pdf ou .eml")
+    
+    async def _extract_pdf_upload(self, file: UploadFile, size: int, max_chars: Optional[int]) -> str:
+        """
+        Extrai texto de um PDF enviado. Arquivos pequenos são lidos em memória;
+        os grandes são copiados para um arquivo temporário que é mapeado em
+        memória pelas bibliotecas de PDF
+        """
+        if size <= settings.UPLOAD_SPOOL_THRESHOLD_BYTES:
+            with upload_read_seconds.labels("pdf").time():
+                pdf_bytes = await read_upload_bytes(file)
+            return await self._extract_pdf(pdf_bytes, max_chars)
+        
+        with upload_read_seconds.labels("pdf").time():
+            path = await spool_upload_to_temp_file(file, suffix=".pdf")
+        try:
+            return await self._extract_pdf(path, max_chars)
+        finally:
+            os.unlink(path)
+    
+    async def _extract_pdf(self, pdf: Union[bytes, str], max_chars: Optional[int]) -> str:
+        """
+        Extrai texto de um PDF (bytes ou caminho em disco), consultando antes
+        o cache de textos pelo hash do documento
+        
+        Args:
+            pdf: Bytes do PDF ou caminho do arquivo
+            max_chars: Orçamento de caracteres (None = documento inteiro)
+            
+        Returns:
+            str: Texto extraído
+        """
+        digest = None
+        if pdf_text_cache is not None:
+            started = time.perf_counter()
+            # Hash e consulta ao nível em disco (SQLite) fora do event loop
+            digest, cached = await asyncio.to_thread(self._lookup_pdf_text, pdf, max_chars)
+            if cached is not None:
+                extraction_seconds.labels("pdf", "cache").observe(time.perf_counter() - started)
+                return cached
+        
+        started = time.perf_counter()
+        if settings.PDF_POOL_ENABLED:
+            text, complete, library = await pdf_pool.extract(pdf, max_chars)
+        elif isinstance(pdf, str):
+            text, complete, library = await asyncio.to_thread(extract_pdf_file_text, pdf, None, max_chars)
+        else:
+            text, complete, library = await asyncio.to_thread(extract_pdf_text, pdf, None, max_chars)
+        
+        elapsed = time.perf_counter() - started
+        # Com fallback por página, o rótulo é a biblioteca que extraiu mais páginas
+        extraction_seconds.labels("pdf", library).observe(elapsed)
+        if digest is not None:
+            await asyncio.to_thread(pdf_text_cache.set, digest, max_chars, text, elapsed, complete)
+        return text
+    
+    @staticmethod
+    def _lookup_pdf_text(pdf: Union[bytes, str], max_chars: Optional[int]) -> Tuple[str, Optional[str]]:
+        """Calcula o hash do PDF e busca o texto no cache (executado em thread)"""
+        digest = pdf_digest(pdf)
+        return digest, pdf_text_cache.get(digest, max_chars)
+    
+    async def _extract_eml_upload(self, file: UploadFile, max_chars: Optional[int]) -> str:
+        """Lê um .eml enviado com o parser MIME incremental e extrai seu conteúdo"""
+        await file.seek(0)
+        # A leitura do upload e a análise MIME acontecem juntas, em blocos
+        with upload_read_seconds.labels("eml").time():
+            message = await asyncio.to_thread(parse_eml_stream, file.file)
+        return await self.extract_content_from_message(message, max_chars)
+    
+    async def extract_content_from_message(self, message: EmailMessage, max_chars: Optional[int] = None) -> str:
+        """
+        Extrai remetente, assunto, corpo e texto dos anexos PDF de uma mensagem
+        MIME. Anexos acima de EML_MAX_ATTACHMENT_BYTES, ou que não cabem mais
+        no orçamento, são ignorados sem serem decodificados
+        
+        Args:
+            message: Mensagem já analisada
+            max_chars: Orçamento de caracteres (None = mensagem inteira)
+            
+        Returns:
+            str: Conteúdo da mensagem
+        """
+        headers = eml_headers(message)
+        with extraction_seconds.labels("eml", "email").time():
+            body = await asyncio.to_thread(extract_eml_body, message)
+        
+        attachments = []
+        used = len(body)
+        max_bytes = settings.EML_MAX_ATTACHMENT_BYTES or None
+        for attachment in iter_pdf_attachments(message, max_bytes):
+            remaining = None if max_chars is None else max_chars - used
+            if attachment["skipped"] or (remaining is not None and remaining <= 0):
+                continue
+            pdf_bytes = attachment["part"].get_payload(decode=True) or b""
+            try:
+                text = await self._extract_pdf(pdf_bytes, remaining)
+            except ValueError:
+                continue
+            attachment["text"] = text
+            used += len(text)
+            attachments.append(attachment)
+        
+        content = compose_eml_content(headers, body, attachments)
+        return content if max_chars is None else content[:max_chars]
     
     def validate_content(self, content: str) -> str:
         """
@@ -71,12 +227,91 @@ class EmailService:
         Returns:
             Dict: Resultado da classificação
         """
-        loop = asyncio.get_event_loop()
+        # Primeiro estágio: casos óbvios são respondidos localmente
+        if settings.LOCAL_CLASSIFIER_ENABLED and not generate_reply and not detailed_analysis:
+            local = local_classifier.predict(content)
+            if local["confidence"] >= settings.LOCAL_CLASSIFIER_THRESHOLD:
+                return {**local, "stage": "local"}
+        
+        if self.circuit_breaker is None:
+            result = await self.backend.classify(content, generate_reply, detailed_analysis)
+        else:
+            try:
+                result = await self.circuit_breaker.call(
+                    lambda: self.backend.classify(content, generate_reply, detailed_analysis)
+                )
+            except RateLimitedError:
+                raise
+            except CircuitOpenError:
+                errors_total.labels("backend", "circuit_open").inc()
+                return await self._classify_degraded(content, generate_reply, detailed_analysis, "circuit_open")
+            except Exception as e:
+                errors_total.labels("backend", type(e).__name__).inc()
+                # Só falhas passageiras do backend têm contingência; as demais
+                # (chave ausente, configuração, requisição inválida) propagam
+                if not is_transient_failure(e):
+                    raise
+                logger.warning("Backend '%s' falhou; usando classificação local: %s", self.backend.name, e)
+                return await self._classify_degraded(content, generate_reply, detailed_analysis, "backend_error")
+        result["stage"] = self.backend.name
+        return result
+    
+    async def _classify_degraded(self, content: str, generate_reply: bool, detailed_analysis: bool, reason: str) -> Dict:
+        """
+        Resultado de contingência do classificador local, marcado como degradado.
+        Resposta e análise detalhada dependem do backend e ficam em 'partial_errors'.
+        Não é um resultado final: quem grava resultados (jobs, CLI) deve refazê-lo
+        """
+        # O modelo de desempate pode precisar ser treinado: fora do event loop
+        local = await asyncio.to_thread(local_classifier.predict_degraded, content)
+        result = {
+            "categoria": local["categoria"],
+            "prioridade": local["prioridade"],
+            "gemini_raw": None,
+            "stage": "fallback",
+            "degraded": {"reason": reason, "method": local["method"]},
+        }
+        unavailable = "Indisponível no modo degradado."
+        errors = {}
+        if detailed_analysis:
+            errors["detailed_analysis"] = unavailable
+        if generate_reply:
+            errors["reply"] = unavailable
+        if errors:
+            result["partial_errors"] = errors
+        return result
+    
+    async def resolve_content(
+        self,
+        text: Optional[str] = None,
+        file: Optional[UploadFile] = None,
+        detailed_analysis: bool = False
+    ) -> str:
+        """
+        Obtém e valida o conteúdo do email a partir do texto ou do arquivo
         
-        def _classify():
-            return gemini_service.classify_email(content, generate_reply, detailed_analysis)
+        Args:
+            text: Texto do email (opcional)
+            file: Arquivo com o email (opcional)
+            detailed_analysis: Se a análise detalhada será gerada
+            
+        Returns:
+            str: Conteúdo validado
+            
+        Raises:
+            ValueError: Se não houver conteúdo ou erro na extração
+        """
+        if file is not None:
+            # A análise detalhada usa o documento inteiro; a classificação, um
+            # múltiplo do orçamento do prompt, cortado depois no pré-processamento
+            max_chars = None if detailed_analysis else extraction_char_budget()
+            content = await self.extract_content_from_file(file, max_chars)
+        elif text:
+            content = text
+        else:
+            raise ValueError("Nenhum texto ou arquivo enviado.")
         
-        return await loop.run_in_executor(None, _classify)
+        return self.validate_content(content)
     
     async def process_email_request(
         self, 
@@ -98,29 +333,96 @@ class EmailService:
             
         Raises:
             ValueError: Se não houver conteúdo ou erro na extração
+            RateLimitedError: Se a cota do Gemini estiver esgotada
             RuntimeError: Se houver erro na classificação
         """
-        # Extrai conteúdo
-        content = ""
-        
-        if file is not None:
-            content = await self.extract_content_from_file(file)
-        elif text:
-            content = text
-        else:
-            raise ValueError("Nenhum texto ou arquivo enviado.")
+        try:
+            with span("extraction"):
+                content = await self.resolve_content(text, file, detailed_analysis)
+        except ValueError:
+            errors_total.labels("extraction", "invalid_input").inc()
+            raise
         
-        # Valida conteúdo
-        content = self.validate_content(content)
+        # Remove histórico citado e boilerplate e aplica o orçamento de tokens
+        # (a análise detalhada recebe o texto limpo, mas sem corte)
+        with span("preprocess"):
+            prepared = preprocess_email(
+                content,
+                max_chars=None if detailed_analysis else prompt_char_budget(),
+                clean=settings.EMAIL_PREPROCESSING_ENABLED,
+            )
+        content = prepared["text"]
         
         # Classifica o email
         try:
-            result = await self.classify_email_async(content, generate_reply, detailed_analysis)
+            with span("classification"):
+                if settings.SINGLE_FLIGHT_ENABLED:
+                    key = (content_hash(content), bool(generate_reply), bool(detailed_analysis))
+                    result = await self.single_flight.do(
+                        key, lambda: self.classify_email_async(content, generate_reply, detailed_analysis)
+                    )
+                    # Cada chamador recebe sua própria cópia do resultado compartilhado
+                    result = copy.deepcopy(result)
+                else:
+                    result = await self.classify_email_async(content, generate_reply, detailed_analysis)
+        except RateLimitedError:
+            errors_total.labels("classification", "rate_limited").inc()
+            raise
         except Exception as e:
+            errors_total.labels("classification", type(e).__name__).inc()
             raise RuntimeError(f"Erro ao classificar email: {e}")
         
+        result["tokens"] = {
+            "original": prepared["original_tokens"],
+            "sent": prepared["sent_tokens"],
+            "truncated": prepared["truncated"],
+        }
         return result
 
+    
+    async def process_batch(
+        self,
+        items: Sequence[Union[str, UploadFile]],
+        generate_reply: bool = False,
+        detailed_analysis: bool = False,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Processa vários emails com concorrência limitada
+        
+        Args:
+            items: Textos ou arquivos de email
+            generate_reply: Se deve gerar respostas automáticas
+            detailed_analysis: Se deve gerar análises detalhadas
+            max_concurrency: Limite de itens simultâneos (padrão: settings.BATCH_MAX_CONCURRENCY)
+            
+        Returns:
+            List[Dict]: Um item por entrada, na mesma ordem, com 'ok' e
+            'result' em caso de sucesso ou 'error' e 'status' em caso de falha
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or settings.BATCH_MAX_CONCURRENCY))
+        
+        async def _process(item: Union[str, UploadFile]) -> Dict:
+            async with semaphore:
+                try:
+                    if isinstance(item, str):
+                        result = await self.process_email_request(
+                            text=item, generate_reply=generate_reply, detailed_analysis=detailed_analysis
+                        )
+                    else:
+                        result = await self.process_email_request(
+                            file=item, generate_reply=generate_reply, detailed_analysis=detailed_analysis
+                        )
+                    return {"ok": True, "result": result}
+                except ValueError as e:
+                    return {"ok": False, "status": 400, "error": str(e)}
+                except RateLimitedError as e:
+                    return {"ok": False, "status": 429, "error": str(e), "retry_after": e.retry_after}
+                except Exception as e:
+                    return {"ok": False, "status": 500, "error": str(e)}
+        
+        return await asyncio.gather(*(_process(item) for item in items))
+
 
 # Instância singleton do serviço
 email_service = EmailService()
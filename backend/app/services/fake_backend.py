@@ -0,0 +1,111 @@
+"""
+Backend offline e determinístico para testes de carga e benchmarks
+"""
+import asyncio
+import json
+import random
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.classifier_backend import ClassifierBackend
+from app.utils.text import content_hash
+
+DEFAULT_OUTPUTS = [
+    {"categoria": "Produtivo", "prioridade": "Alta"},
+    {"categoria": "Produtivo", "prioridade": "Média"},
+    {"categoria": "Produtivo", "prioridade": "Baixa"},
+    {"categoria": "Improdutivo", "prioridade": "Baixa"},
+]
+
+
+class FakeBackend(ClassifierBackend):
+    """
+    Simula o Gemini sem rede: latência com distribuição log-normal, taxa de
+    erro configurável e respostas enlatadas escolhidas pelo hash do conteúdo
+    (o mesmo email sempre recebe a mesma resposta)
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_median_ms: float = 200.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        outputs: Optional[List[Dict]] = None,
+        seed: int = 42,
+    ):
+        """
+        Args:
+            latency_median_ms: Mediana da latência simulada por chamada
+            latency_sigma: Desvio padrão do log da latência (0 = latência fixa)
+            error_rate: Fração de chamadas que falham (0.0 a 1.0)
+            outputs: Respostas enlatadas ('categoria', 'prioridade' e opcionais)
+            seed: Semente do gerador de latência e erros
+        """
+        self.latency_median_ms = max(0.0, latency_median_ms)
+        self.latency_sigma = max(0.0, latency_sigma)
+        self.error_rate = min(1.0, max(0.0, error_rate))
+        self.outputs = outputs or DEFAULT_OUTPUTS
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_settings(cls) -> "FakeBackend":
+        """Cria o backend a partir das variáveis FAKE_BACKEND_*"""
+        outputs = None
+        if settings.FAKE_BACKEND_OUTPUTS_PATH:
+            with open(settings.FAKE_BACKEND_OUTPUTS_PATH, encoding="utf-8") as f:
+                outputs = json.load(f)
+        return cls(
+            latency_median_ms=settings.FAKE_BACKEND_LATENCY_MEDIAN_MS,
+            latency_sigma=settings.FAKE_BACKEND_LATENCY_SIGMA,
+            error_rate=settings.FAKE_BACKEND_ERROR_RATE,
+            outputs=outputs,
+            seed=settings.FAKE_BACKEND_SEED,
+        )
+
+    def _sample_latency(self) -> float:
+        """Latência em segundos amostrada da distribuição log-normal"""
+        median = self.latency_median_ms / 1000.0
+        if median <= 0:
+            return 0.0
+        if self.latency_sigma == 0:
+            return median
+        return self._rng.lognormvariate(0.0, self.latency_sigma) * median
+
+    async def classify(self, content: str, generate_reply: bool = False, detailed_analysis: bool = False) -> Dict:
+        self.calls += 1
+        latency = self._sample_latency()
+        fail = self._rng.random() < self.error_rate
+        await asyncio.sleep(latency)
+        if fail:
+            self.errors += 1
+            # Como no GeminiService: RuntimeError com a causa (falha de rede) encadeada
+            raise RuntimeError("Falha simulada pelo backend fake") from ConnectionError("backend fake indisponível")
+
+        canned = self.outputs[int(content_hash(content)[:8], 16) % len(self.outputs)]
+        result = {
+            "categoria": canned["categoria"],
+            "prioridade": canned.get("prioridade"),
+            "gemini_raw": json.dumps(canned, ensure_ascii=False),
+        }
+        if detailed_analysis:
+            result["detailed_analysis"] = canned.get("detailed_analysis", "Análise simulada pelo backend fake.")
+        if generate_reply:
+            result["reply"] = canned.get("reply", "Resposta simulada pelo backend fake.")
+        return result
+
+    def is_available(self) -> bool:
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            **super().stats(),
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_median_ms": self.latency_median_ms,
+            "latency_sigma": self.latency_sigma,
+            "error_rate": self.error_rate,
+        }
@@ -1,10 +1,43 @@
 """
 Serviço para integração com Gemini AI
 """
+import asyncio
+import concurrent.futures
+import copy
+import functools
+import hashlib
+import json
+import logging
 import os
-from typing import Dict, Optional
+import re
+import time
+from typing import Dict, List, Optional
 
 from app.config import settings
+from app.services.hedging import Hedger, LatencyTracker
+from app.services.micro_batcher import MicroBatchDispatcher
+from app.services.rate_limiter import (
+    AIMDLimiter,
+    RateLimitedError,
+    TokenBucket,
+    backoff_delay,
+    error_status_code,
+    is_retryable_error,
+    is_timeout_error,
+    retry_after_seconds,
+)
+from app.utils.cache import TTLCache
+from app.utils.metrics import (
+    errors_total,
+    executor_queue_depth,
+    gemini_call_seconds,
+    normalization_seconds,
+    prompt_build_seconds,
+    timed,
+)
+from app.utils.persistent_cache import PersistentCache
+from app.utils.text import estimate_tokens, normalize_whitespace, truncate_to_budget
+from app.utils.tracing import record, span, traced_callable
 
 # Gemini SDK
 GEMINI_AVAILABLE = False
@@ -15,6 +48,38 @@ except Exception:
     genai = None
     GEMINI_AVAILABLE = False
 
+logger = logging.getLogger("autou")
+
+# Executor das etapas independentes (análise/resposta) no caminho síncrono
+_branch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=settings.GEMINI_BRANCH_WORKERS,
+    thread_name_prefix="gemini-branch",
+)
+
+
+def branch_queue_depth() -> Optional[int]:
+    """Etapas aguardando uma thread livre no executor do caminho síncrono"""
+    return executor_queue_depth(_branch_executor)
+
+
+# Rótulo 'call' das métricas para cada etapa paralela
+BRANCH_CALLS = {"detailed_analysis": "analysis", "reply": "reply"}
+
+CATEGORIAS = ("Produtivo", "Improdutivo")
+PRIORIDADES = ("Alta", "Média", "Baixa")
+
+# Palavra inteira: "improdutivo" contém "produtivo"
+_CATEGORIA_WORD = re.compile(r"\b(improdutivo|produtivo)\b")
+
+CLASSIFICATION_CRITERIA = (
+    "Critérios:\n"
+    "- Produtivo: requer ação/resposta, emails de trabalho, reunioes, problemas e urgências\n"
+    "- Improdutivo: não requer ação, parabenizacoes de cumprimento, festas e aniversarios\n"
+    "- Alta: urgente, prazo apertado, problema crítico\n"
+    "- Média: importante mas não urgente\n"
+    "- Baixa: informativo, rotineiro\n\n"
+)
+
 
 class GeminiService:
     """Serviço para classificação de emails usando Gemini AI"""
@@ -23,6 +88,44 @@ class GeminiService:
         self.api_key = settings.GEMINI_API_KEY
         self.model_name = settings.GEMINI_MODEL
         self._client = None
+        self._concurrency: Optional[AIMDLimiter] = None
+        # Cotas por minuto do projeto no Gemini (requisições e tokens)
+        self.rpm_bucket = TokenBucket(settings.GEMINI_RPM_LIMIT)
+        self.tpm_bucket = TokenBucket(settings.GEMINI_TPM_LIMIT)
+        self.retries = 0
+        self.overloads = 0
+        self.rate_limit_failures = 0
+        self.timeouts = 0
+        self.hedger: Optional[Hedger] = None
+        if settings.GEMINI_HEDGE_ENABLED:
+            self.hedger = Hedger(
+                percentile=settings.GEMINI_HEDGE_PERCENTILE,
+                max_per_minute=settings.GEMINI_HEDGE_MAX_PER_MINUTE,
+                min_delay_seconds=settings.GEMINI_HEDGE_MIN_DELAY_MS / 1000.0,
+                tracker=LatencyTracker(min_samples=settings.GEMINI_HEDGE_MIN_SAMPLES),
+            )
+        self.cache: Optional[TTLCache] = None
+        if settings.RESULT_CACHE_ENABLED:
+            self.cache = TTLCache(
+                max_size=settings.RESULT_CACHE_MAX_SIZE,
+                ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+            )
+        self.disk_cache: Optional[PersistentCache] = None
+        if settings.RESULT_CACHE_ENABLED and settings.RESULT_CACHE_DISK_ENABLED:
+            self.disk_cache = PersistentCache(
+                path=settings.RESULT_CACHE_DISK_PATH,
+                version=self.prompt_version,
+                max_bytes=settings.RESULT_CACHE_DISK_MAX_MB * 1024 * 1024,
+                ttl_seconds=settings.RESULT_CACHE_DISK_TTL_SECONDS,
+            )
+        self.micro_batcher: Optional[MicroBatchDispatcher] = None
+        if settings.GEMINI_MICROBATCH_ENABLED:
+            self.micro_batcher = MicroBatchDispatcher(
+                self,
+                window_seconds=settings.GEMINI_MICROBATCH_WINDOW_MS / 1000.0,
+                max_items=settings.GEMINI_MICROBATCH_MAX_ITEMS,
+                max_tokens=settings.GEMINI_MICROBATCH_MAX_TOKENS,
+            )
     
     @property
     def client(self):
@@ -32,9 +135,14 @@ class GeminiService:
                 raise RuntimeError("GEMINI_API_KEY não definida.")
             if not GEMINI_AVAILABLE:
                 raise RuntimeError("google-genai SDK não instalado (pip install google-genai)")
-            self._client = genai.Client(api_key=self.api_key)
+            # O timeout do SDK (em ms) cobre também o caminho síncrono
+            self._client = genai.Client(
+                api_key=self.api_key,
+                http_options={"timeout": int(settings.GEMINI_CALL_TIMEOUT_SECONDS * 1000)},
+            )
         return self._client
     
+    @timed(prompt_build_seconds.labels("classify"))
     def _build_classify_prompt(self, content: str) -> str:
         """
         Constrói o prompt para classificação de email
@@ -45,20 +153,18 @@ class GeminiService:
         Returns:
             str: Prompt formatado
         """
+        # Classificar não exige o email inteiro: respeita o orçamento do prompt
+        content = truncate_to_budget(content)
         return (
             "Classifique o texto do email abaixo seguindo este formato exato:\n"
             "CATEGORIA: [Produtivo ou Improdutivo]\n"
             "PRIORIDADE: [Alta, Média ou Baixa]\n\n"
-            "Critérios:\n"
-            "- Produtivo: requer ação/resposta, emails de trabalho, reunioes, problemas e urgências\n"
-            "- Improdutivo: não requer ação, parabenizacoes de cumprimento, festas e aniversarios\n"
-            "- Alta: urgente, prazo apertado, problema crítico\n"
-            "- Média: importante mas não urgente\n"
-            "- Baixa: informativo, rotineiro\n\n"
+            + CLASSIFICATION_CRITERIA +
             f"EMAIL:\n{content}\n\n"
             "RESPOSTA:"
         )
     
+    @timed(prompt_build_seconds.labels("analysis"))
     def _build_detailed_analysis_prompt(self, content: str, categoria: str) -> str:
         """Constrói o prompt para análise detalhada"""
         return f"""
@@ -77,6 +183,7 @@ EMAIL:
 ANÁLISE DETALHADA:
 """
 
+    @timed(prompt_build_seconds.labels("reply"))
     def _build_reply_prompt(self, content: str, categoria: str) -> str:
         """Constrói o prompt para gerar resposta automática"""
         return f"""
@@ -88,6 +195,256 @@ EMAIL:
 RESPOSTA:
 """
     
+    @timed(prompt_build_seconds.labels("structured"))
+    def _build_structured_prompt(self, content: str, generate_reply: bool, detailed_analysis: bool) -> str:
+        """
+        Constrói o prompt único que retorna classificação, análise e resposta em JSON
+        
+        Args:
+            content: Conteúdo do email
+            generate_reply: Se deve incluir resposta automática
+            detailed_analysis: Se deve incluir análise detalhada
+            
+        Returns:
+            str: Prompt formatado
+        """
+        if not detailed_analysis:
+            content = truncate_to_budget(content)
+        
+        tarefas = [
+            "- categoria: Produtivo ou Improdutivo",
+            "- prioridade: Alta, Média ou Baixa",
+        ]
+        if detailed_analysis:
+            tarefas.append(
+                "- detailed_analysis: análise detalhada com motivo da classificação, "
+                "elementos-chave identificados, urgência e prioridade, ações recomendadas "
+                "e contexto e observações relevantes"
+            )
+        if generate_reply:
+            tarefas.append("- reply: resposta profissional e adequada em português para o email")
+        
+        return (
+            "Analise o email abaixo e responda apenas com um objeto JSON contendo os campos:\n"
+            + "\n".join(tarefas) + "\n\n"
+            + CLASSIFICATION_CRITERIA +
+            f"EMAIL:\n{content}\n"
+        )
+    
+    @staticmethod
+    def _structured_response_schema(generate_reply: bool, detailed_analysis: bool) -> Dict:
+        """Schema JSON esperado na resposta estruturada"""
+        properties = {
+            "categoria": {"type": "STRING", "enum": list(CATEGORIAS)},
+            "prioridade": {"type": "STRING", "enum": list(PRIORIDADES)},
+        }
+        if detailed_analysis:
+            properties["detailed_analysis"] = {"type": "STRING"}
+        if generate_reply:
+            properties["reply"] = {"type": "STRING"}
+        return {
+            "type": "OBJECT",
+            "properties": properties,
+            "required": list(properties.keys()),
+            "property_ordering": list(properties.keys()),
+        }
+    
+    def _coerce_labels(self, data: Dict, raw_text: str) -> Optional[Dict]:
+        """
+        Normaliza categoria e prioridade de um objeto JSON retornado pelo Gemini
+        
+        Args:
+            data: Objeto com 'categoria' e 'prioridade'
+            raw_text: Texto bruto usado no fallback de prioridade
+            
+        Returns:
+            Optional[Dict]: Categoria e prioridade ou None se a categoria for inválida
+        """
+        categoria = str(data.get("categoria") or "").strip().capitalize()
+        if categoria not in CATEGORIAS:
+            return None
+        
+        prioridade = str(data.get("prioridade") or "").strip().capitalize()
+        if prioridade == "Media":
+            prioridade = "Média"
+        if prioridade not in PRIORIDADES:
+            prioridade = self._normalize_classification(
+                f"categoria: {categoria}\n{raw_text}"
+            ).get("prioridade")
+        
+        return {"categoria": categoria, "prioridade": prioridade}
+    
+    @timed(prompt_build_seconds.labels("classify_batch"))
+    def _build_multi_classify_prompt(self, contents: List[str]) -> str:
+        """
+        Constrói o prompt que classifica vários emails numerados de uma vez
+        
+        Args:
+            contents: Conteúdos dos emails, na ordem dos IDs
+            
+        Returns:
+            str: Prompt formatado
+        """
+        emails = "".join(
+            f"### EMAIL {index}\n{truncate_to_budget(content)}\n\n" for index, content in enumerate(contents)
+        )
+        return (
+            "Classifique cada um dos emails numerados abaixo. Responda apenas com um array JSON "
+            "contendo um objeto por email com os campos:\n"
+            "- id: número do email\n"
+            "- categoria: Produtivo ou Improdutivo\n"
+            "- prioridade: Alta, Média ou Baixa\n\n"
+            + CLASSIFICATION_CRITERIA
+            + emails
+        )
+    
+    @staticmethod
+    def _multi_classify_config() -> Dict:
+        """Configuração de geração para a classificação em lote"""
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {
+                        "id": {"type": "INTEGER"},
+                        "categoria": {"type": "STRING", "enum": list(CATEGORIAS)},
+                        "prioridade": {"type": "STRING", "enum": list(PRIORIDADES)},
+                    },
+                    "required": ["id", "categoria", "prioridade"],
+                    "property_ordering": ["id", "categoria", "prioridade"],
+                },
+            },
+        }
+    
+    @timed(normalization_seconds.labels("classify_batch"))
+    def _parse_multi_classification(self, response_text: str, count: int) -> List[Optional[Dict]]:
+        """
+        Separa a resposta da classificação em lote por ID
+        
+        Args:
+            response_text: Array JSON retornado pelo Gemini
+            count: Quantidade de emails enviados
+            
+        Returns:
+            List[Optional[Dict]]: Resultado de cada email, ou None para os que
+            não puderam ser interpretados
+        """
+        results: List[Optional[Dict]] = [None] * count
+        try:
+            data = json.loads(response_text)
+        except (TypeError, ValueError):
+            return results
+        if not isinstance(data, list):
+            return results
+        
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= index < count or results[index] is not None:
+                continue
+            item_raw = json.dumps(item, ensure_ascii=False)
+            labels = self._coerce_labels(item, item_raw)
+            if labels is not None:
+                results[index] = {**labels, "gemini_raw": item_raw}
+        return results
+    
+    async def classify_many_async(self, contents: List[str]) -> List[Optional[Dict]]:
+        """
+        Classifica vários emails (sem resposta/análise) em uma única chamada
+        
+        Args:
+            contents: Conteúdos dos emails
+            
+        Returns:
+            List[Optional[Dict]]: Resultado por email, na mesma ordem; None
+            indica item que deve ser refeito individualmente
+        """
+        response_text = await self._generate_async(
+            self._build_multi_classify_prompt(contents),
+            config=self._multi_classify_config(),
+            call="classify_batch",
+        )
+        return self._parse_multi_classification(response_text, len(contents))
+    
+    @timed(normalization_seconds.labels("structured"))
+    def _parse_structured_response(self, response_text: str, generate_reply: bool, detailed_analysis: bool) -> Optional[Dict]:
+        """
+        Valida a resposta JSON da chamada estruturada
+        
+        Args:
+            response_text: Texto JSON retornado pelo Gemini
+            generate_reply: Se a resposta deve conter 'reply'
+            detailed_analysis: Se a resposta deve conter 'detailed_analysis'
+            
+        Returns:
+            Optional[Dict]: Resultado normalizado ou None se a resposta for inválida
+        """
+        try:
+            data = json.loads(response_text)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        
+        labels = self._coerce_labels(data, response_text)
+        if labels is None:
+            return None
+        
+        result = {**labels, "gemini_raw": response_text}
+        for field, requested in (("detailed_analysis", detailed_analysis), ("reply", generate_reply)):
+            if not requested:
+                continue
+            value = data.get(field)
+            if not isinstance(value, str) or not value.strip():
+                return None
+            result[field] = value.strip()
+        return result
+    
+    def _structured_config(self, generate_reply: bool, detailed_analysis: bool) -> Dict:
+        """Configuração de geração para a chamada com saída JSON"""
+        return {
+            "response_mime_type": "application/json",
+            "response_schema": self._structured_response_schema(generate_reply, detailed_analysis),
+        }
+    
+    def _call_gemini_structured(self, content: str, generate_reply: bool, detailed_analysis: bool) -> Optional[Dict]:
+        """
+        Faz uma única chamada ao Gemini com saída JSON estruturada
+        
+        Returns:
+            Optional[Dict]: Resultado completo ou None se a resposta não puder ser usada
+        """
+        response_text = self._generate(
+            self._build_structured_prompt(content, generate_reply, detailed_analysis),
+            config=self._structured_config(generate_reply, detailed_analysis),
+            call="structured",
+        )
+        result = self._parse_structured_response(response_text, generate_reply, detailed_analysis)
+        if result is None:
+            logger.warning("Resposta estruturada inválida do Gemini; usando chamadas sequenciais")
+        return result
+    
+    async def _call_gemini_structured_async(self, content: str, generate_reply: bool, detailed_analysis: bool) -> Optional[Dict]:
+        """Versão assíncrona de _call_gemini_structured"""
+        response_text = await self._generate_async(
+            self._build_structured_prompt(content, generate_reply, detailed_analysis),
+            config=self._structured_config(generate_reply, detailed_analysis),
+            # Só a classificação pura é curta o bastante para valer a cópia
+            hedge=not (generate_reply or detailed_analysis),
+            call="structured",
+        )
+        result = self._parse_structured_response(response_text, generate_reply, detailed_analysis)
+        if result is None:
+            logger.warning("Resposta estruturada inválida do Gemini; usando chamadas sequenciais")
+        return result
+    
+    @timed(normalization_seconds.labels("labels"))
     def _normalize_classification(self, response_text: str) -> Dict:
         """
         Normaliza a resposta da classificação incluindo prioridade
@@ -106,18 +463,18 @@ RESPOSTA:
             categoria_line = [line for line in normalized_text.split('\n') if 'categoria:' in line]
             if categoria_line:
                 categoria_text = categoria_line[0].split('categoria:')[1].strip()
-                if "improdutivo" in categoria_text and "produtivo" not in categoria_text:
-                    categoria = "Improdutivo"
-                elif "produtivo" in categoria_text and "improdutivo" not in categoria_text:
+                found = set(_CATEGORIA_WORD.findall(categoria_text))
+                if found == {"produtivo"}:
                     categoria = "Produtivo"
-                elif "" in categoria_text:
-                    categoria = "improdutivo"
+                else:
+                    categoria = "Improdutivo"
         
         # Fallback para categoria
         if not categoria:
-            if "improdutivo" in normalized_text and "produtivo" not in normalized_text:
+            found = set(_CATEGORIA_WORD.findall(normalized_text))
+            if found == {"improdutivo"}:
                 categoria = "Improdutivo"
-            elif "produtivo" in normalized_text and "improdutivo" not in normalized_text:
+            elif found == {"produtivo"}:
                 categoria = "Produtivo"
         
         # Extrai prioridade
@@ -151,6 +508,432 @@ RESPOSTA:
             "prioridade": prioridade
         }
     
+    @staticmethod
+    def _normalize_content(content: str) -> str:
+        """Normaliza espaços em branco para que variações triviais compartilhem o cache"""
+        return normalize_whitespace(content)
+    
+    @functools.cached_property
+    def prompt_version(self) -> str:
+        """
+        Impressão digital dos prompts e esquemas enviados ao modelo. Qualquer
+        alteração no texto dos prompts muda a versão e invalida o cache
+        """
+        digest = hashlib.sha256()
+        parts = [
+            self._build_classify_prompt(""),
+            self._build_detailed_analysis_prompt("", "{categoria}"),
+            self._build_reply_prompt("", "{categoria}"),
+            self._build_multi_classify_prompt([""]),
+        ]
+        for reply in (False, True):
+            for analysis in (False, True):
+                parts.append(self._build_structured_prompt("", reply, analysis))
+                parts.append(json.dumps(self._structured_response_schema(reply, analysis), sort_keys=True))
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()[:16]
+    
+    def _cache_key(self, content: str, generate_reply: bool, detailed_analysis: bool) -> str:
+        """
+        Gera a chave do cache a partir do conteúdo normalizado, modelo,
+        versão dos prompts e flags
+        
+        Args:
+            content: Conteúdo do email
+            generate_reply: Se a entrada contém resposta automática
+            detailed_analysis: Se a entrada contém análise detalhada
+            
+        Returns:
+            str: Hash SHA-256 da chave
+        """
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(self.prompt_version.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(f"reply={int(bool(generate_reply))};analysis={int(bool(detailed_analysis))}".encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(self._normalize_content(content).encode("utf-8"))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _project_result(result: Dict, generate_reply: bool, detailed_analysis: bool) -> Dict:
+        """Copia o resultado mantendo apenas os campos solicitados"""
+        projected = copy.deepcopy(result)
+        if not generate_reply:
+            projected.pop("reply", None)
+        if not detailed_analysis:
+            projected.pop("detailed_analysis", None)
+        return projected
+    
+    def _cache_candidates(self, content: str, generate_reply: bool, detailed_analysis: bool) -> List[str]:
+        """
+        Chaves aceitas para a requisição, incluindo entradas que contenham
+        mais campos do que o solicitado (ex.: classificação simples
+        reaproveita uma entrada que também possui resposta)
+        """
+        return [
+            self._cache_key(content, reply, analysis)
+            for reply in ((True,) if generate_reply else (False, True))
+            for analysis in ((True,) if detailed_analysis else (False, True))
+        ]
+    
+    def _get_disk_cached(self, content: str, generate_reply: bool, detailed_analysis: bool) -> Optional[Dict]:
+        """Busca no cache em disco e promove para a memória a entrada encontrada"""
+        if self.disk_cache is None:
+            return None
+        cached = self.disk_cache.get_first(self._cache_candidates(content, generate_reply, detailed_analysis))
+        if cached is None:
+            return None
+        self.cache.set(self._cache_key(content, generate_reply, detailed_analysis), cached)
+        return self._project_result(cached, generate_reply, detailed_analysis)
+    
+    def _get_cached(self, content: str, generate_reply: bool, detailed_analysis: bool) -> Optional[Dict]:
+        """Busca um resultado no cache em memória e, se ausente, no disco"""
+        if self.cache is None:
+            return None
+        cached = self.cache.get_first(self._cache_candidates(content, generate_reply, detailed_analysis))
+        if cached is not None:
+            return self._project_result(cached, generate_reply, detailed_analysis)
+        return self._get_disk_cached(content, generate_reply, detailed_analysis)
+    
+    async def _get_cached_async(self, content: str, generate_reply: bool, detailed_analysis: bool) -> Optional[Dict]:
+        """
+        Igual a _get_cached, mas a leitura em SQLite (que pode esperar até
+        5 s por um lock) roda fora do event loop
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get_first(self._cache_candidates(content, generate_reply, detailed_analysis))
+        if cached is not None:
+            return self._project_result(cached, generate_reply, detailed_analysis)
+        if self.disk_cache is None:
+            return None
+        return await asyncio.to_thread(self._get_disk_cached, content, generate_reply, detailed_analysis)
+    
+    def cache_stats(self) -> Dict:
+        """Retorna os contadores do cache de resultados"""
+        if self.cache is None:
+            return {"enabled": False}
+        stats = {"enabled": True, "prompt_version": self.prompt_version, **self.cache.stats()}
+        stats["disk"] = self.disk_cache.stats() if self.disk_cache is not None else {"enabled": False}
+        return stats
+    
+    def _store_cached(self, content: str, generate_reply: bool, detailed_analysis: bool, result: Dict) -> None:
+        """Armazena no cache (memória e disco) apenas resultados com categoria definida"""
+        if self.cache is not None and result.get("categoria") is not None:
+            key = self._cache_key(content, generate_reply, detailed_analysis)
+            self.cache.set(key, copy.deepcopy(result))
+            if self.disk_cache is not None:
+                self.disk_cache.set(key, result)
+    
+    async def _store_cached_async(self, content: str, generate_reply: bool, detailed_analysis: bool, result: Dict) -> None:
+        """Igual a _store_cached, com a gravação em SQLite fora do event loop"""
+        if self.cache is None or result.get("categoria") is None:
+            return
+        key = self._cache_key(content, generate_reply, detailed_analysis)
+        self.cache.set(key, copy.deepcopy(result))
+        if self.disk_cache is not None:
+            # Serializa uma cópia: o chamador pode alterar o resultado enquanto a thread grava
+            await asyncio.to_thread(self.disk_cache.set, key, copy.deepcopy(result))
+    
+    @property
+    def has_async_client(self) -> bool:
+        """Indica se o SDK instalado oferece o client assíncrono (client.aio)"""
+        return GEMINI_AVAILABLE and hasattr(genai.Client, "aio")
+    
+    def _get_concurrency_limiter(self) -> AIMDLimiter:
+        """
+        Limite adaptativo das chamadas assíncronas simultâneas ao Gemini,
+        entre GEMINI_AIMD_MIN_CONCURRENCY e GEMINI_MAX_CONCURRENCY
+        """
+        if self._concurrency is None:
+            self._concurrency = AIMDLimiter(
+                initial=settings.GEMINI_AIMD_INITIAL_CONCURRENCY,
+                minimum=settings.GEMINI_AIMD_MIN_CONCURRENCY,
+                maximum=settings.GEMINI_MAX_CONCURRENCY,
+            )
+        return self._concurrency
+    
+    def _reserve_quota(self, prompt: str) -> tuple:
+        """
+        Debita uma requisição e a estimativa de tokens das cotas por minuto
+        
+        Returns:
+            tuple: (segundos a aguardar, tokens estimados)
+        """
+        estimated = estimate_tokens(prompt) + settings.GEMINI_EXPECTED_OUTPUT_TOKENS
+        wait = max(self.rpm_bucket.reserve(1), self.tpm_bucket.reserve(estimated))
+        return wait, estimated
+    
+    def _settle_tokens(self, response, estimated: int) -> None:
+        """Corrige a cota de tokens com o uso real informado pela API"""
+        usage = getattr(response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None)
+        if isinstance(actual, int):
+            self.tpm_bucket.adjust(actual - estimated)
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Atraso antes de repetir uma chamada que falhou, ou None se o erro não
+        for transitório ou as tentativas tiverem acabado
+        """
+        if not is_retryable_error(error) or attempt >= settings.GEMINI_MAX_RETRIES:
+            return None
+        self.retries += 1
+        return backoff_delay(
+            attempt,
+            base=settings.GEMINI_RETRY_BASE_SECONDS,
+            cap=settings.GEMINI_RETRY_MAX_SECONDS,
+            retry_after=retry_after_seconds(error),
+        )
+    
+    def _final_error(self, error: Exception) -> Exception:
+        """Converte o 429 final em RateLimitedError (a API responde 429, não 500)"""
+        if error_status_code(error) == 429:
+            self.rate_limit_failures += 1
+            return RateLimitedError(
+                "Cota do Gemini excedida; tente novamente em instantes.",
+                retry_after=retry_after_seconds(error),
+            )
+        return error
+    
+    def _generate(
+        self, prompt: str, config: Optional[Dict] = None, call: str = "classify", deadline: Optional[float] = None
+    ) -> str:
+        """
+        Chamada síncrona ao Gemini, respeitando as cotas por minuto e
+        repetindo erros transitórios (429, 5xx) com backoff e jitter
+        
+        Args:
+            prompt: Prompt a ser enviado
+            config: Configuração de geração opcional
+            call: Etapa da chamada nas métricas (classify, structured, analysis, reply)
+            deadline: Prazo (time.monotonic) após o qual não há nova tentativa;
+                quem esperava já desistiu, então a thread deve parar
+            
+        Returns:
+            str: Texto da resposta
+        """
+        kwargs = {"model": self.model_name, "contents": prompt}
+        if config is not None:
+            kwargs["config"] = config
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            wait, estimated = self._reserve_quota(prompt)
+            if wait:
+                record("gemini_quota_wait", wait)
+                time.sleep(wait)
+            try:
+                with span("gemini", call):
+                    response = self.client.models.generate_content(**kwargs)
+            except Exception as e:
+                errors_total.labels("gemini", error_status_code(e) or type(e).__name__).inc()
+                if is_timeout_error(e):
+                    self.timeouts += 1
+                delay = self._retry_delay(e, attempt)
+                if delay is not None and deadline is not None and time.monotonic() + delay >= deadline:
+                    delay = None
+                if delay is None:
+                    gemini_call_seconds.labels(call, "error").observe(time.perf_counter() - started)
+                    final = self._final_error(e)
+                    if final is e:
+                        raise
+                    raise final from e
+                logger.warning("Gemini indisponível (%s); nova tentativa em %.2fs", error_status_code(e) or type(e).__name__, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._settle_tokens(response, estimated)
+            gemini_call_seconds.labels(call, "ok").observe(time.perf_counter() - started)
+            return (getattr(response, "text", "") or "").strip()
+    
+    async def _attempt_async(self, kwargs: Dict, estimated: int, call: str = "classify"):
+        """
+        Uma chamada ao Gemini dentro do limite de concorrência e do timeout
+        por chamada. O limite AIMD reduz em 429/5xx/timeout e cresce com sucessos
+        """
+        limiter = self._get_concurrency_limiter()
+        queued = time.perf_counter()
+        started_at = await limiter.acquire()
+        waited = time.perf_counter() - queued
+        if waited > 0.001:
+            record("gemini_slot_wait", waited)
+        try:
+            with span("gemini", call):
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(**kwargs),
+                    settings.GEMINI_CALL_TIMEOUT_SECONDS,
+                )
+        except Exception as e:
+            errors_total.labels("gemini", error_status_code(e) or type(e).__name__).inc()
+            if is_timeout_error(e):
+                self.timeouts += 1
+            if is_retryable_error(e):
+                self.overloads += 1
+                limiter.on_overload(started_at)
+            raise
+        finally:
+            limiter.release()
+        limiter.on_success()
+        self._settle_tokens(response, estimated)
+        return response
+    
+    def _reserve_hedge_quota(self, estimated: int) -> bool:
+        """Debita a cota da cópia apenas se houver saldo imediato"""
+        if not self.rpm_bucket.try_reserve(1):
+            return False
+        if not self.tpm_bucket.try_reserve(estimated):
+            self.rpm_bucket.adjust(-1)
+            return False
+        return True
+    
+    async def _generate_async(self, prompt: str, config: Optional[Dict] = None, hedge: bool = False, call: str = "classify") -> str:
+        """
+        Chamada assíncrona ao Gemini usando o client nativo do SDK (client.aio),
+        com as mesmas cotas e retentativas de _generate
+        
+        Args:
+            prompt: Prompt a ser enviado
+            config: Configuração de geração opcional
+            hedge: Permite enviar uma cópia se a chamada demorar (GEMINI_HEDGE_ENABLED)
+            call: Etapa da chamada nas métricas (classify, structured, analysis, reply)
+            
+        Returns:
+            str: Texto da resposta
+        """
+        kwargs = {"model": self.model_name, "contents": prompt}
+        if config is not None:
+            kwargs["config"] = config
+        hedger = self.hedger if hedge else None
+        attempt = 0
+        started = time.perf_counter()
+        while True:
+            wait, estimated = self._reserve_quota(prompt)
+            if wait:
+                record("gemini_quota_wait", wait)
+                await asyncio.sleep(wait)
+            try:
+                if hedger is not None:
+                    response = await hedger.run(
+                        lambda: self._attempt_async(kwargs, estimated, call),
+                        can_hedge=lambda: self._reserve_hedge_quota(estimated),
+                    )
+                else:
+                    response = await self._attempt_async(kwargs, estimated, call)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    gemini_call_seconds.labels(call, "error").observe(time.perf_counter() - started)
+                    final = self._final_error(e)
+                    if final is e:
+                        raise
+                    raise final from e
+                logger.warning("Gemini indisponível (%s); nova tentativa em %.2fs", error_status_code(e) or type(e).__name__, delay)
+            else:
+                gemini_call_seconds.labels(call, "ok").observe(time.perf_counter() - started)
+                return (getattr(response, "text", "") or "").strip()
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    def rate_limit_stats(self) -> Dict:
+        """Estado das cotas, da concorrência adaptativa e das retentativas"""
+        return {
+            "requests_per_minute": self.rpm_bucket.stats(),
+            "tokens_per_minute": self.tpm_bucket.stats(),
+            "concurrency": self._concurrency.stats() if self._concurrency is not None else None,
+            "retries": self.retries,
+            "overloads": self.overloads,
+            "rate_limit_failures": self.rate_limit_failures,
+            "timeouts": self.timeouts,
+            "call_timeout_seconds": settings.GEMINI_CALL_TIMEOUT_SECONDS,
+            "hedging": self.hedger.stats() if self.hedger is not None else {"enabled": False},
+        }
+    
+    def _build_branch_prompts(self, content: str, categoria: str, generate_reply: bool, detailed_analysis: bool) -> Dict[str, str]:
+        """Prompts das etapas que dependem apenas da categoria já conhecida"""
+        branches = {}
+        if detailed_analysis:
+            branches["detailed_analysis"] = self._build_detailed_analysis_prompt(content, categoria)
+        if generate_reply:
+            branches["reply"] = self._build_reply_prompt(content, categoria)
+        return branches
+    
+    def _run_branches(self, branches: Dict[str, str]) -> Dict[str, object]:
+        """
+        Executa as etapas em paralelo no executor dedicado, com timeout por etapa
+        
+        Args:
+            branches: Mapa campo -> prompt
+            
+        Returns:
+            Dict: Mapa campo -> texto gerado ou exceção da etapa
+        """
+        if not branches:
+            return {}
+        timeout = settings.GEMINI_BRANCH_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+        futures = {
+            field: _branch_executor.submit(
+                traced_callable(self._generate, prompt, None, BRANCH_CALLS[field], deadline)
+            )
+            for field, prompt in branches.items()
+        }
+        # Todas as etapas começam juntas, então um único prazo vale para cada uma
+        concurrent.futures.wait(futures.values(), timeout=timeout)
+        outcomes = {}
+        for field, future in futures.items():
+            if not future.done():
+                # cancel() só tira da fila etapas que ainda não começaram: uma
+                # thread em andamento não é interrompida. Ela termina no timeout
+                # HTTP do SDK (GEMINI_CALL_TIMEOUT_SECONDS) e não faz novas
+                # tentativas depois do prazo, o que limita a ocupação do executor
+                future.cancel()
+                outcomes[field] = TimeoutError(f"tempo limite de {timeout}s excedido")
+            elif future.exception() is not None:
+                outcomes[field] = future.exception()
+            else:
+                outcomes[field] = future.result()
+        return outcomes
+    
+    async def _run_branches_async(self, branches: Dict[str, str]) -> Dict[str, object]:
+        """Versão assíncrona de _run_branches usando asyncio.gather"""
+        if not branches:
+            return {}
+        timeout = settings.GEMINI_BRANCH_TIMEOUT_SECONDS
+        
+        async def _branch(field: str, prompt: str):
+            try:
+                return await asyncio.wait_for(self._generate_async(prompt, call=BRANCH_CALLS[field]), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"tempo limite de {timeout}s excedido")
+        
+        results = await asyncio.gather(
+            *(_branch(field, prompt) for field, prompt in branches.items()),
+            return_exceptions=True,
+        )
+        return dict(zip(branches.keys(), results))
+    
+    @staticmethod
+    def _merge_branches(result: Dict, outcomes: Dict[str, object]) -> None:
+        """
+        Incorpora as etapas ao resultado. Se todas falharem, propaga o erro;
+        se apenas algumas falharem, devolve resultado parcial com 'partial_errors'
+        """
+        errors = {field: value for field, value in outcomes.items() if isinstance(value, BaseException)}
+        if errors and len(errors) == len(outcomes):
+            raise next(iter(errors.values()))
+        for field, value in outcomes.items():
+            if field in errors:
+                logger.warning("Etapa '%s' falhou: %s", field, value)
+            else:
+                result[field] = value
+        if errors:
+            result["partial_errors"] = {field: str(exc) or type(exc).__name__ for field, exc in errors.items()}
+    
     def classify_email(self, content: str, generate_reply: bool = False, detailed_analysis: bool = False) -> Dict:
         """
         Classifica um email e opcionalmente gera uma resposta
@@ -163,11 +946,55 @@ RESPOSTA:
         Returns:
             Dict: Resultado da classificação com keys: 'categoria', 'gemini_raw' e opcionalmente 'reply'
         """
+        cached = self._get_cached(content, generate_reply, detailed_analysis)
+        if cached is not None:
+            return cached
+        
         try:
             result = self._call_gemini_classify_and_optional_reply(content, generate_reply, detailed_analysis)
-            return result
+        except RateLimitedError:
+            raise
         except Exception as e:
-            raise RuntimeError(f"Erro ao chamar Gemini AI: {e}")
+            raise RuntimeError(f"Erro ao chamar Gemini AI: {e}") from e
+        
+        if "partial_errors" not in result:
+            self._store_cached(content, generate_reply, detailed_analysis, result)
+        return result
+    
+    async def classify_email_async(self, content: str, generate_reply: bool = False, detailed_analysis: bool = False) -> Dict:
+        """
+        Classifica um email de forma nativamente assíncrona, sem ocupar uma
+        thread do executor por chamada em andamento
+        
+        Args:
+            content: Conteúdo do email
+            generate_reply: Se deve gerar uma resposta automática
+            detailed_analysis: Se deve gerar análise detalhada
+            
+        Returns:
+            Dict: Resultado da classificação com keys: 'categoria', 'gemini_raw' e opcionalmente 'reply'
+        """
+        cached = await self._get_cached_async(content, generate_reply, detailed_analysis)
+        if cached is not None:
+            return cached
+        
+        try:
+            if self.micro_batcher is not None and not generate_reply and not detailed_analysis:
+                result = await self.micro_batcher.submit(content)
+            else:
+                result = await self._call_gemini_classify_and_optional_reply_async(content, generate_reply, detailed_analysis)
+        except RateLimitedError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Erro ao chamar Gemini AI: {e}") from e
+        
+        if "partial_errors" not in result:
+            await self._store_cached_async(content, generate_reply, detailed_analysis, result)
+        return result
+    
+    async def classify_single_async(self, content: str) -> Dict:
+        """Classificação simples de um único email, sem cache nem micro-lote"""
+        return await self._call_gemini_classify_and_optional_reply_async(content, False, False)
     
     def _call_gemini_classify_and_optional_reply(self, content: str, generate_reply: bool, detailed_analysis: bool = False) -> Dict:
         """
@@ -180,17 +1007,15 @@ RESPOSTA:
         Returns:
             Dict: Resultado da classificação com keys: 'categoria', 'gemini_raw' e opcionalmente 'reply'
         """
-        # Prompt de classificação
-        classify_prompt = self._build_classify_prompt(content)
+        # Caminho principal: uma única chamada com saída estruturada.
+        # O parsing em texto livre abaixo fica apenas como fallback.
+        if settings.GEMINI_STRUCTURED_OUTPUT:
+            result = self._call_gemini_structured(content, generate_reply, detailed_analysis)
+            if result is not None:
+                return result
         
-        # Chamada à API do Gemini
-        response = self.client.models.generate_content(
-            model=self.model_name, 
-            contents=classify_prompt
-        )
-        label_text = (getattr(response, "text", "") or "").strip()
-        
-        # Normaliza a classificação
+        # Chamada de classificação e normalização da resposta
+        label_text = self._generate(self._build_classify_prompt(content))
         classification_result = self._normalize_classification(label_text)
         categoria = classification_result.get("categoria")
         prioridade = classification_result.get("prioridade")
@@ -201,25 +1026,33 @@ RESPOSTA:
             "gemini_raw": label_text
         }
         
-        # Gera análise detalhada opcional
-        if detailed_analysis and categoria is not None:
-            analysis_prompt = self._build_detailed_analysis_prompt(content, categoria)
-            analysis_response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=analysis_prompt
-            )
-            analysis_text = (getattr(analysis_response, "text", "") or "").strip()
-            result["detailed_analysis"] = analysis_text
-        
-        # Gera resposta opcional
-        if generate_reply and categoria is not None:
-            reply_prompt = self._build_reply_prompt(content, categoria)
-            reply_response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=reply_prompt
-            )
-            reply_text = (getattr(reply_response, "text", "") or "").strip()
-            result["reply"] = reply_text
+        # Análise detalhada e resposta são independentes: rodam em paralelo
+        if categoria is not None:
+            branches = self._build_branch_prompts(content, categoria, generate_reply, detailed_analysis)
+            self._merge_branches(result, self._run_branches(branches))
+        
+        return result
+    
+    async def _call_gemini_classify_and_optional_reply_async(self, content: str, generate_reply: bool, detailed_analysis: bool = False) -> Dict:
+        """Versão assíncrona de _call_gemini_classify_and_optional_reply"""
+        if settings.GEMINI_STRUCTURED_OUTPUT:
+            result = await self._call_gemini_structured_async(content, generate_reply, detailed_analysis)
+            if result is not None:
+                return result
+        
+        label_text = await self._generate_async(self._build_classify_prompt(content), hedge=True)
+        classification_result = self._normalize_classification(label_text)
+        categoria = classification_result.get("categoria")
+        
+        result = {
+            "categoria": categoria,
+            "prioridade": classification_result.get("prioridade"),
+            "gemini_raw": label_text
+        }
+        
+        if categoria is not None:
+            branches = self._build_branch_prompts(content, categoria, generate_reply, detailed_analysis)
+            self._merge_branches(result, await self._run_branches_async(branches))
         
         return result
     
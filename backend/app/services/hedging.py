@@ -0,0 +1,137 @@
+"""
+Requisições "hedged": uma cópia da chamada é disparada quando a original
+passa do percentil de latência recente, e vale a que responder primeiro
+"""
+import asyncio
+import collections
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.rate_limiter import TokenBucket
+
+
+class LatencyTracker:
+    """Janela deslizante das latências observadas, com percentis sob demanda"""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.min_samples = max(1, min_samples)
+        self._samples: "collections.deque[float]" = collections.deque(maxlen=max(1, window))
+        self._sorted: Optional[list] = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Percentil q (0-100) da janela atual
+
+        Returns:
+            Optional[float]: Latência em segundos, ou None com poucas amostras
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            index = min(len(self._sorted) - 1, int(len(self._sorted) * q / 100.0))
+            return self._sorted[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class Hedger:
+    """
+    Dispara uma segunda tentativa da mesma chamada quando a primeira não
+    responde até o percentil configurado da latência recente. A primeira
+    resposta bem-sucedida vence e a outra é cancelada. Um orçamento por
+    minuto limita quantas cópias podem ser enviadas.
+    """
+
+    def __init__(self, percentile: float, max_per_minute: float, min_delay_seconds: float, tracker: LatencyTracker):
+        """
+        Args:
+            percentile: Percentil da latência que dispara a cópia (ex.: 95)
+            max_per_minute: Orçamento de cópias por minuto
+            min_delay_seconds: Espera mínima antes de disparar a cópia
+            tracker: Janela de latências usada no cálculo
+        """
+        self.percentile = percentile
+        self.min_delay_seconds = min_delay_seconds
+        self.tracker = tracker
+        self.budget = TokenBucket(max_per_minute, burst=max(1.0, max_per_minute / 10.0))
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Espera antes da cópia, ou None enquanto não há amostras suficientes"""
+        value = self.tracker.percentile(self.percentile)
+        if value is None:
+            return None
+        return max(self.min_delay_seconds, value)
+
+    async def run(self, factory: Callable[[], Awaitable[Any]], can_hedge: Callable[[], bool] = lambda: True) -> Any:
+        """
+        Executa a chamada, com cópia se ela demorar
+
+        Args:
+            factory: Cria uma nova corrotina da chamada a cada invocação
+            can_hedge: Verificação extra antes de enviar a cópia (ex.: cota)
+
+        Returns:
+            Any: Resultado da primeira tentativa bem-sucedida
+        """
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        primary = asyncio.ensure_future(factory())
+        delay = self.hedge_delay()
+        tasks = [primary]
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    # A verificação extra vem antes: recusada, não gasta orçamento
+                    if can_hedge() and self.budget.try_reserve(1):
+                        self.hedges_sent += 1
+                        tasks.append(asyncio.ensure_future(factory()))
+                    else:
+                        self.hedges_skipped += 1
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                        self.tracker.observe(loop.time() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                # Aguarda o cancelamento para a tentativa perdedora não seguir
+                # rodando (e segurando a conexão) depois do retorno
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "percentile": self.percentile,
+            "current_delay_seconds": self.hedge_delay(),
+            "samples": len(self.tracker),
+            "calls": self.calls,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "hedges_skipped": self.hedges_skipped,
+            "budget_per_minute": self.budget.per_minute,
+        }
@@ -0,0 +1,286 @@
+"""
+Fila de jobs de classificação processada em segundo plano
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.email_service import EmailService, email_service
+from app.services.job_store import (
+    CALLBACK_DELIVERED,
+    CALLBACK_FAILED,
+    JOB_FAILED,
+    JOB_SUCCEEDED,
+    JobStore,
+)
+from app.services.rate_limiter import RateLimitedError
+from app.utils.responses import build_classification_response
+from app.utils.webhooks import post_json, validate_callback_url
+
+logger = logging.getLogger("autou")
+
+# Tempo em que a contagem de jobs por estado é reaproveitada entre coletas
+COUNTS_TTL_SECONDS = 5.0
+
+
+def job_status_payload(job: Dict) -> Dict:
+    """
+    Representação pública de um job (resposta do polling e corpo do webhook)
+
+    Args:
+        job: Job lido do JobStore
+
+    Returns:
+        Dict: Id, estado, datas e resultado ou erro
+    """
+    data = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == JOB_SUCCEEDED:
+        data["result"] = job["result"]
+    elif job["status"] == JOB_FAILED:
+        data["error"] = job["error"]
+    if job.get("callback_url"):
+        data["callback"] = {"url": job["callback_url"], "status": job["callback_status"]}
+    return data
+
+
+class JobQueue:
+    """
+    Processa jobs com um número fixo de workers asyncio. O estado fica no
+    JobStore, de modo que jobs na fila ou interrompidos voltam a ser
+    processados quando a aplicação reinicia. Cada job em execução tem um
+    lease renovado periodicamente; uma varredura devolve à fila os jobs cujo
+    lease venceu (processo que morreu no meio da execução).
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        service: EmailService,
+        workers: int,
+        max_attempts: int,
+        callback_timeout_seconds: float,
+        callback_max_attempts: int,
+        lease_seconds: float = 60.0,
+    ):
+        self.store = store
+        self.service = service
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.callback_timeout_seconds = callback_timeout_seconds
+        self.callback_max_attempts = max(1, callback_max_attempts)
+        self.lease_seconds = max(1.0, lease_seconds)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._callback_tasks: set = set()
+        # Jobs reivindicados por este processo e ainda em execução
+        self._active: set = set()
+        self._counts: Optional[Dict[str, int]] = None
+        self._counts_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """Recupera jobs pendentes e inicia os workers"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        purged = await asyncio.to_thread(self.store.purge, settings.JOBS_RETENTION_HOURS)
+        recovered = await asyncio.to_thread(self.store.recover, self.max_attempts)
+        pending = await asyncio.to_thread(self.store.queued)
+        if pending or purged:
+            logger.info(
+                "Jobs: %d na fila (%d com lease vencido), %d antigos removidos", len(pending), len(recovered), purged
+            )
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        for job_id in await asyncio.to_thread(self.store.pending_callbacks):
+            self._schedule_callback(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep_expired()))
+
+    async def stop(self) -> None:
+        """
+        Interrompe os workers. Jobs em execução neste processo voltam para a
+        fila e são retomados no próximo start()
+        """
+        tasks = self._tasks + list(self._callback_tasks)
+        self._tasks = []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit(self, payload: Dict, callback_url: Optional[str] = None) -> Dict:
+        """
+        Registra um job e o coloca na fila
+
+        Args:
+            payload: 'content', 'generate_reply' e 'detailed_analysis'
+            callback_url: URL notificada ao fim do job (opcional)
+
+        Returns:
+            Dict: Job criado
+        """
+        job = self.store.create(payload, callback_url)
+        if self._queue is not None:
+            self._queue.put_nowait(job["id"])
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except Exception:
+                logger.exception("Erro inesperado no job %s", job_id)
+
+    async def _sweep_expired(self) -> None:
+        """Devolve à fila, periodicamente, jobs de processos que pararam no meio"""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                recovered = await asyncio.to_thread(self.store.recover, self.max_attempts)
+            except Exception:
+                logger.exception("Falha ao recuperar jobs com lease vencido")
+                continue
+            for job_id in recovered:
+                logger.warning("Job %s com lease vencido voltou para a fila", job_id)
+                self._queue.put_nowait(job_id)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renova o lease do job enquanto ele executa"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self.store.renew_lease, job_id, self.lease_seconds)
+
+    async def _process(self, job_id: str) -> None:
+        # Só um worker (de qualquer processo) consegue tirar o job da fila
+        job = await asyncio.to_thread(self.store.claim, job_id, self.lease_seconds)
+        if job is None:
+            return
+        self._active.add(job_id)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await self._execute(job)
+        except asyncio.CancelledError:
+            # Parada da aplicação: devolve o job sem esperar o lease vencer
+            self.store.requeue(job_id)
+            raise
+        finally:
+            heartbeat.cancel()
+            self._active.discard(job_id)
+
+    async def _execute(self, job: Dict) -> None:
+        job_id = job["id"]
+        payload = job["payload"]
+        # job["attempts"] já inclui a execução atual
+        can_retry = job["attempts"] < self.max_attempts
+        try:
+            result = await self.service.process_email_request(
+                text=payload["content"],
+                generate_reply=payload.get("generate_reply", False),
+                detailed_analysis=payload.get("detailed_analysis", False),
+            )
+        except RateLimitedError as e:
+            # Cota esgotada não é falha do job: volta para a fila mais tarde
+            if can_retry:
+                await self._retry_later(job_id, e.retry_after or settings.GEMINI_RETRY_MAX_SECONDS)
+                return
+            await asyncio.to_thread(self.store.mark_failed, job_id, str(e))
+        except (ValueError, RuntimeError) as e:
+            await asyncio.to_thread(self.store.mark_failed, job_id, str(e))
+        else:
+            if result.get("stage") != "fallback":
+                await asyncio.to_thread(self.store.mark_succeeded, job_id, build_classification_response(result))
+            elif can_retry:
+                # Resultado degradado não é final: refaz quando o circuito puder fechar
+                await self._retry_later(job_id, settings.CIRCUIT_BREAKER_OPEN_SECONDS)
+                return
+            else:
+                await asyncio.to_thread(
+                    self.store.mark_failed,
+                    job_id,
+                    f"Backend de classificação indisponível ({result['degraded']['reason']}); tentativas esgotadas.",
+                )
+        if job.get("callback_url"):
+            self._schedule_callback(job_id)
+
+    async def _retry_later(self, job_id: str, delay: float) -> None:
+        await asyncio.to_thread(self.store.requeue, job_id)
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job_id)
+
+    def _schedule_callback(self, job_id: str) -> None:
+        task = asyncio.get_running_loop().create_task(self._deliver_callback(job_id))
+        self._callback_tasks.add(task)
+        task.add_done_callback(self._callback_tasks.discard)
+
+    async def _deliver_callback(self, job_id: str) -> None:
+        """Envia o estado final do job à callback_url, com backoff exponencial"""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or not job.get("callback_url"):
+            return
+        # Validada de novo na entrega: o DNS do host pode ter mudado desde o envio
+        try:
+            await asyncio.to_thread(validate_callback_url, job["callback_url"], settings.JOBS_CALLBACK_ALLOWED_HOSTS)
+        except ValueError as e:
+            logger.warning("Webhook do job %s recusado: %s", job_id, e)
+            await asyncio.to_thread(self.store.set_callback_status, job_id, CALLBACK_FAILED)
+            return
+        body = job_status_payload(job)
+        body["callback"]["status"] = CALLBACK_DELIVERED
+        for attempt in range(self.callback_max_attempts):
+            try:
+                await asyncio.to_thread(post_json, job["callback_url"], body, self.callback_timeout_seconds)
+                await asyncio.to_thread(self.store.set_callback_status, job_id, CALLBACK_DELIVERED)
+                return
+            except Exception as e:
+                logger.warning("Webhook do job %s falhou (tentativa %d): %s", job_id, attempt + 1, e)
+                if attempt + 1 < self.callback_max_attempts:
+                    await asyncio.sleep(2 ** attempt)
+        await asyncio.to_thread(self.store.set_callback_status, job_id, CALLBACK_FAILED)
+
+    async def refresh_counts(self) -> Dict[str, int]:
+        """
+        Atualiza a contagem de jobs por estado, com o COUNT no SQLite fora
+        do event loop e reaproveitado por COUNTS_TTL_SECONDS
+        """
+        now = time.monotonic()
+        if self._counts is None or now - self._counts_at >= COUNTS_TTL_SECONDS:
+            self._counts = await asyncio.to_thread(self.store.counts)
+            self._counts_at = now
+        return self._counts
+
+    def cached_counts(self) -> Dict[str, int]:
+        """Última contagem obtida por refresh_counts (vazia antes da primeira)"""
+        return dict(self._counts or {})
+
+    async def stats(self) -> Dict:
+        """Estado da fila para o /health"""
+        return {
+            "workers": self.workers if self.running else 0,
+            "queued_in_memory": self._queue.qsize() if self._queue is not None else 0,
+            "running_here": len(self._active),
+            "callbacks_in_flight": len(self._callback_tasks),
+            "jobs": await self.refresh_counts(),
+        }
+
+
+# Instância singleton da fila
+job_queue = JobQueue(
+    store=JobStore(settings.JOBS_DB_PATH),
+    service=email_service,
+    workers=settings.JOBS_WORKERS,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    callback_timeout_seconds=settings.JOBS_CALLBACK_TIMEOUT_SECONDS,
+    callback_max_attempts=settings.JOBS_CALLBACK_MAX_ATTEMPTS,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+)
@@ -0,0 +1,246 @@
+"""
+Persistência dos jobs de classificação assíncrona em SQLite
+"""
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Estados de um job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Estados da entrega do webhook
+CALLBACK_PENDING = "pending"
+CALLBACK_DELIVERED = "delivered"
+CALLBACK_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    callback_url TEXT,
+    callback_status TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    lease_expires_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _lease_until(seconds: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+class JobStore:
+    """
+    Tabela de jobs em SQLite (modo WAL). Uma conexão compartilhada, protegida
+    por lock; as operações são curtas e locais.
+
+    Vários processos podem usar o mesmo banco: um job só é executado por quem
+    o reivindica (claim) enquanto está na fila, e quem o executa renova um
+    lease. Só jobs com lease vencido (processo morto) voltam para a fila.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Caminho do arquivo SQLite (":memory:" para testes)
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_expires_at" not in columns:
+                # Bancos criados antes do lease
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at TEXT")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._connection().execute(sql, params)
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, payload: Dict, callback_url: Optional[str] = None) -> Dict:
+        """
+        Registra um novo job na fila
+
+        Args:
+            payload: Dados da requisição (conteúdo e opções)
+            callback_url: URL notificada ao fim do job (opcional)
+
+        Returns:
+            Dict: Job criado
+        """
+        job_id = uuid.uuid4().hex
+        now = _now()
+        self._execute(
+            "INSERT INTO jobs (id, status, payload, callback_url, callback_status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_id, JOB_QUEUED, json.dumps(payload, ensure_ascii=False), callback_url,
+                CALLBACK_PENDING if callback_url else None, now, now,
+            ),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Busca um job pelo id"""
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim(self, job_id: str, lease_seconds: float) -> Optional[Dict]:
+        """
+        Reivindica um job da fila para execução. A troca de estado é
+        condicional, então apenas um worker (de qualquer processo) vence
+
+        Args:
+            job_id: Id do job
+            lease_seconds: Validade do lease; renovado com renew_lease()
+
+        Returns:
+            Optional[Dict]: Job já em execução, ou None se não estava na fila
+        """
+        cursor = self._execute(
+            "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (JOB_RUNNING, _lease_until(lease_seconds), _now(), job_id, JOB_QUEUED),
+        )
+        if cursor.rowcount != 1:
+            return None
+        return self.get(job_id)
+
+    def renew_lease(self, job_id: str, lease_seconds: float) -> bool:
+        """Estende o lease de um job em execução (heartbeat do worker)"""
+        cursor = self._execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = ?",
+            (_lease_until(lease_seconds), job_id, JOB_RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def requeue(self, job_id: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (JOB_QUEUED, _now(), job_id),
+        )
+
+    def mark_succeeded(self, job_id: str, result: Dict) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (JOB_SUCCEEDED, json.dumps(result, ensure_ascii=False), _now(), job_id),
+        )
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+            (JOB_FAILED, error, _now(), job_id),
+        )
+
+    def set_callback_status(self, job_id: str, status: str) -> None:
+        self._execute(
+            "UPDATE jobs SET callback_status = ?, updated_at = ? WHERE id = ?",
+            (status, _now(), job_id),
+        )
+
+    def recover(self, max_attempts: int) -> List[str]:
+        """
+        Recupera os jobs interrompidos por uma parada de processo: os que
+        estão em execução com o lease vencido voltam para a fila, a menos que
+        já tenham esgotado as tentativas. Jobs de workers vivos (lease em dia)
+        não são tocados
+
+        Args:
+            max_attempts: Quantidade máxima de execuções por job
+
+        Returns:
+            List[str]: Ids dos jobs devolvidos à fila, do mais antigo ao mais novo
+        """
+        now = _now()
+        # Sem lease (banco anterior ao lease) também conta como vencido
+        expired = "status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ? "
+                    f"WHERE {expired} AND attempts >= ?",
+                    (JOB_FAILED, "Job interrompido repetidamente; tentativas esgotadas.", now, JOB_RUNNING, now, max_attempts),
+                )
+                rows = conn.execute(
+                    f"SELECT id FROM jobs WHERE {expired} ORDER BY created_at", (JOB_RUNNING, now)
+                ).fetchall()
+                conn.execute(
+                    f"UPDATE jobs SET status = ?, lease_expires_at = NULL, updated_at = ? WHERE {expired}",
+                    (JOB_QUEUED, now, JOB_RUNNING, now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [row["id"] for row in rows]
+
+    def queued(self) -> List[str]:
+        """Ids dos jobs na fila, do mais antigo ao mais novo"""
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def pending_callbacks(self) -> List[str]:
+        """Jobs concluídos cujo webhook ainda não foi entregue"""
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND callback_status = ?",
+            (JOB_SUCCEEDED, JOB_FAILED, CALLBACK_PENDING),
+        ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge(self, older_than_hours: float) -> int:
+        """Remove jobs concluídos mais antigos que o prazo de retenção"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=older_than_hours)).isoformat()
+        cursor = self._execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (JOB_SUCCEEDED, JOB_FAILED, cutoff),
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Quantidade de jobs por estado"""
+        rows = self._execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        counts.update({row["status"]: row["total"] for row in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,355 @@
+"""
+Classificador local (primeiro estágio da cascata) baseado em regressão
+logística sobre n-gramas com hashing
+"""
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger("autou")
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+SEED_DATA_PATH = os.path.join(_DATA_DIR, "local_classifier_seed.jsonl")
+# Modelo pré-treinado com o conjunto semente (gerado por train_local_classifier.py)
+DEFAULT_MODEL_PATH = os.path.join(_DATA_DIR, "local_classifier_model.json")
+
+# Incrementar quando extract_features mudar: modelos salvos deixam de valer
+FEATURE_VERSION = 1
+
+# Fração de cada classe separada do treino para ajustar a temperatura
+CALIBRATION_FRACTION = 0.2
+
+# Quantidade de caracteres considerados na extração de features
+MAX_FEATURE_CHARS = 5000
+
+# Palavras-chave já usadas nas heurísticas de classify_test e _normalize_classification
+KEYWORD_CUES = {
+    "produtivo": ("status", "ordem", "preciso", "pedido", "solicito", "reuniao", "prazo", "erro", "problema"),
+    "urgente": ("urgente", "critico", "emergencia", "imediato", "asap"),
+    "media": ("importante", "necessario", "preciso"),
+    "improdutivo": ("parabens", "aniversario", "feliz", "festa", "newsletter", "promocao", "descadastrar"),
+}
+
+
+def _strip_accents(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def extract_features(text: str, n_buckets: int) -> Dict[int, float]:
+    """
+    Extrai features esparsas (unigramas, bigramas, radicais e palavras-chave)
+    mapeadas por hashing para n_buckets posições
+
+    Args:
+        text: Texto do email
+        n_buckets: Dimensão do espaço de features
+
+    Returns:
+        Dict[int, float]: Vetor esparso normalizado (norma L2 = 1)
+    """
+    tokens = re.findall(r"\w+", _strip_accents((text or "")[:MAX_FEATURE_CHARS].lower()))
+    grams: List[str] = []
+    for i, token in enumerate(tokens):
+        grams.append("u:" + token)
+        if len(token) > 5:
+            grams.append("s:" + token[:5])
+        if i > 0:
+            grams.append("b:" + tokens[i - 1] + " " + token)
+    token_set = set(tokens)
+    for cue, words in KEYWORD_CUES.items():
+        if token_set.intersection(words):
+            grams.append("k:" + cue)
+    grams.append("bias")
+
+    features: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % n_buckets
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    return {k: v / norm for k, v in features.items()}
+
+
+def keyword_classify(text: str) -> Dict:
+    """
+    Heurística de palavras-chave de classify_test/_normalize_classification:
+    categoria pela contagem de pistas e prioridade pelas palavras de urgência
+
+    Args:
+        text: Texto do email
+
+    Returns:
+        Dict: 'categoria' (None quando as pistas empatam) e 'prioridade'
+    """
+    tokens = set(re.findall(r"\w+", _strip_accents((text or "")[:MAX_FEATURE_CHARS].lower())))
+    urgent = bool(tokens.intersection(KEYWORD_CUES["urgente"]))
+    productive = len(tokens.intersection(KEYWORD_CUES["produtivo"])) + int(urgent)
+    unproductive = len(tokens.intersection(KEYWORD_CUES["improdutivo"]))
+    categoria = None
+    if productive > unproductive:
+        categoria = "Produtivo"
+    elif unproductive > productive:
+        categoria = "Improdutivo"
+
+    prioridade = "Baixa"
+    if categoria != "Improdutivo":
+        if urgent:
+            prioridade = "Alta"
+        elif tokens.intersection(KEYWORD_CUES["media"]):
+            prioridade = "Média"
+    return {"categoria": categoria, "prioridade": prioridade}
+
+
+class SoftmaxModel:
+    """Regressão logística multinomial esparsa com escala de temperatura"""
+
+    def __init__(self, classes: Sequence[str]):
+        self.classes = list(classes)
+        self.weights: List[Dict[int, float]] = [dict() for _ in self.classes]
+        self.temperature = 1.0
+
+    def logits(self, features: Dict[int, float]) -> List[float]:
+        return [sum(w.get(k, 0.0) * v for k, v in features.items()) for w in self.weights]
+
+    @staticmethod
+    def _softmax(logits: List[float], temperature: float = 1.0) -> List[float]:
+        scaled = [z / temperature for z in logits]
+        top = max(scaled)
+        exps = [math.exp(z - top) for z in scaled]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict_proba(self, features: Dict[int, float]) -> List[float]:
+        return self._softmax(self.logits(features), self.temperature)
+
+    def fit(
+        self,
+        samples: Sequence[Tuple[Dict[int, float], str]],
+        epochs: int = 40,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 13,
+    ) -> "SoftmaxModel":
+        """Treina por SGD com regularização L2"""
+        rng = random.Random(seed)
+        order = list(range(len(samples)))
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            lr = learning_rate / (1.0 + 0.1 * epoch)
+            for i in order:
+                features, label = samples[i]
+                target = self.classes.index(label)
+                probs = self._softmax(self.logits(features))
+                for c, weights in enumerate(self.weights):
+                    grad = probs[c] - (1.0 if c == target else 0.0)
+                    for k, v in features.items():
+                        w = weights.get(k, 0.0)
+                        weights[k] = w - lr * (grad * v + l2 * w)
+        return self
+
+    def calibrate(self, logits: Sequence[List[float]], labels: Sequence[str]) -> None:
+        """
+        Ajusta a temperatura minimizando a log-loss. Os logits precisam ser
+        deste mesmo modelo em exemplos que ficaram fora do treino. A
+        temperatura só suaviza (T >= 1): com poucos exemplos separados, todos
+        acertados, a log-loss sempre favoreceria deixar o modelo mais confiante
+        """
+        best_t, best_loss = 1.0, float("inf")
+        for step in range(10, 61):
+            t = step * 0.1
+            loss = 0.0
+            for z, label in zip(logits, labels):
+                p = self._softmax(z, t)[self.classes.index(label)]
+                loss -= math.log(max(p, 1e-12))
+            if loss < best_loss:
+                best_t, best_loss = t, loss
+        self.temperature = best_t
+
+    def to_dict(self) -> Dict:
+        return {
+            "classes": self.classes,
+            "temperature": self.temperature,
+            "weights": [{str(k): v for k, v in w.items() if v} for w in self.weights],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SoftmaxModel":
+        model = cls(data["classes"])
+        model.temperature = float(data.get("temperature", 1.0))
+        model.weights = [{int(k): float(v) for k, v in w.items()} for w in data["weights"]]
+        return model
+
+
+def _train_calibrated(
+    features: List[Dict[int, float]], labels: List[str], classes: Sequence[str], seed: int = 13
+) -> SoftmaxModel:
+    """
+    Separa CALIBRATION_FRACTION de cada classe, treina o modelo com o resto e
+    ajusta a temperatura do próprio modelo nos exemplos separados. Classes
+    com menos de 5 exemplos ficam inteiras no treino; sem exemplos separados,
+    a temperatura fica em 1 (probabilidades não calibradas)
+    """
+    rng = random.Random(seed)
+    held_out = set()
+    for label in classes:
+        indices = [i for i, l in enumerate(labels) if l == label]
+        if len(indices) < 5:
+            continue
+        rng.shuffle(indices)
+        held_out.update(indices[:max(1, round(len(indices) * CALIBRATION_FRACTION))])
+    train = [(f, l) for i, (f, l) in enumerate(zip(features, labels)) if i not in held_out]
+    model = SoftmaxModel(classes).fit(train)
+    if held_out:
+        model.calibrate([model.logits(features[i]) for i in sorted(held_out)], [labels[i] for i in sorted(held_out)])
+    return model
+
+
+class LocalClassifier:
+    """
+    Classificador local de categoria e prioridade. A confiança é o softmax
+    com temperatura ajustada em exemplos separados do treino; com o conjunto
+    semente (poucas dezenas de exemplos) é uma estimativa grosseira, e o
+    LOCAL_CLASSIFIER_THRESHOLD deve ser validado com dados reais
+    """
+
+    def __init__(self, n_buckets: int = 1 << 18):
+        self.n_buckets = n_buckets
+        self.category_model: Optional[SoftmaxModel] = None
+        self.priority_model: Optional[SoftmaxModel] = None
+        self._lock = threading.Lock()
+
+    def train(self, examples: Iterable[Dict]) -> "LocalClassifier":
+        """
+        Treina os modelos de categoria e prioridade
+
+        Args:
+            examples: Dicts com 'text', 'categoria' e 'prioridade'
+
+        Returns:
+            LocalClassifier: A própria instância treinada
+        """
+        examples = [e for e in examples if e.get("text") and e.get("categoria")]
+        if not examples:
+            raise ValueError("Nenhum exemplo de treino para o classificador local.")
+        features = [extract_features(e["text"], self.n_buckets) for e in examples]
+        self.category_model = _train_calibrated(
+            features, [e["categoria"] for e in examples], ("Produtivo", "Improdutivo")
+        )
+        with_priority = [(f, e["prioridade"]) for f, e in zip(features, examples) if e.get("prioridade")]
+        self.priority_model = _train_calibrated(
+            [f for f, _ in with_priority], [p for _, p in with_priority], ("Alta", "Média", "Baixa")
+        )
+        return self
+
+    @staticmethod
+    def load_examples(path: str) -> List[Dict]:
+        """Lê exemplos de treino de um arquivo JSONL"""
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def save(self, path: str) -> None:
+        """Salva os pesos treinados em JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "feature_version": FEATURE_VERSION,
+                    "n_buckets": self.n_buckets,
+                    "category": self.category_model.to_dict(),
+                    "priority": self.priority_model.to_dict(),
+                },
+                f,
+            )
+
+    def load(self, path: str) -> "LocalClassifier":
+        """
+        Carrega pesos salvos por save()
+
+        Raises:
+            ValueError: Se o modelo foi salvo com outra versão das features
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("feature_version") != FEATURE_VERSION:
+            raise ValueError(f"Modelo local em {path} usa outra versão das features; gere-o novamente.")
+        self.n_buckets = int(data["n_buckets"])
+        self.category_model = SoftmaxModel.from_dict(data["category"])
+        self.priority_model = SoftmaxModel.from_dict(data["priority"])
+        return self
+
+    def _ensure_ready(self) -> None:
+        """
+        Carrega o modelo configurado (ou o pré-treinado que acompanha o
+        código); só treina com o conjunto semente se nenhum puder ser lido
+        """
+        if self.category_model is not None:
+            return
+        with self._lock:
+            if self.category_model is not None:
+                return
+            model_path = settings.LOCAL_CLASSIFIER_MODEL_PATH or DEFAULT_MODEL_PATH
+            try:
+                self.load(model_path)
+                logger.info("Classificador local carregado de %s", model_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Modelo local indisponível (%s); treinando com o conjunto semente", e)
+                self.train(self.load_examples(SEED_DATA_PATH))
+
+    def predict(self, text: str) -> Dict:
+        """
+        Classifica um email localmente
+
+        Args:
+            text: Conteúdo do email
+
+        Returns:
+            Dict: 'categoria', 'prioridade' e 'confidence' (produto das
+            probabilidades de categoria e prioridade)
+        """
+        self._ensure_ready()
+        features = extract_features(text, self.n_buckets)
+
+        category_probs = self.category_model.predict_proba(features)
+        c = max(range(len(category_probs)), key=category_probs.__getitem__)
+        categoria = self.category_model.classes[c]
+
+        priority_probs = self.priority_model.predict_proba(features)
+        p = max(range(len(priority_probs)), key=priority_probs.__getitem__)
+        prioridade = self.priority_model.classes[p]
+
+        return {
+            "categoria": categoria,
+            "prioridade": prioridade,
+            "confidence": round(category_probs[c] * priority_probs[p], 4),
+            "category_confidence": round(category_probs[c], 4),
+            "priority_confidence": round(priority_probs[p], 4),
+        }
+
+    def predict_degraded(self, text: str) -> Dict:
+        """
+        Classificação de contingência quando o backend remoto está fora:
+        palavras-chave primeiro e o modelo apenas para desempatar
+
+        Args:
+            text: Conteúdo do email
+
+        Returns:
+            Dict: 'categoria', 'prioridade' e 'method' ('keywords' ou 'model')
+        """
+        result = keyword_classify(text)
+        if result["categoria"] is not None:
+            return {**result, "method": "keywords"}
+        predicted = self.predict(text)
+        return {"categoria": predicted["categoria"], "prioridade": predicted["prioridade"], "method": "model"}
+
+
+# Instância singleton do classificador
+local_classifier = LocalClassifier()
@@ -0,0 +1,139 @@
+"""
+Dispatcher de micro-lotes: agrupa classificações simultâneas em um único prompt
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.services.rate_limiter import RateLimitedError
+from app.utils.text import estimate_tokens, truncate_to_budget
+from app.utils.tracing import detach_trace, span
+
+logger = logging.getLogger("autou")
+
+
+class MicroBatchDispatcher:
+    """
+    Agrupa pedidos de classificação simples (sem resposta nem análise) que
+    chegam dentro de uma janela curta e os envia ao Gemini como um único
+    prompt com emails numerados. Itens cuja resposta não puder ser
+    interpretada são refeitos individualmente.
+    """
+
+    def __init__(self, service, window_seconds: float, max_items: int, max_tokens: int):
+        """
+        Args:
+            service: GeminiService usado para as chamadas
+            window_seconds: Tempo máximo de espera para completar um lote
+            max_items: Quantidade máxima de emails por lote
+            max_tokens: Orçamento aproximado de tokens de entrada por lote
+        """
+        self.service = service
+        self.window_seconds = max(0.0, window_seconds)
+        self.max_items = max(1, max_items)
+        self.max_tokens = max(1, max_tokens)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.batches_sent = 0
+        self.items_batched = 0
+        self.fallbacks = 0
+
+    async def submit(self, content: str) -> Dict:
+        """
+        Enfileira um email para o próximo lote e aguarda seu resultado
+
+        Args:
+            content: Conteúdo do email
+
+        Returns:
+            Dict: Resultado da classificação
+        """
+        tokens = estimate_tokens(truncate_to_budget(content))
+        if tokens >= self.max_tokens:
+            # Email grande demais para dividir o orçamento com outros
+            return await self.service.classify_single_async(content)
+
+        loop = asyncio.get_running_loop()
+        if self._pending_tokens + tokens > self.max_tokens:
+            self._flush()
+
+        future = loop.create_future()
+        self._pending.append((content, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+
+        # Inclui a janela de espera: é o tempo que esta requisição ficou no lote
+        with span("gemini", "classify_batch"):
+            return await future
+
+    def _flush(self) -> None:
+        """Despacha o lote pendente em uma task separada"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(content, future) for content, future in self._pending if not future.done()]
+        self._pending = []
+        self._pending_tokens = 0
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Envia o lote e distribui os resultados aos chamadores"""
+        # A task herdou o contexto de uma das requisições; o lote é de todas
+        detach_trace()
+        results: List[Optional[Dict]] = [None] * len(batch)
+        if len(batch) > 1:
+            try:
+                results = await self.service.classify_many_async([content for content, _ in batch])
+                self.batches_sent += 1
+                self.items_batched += len(batch)
+            except RateLimitedError as e:
+                # Refazer item a item só multiplicaria as chamadas sob cota esgotada
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            except Exception as e:
+                logger.warning("Falha no micro-lote de %d emails: %s", len(batch), e)
+
+        retries = []
+        for (content, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if result is not None:
+                future.set_result(result)
+            else:
+                retries.append(self._classify_single(content, future))
+        if retries:
+            if len(batch) > 1:
+                self.fallbacks += len(retries)
+            await asyncio.gather(*retries)
+
+    async def _classify_single(self, content: str, future: asyncio.Future) -> None:
+        """Classifica um item individualmente e resolve seu future"""
+        try:
+            result = await self.service.classify_single_async(content)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Contadores do dispatcher"""
+        return {
+            "batches_sent": self.batches_sent,
+            "items_batched": self.items_batched,
+            "fallbacks": self.fallbacks,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,282 @@
+"""
+Controle de vazão das chamadas ao Gemini: token buckets de requisições e
+tokens por minuto, concorrência adaptativa (AIMD) e retentativas com jitter
+"""
+import asyncio
+import collections
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    import httpx  # usado pelo SDK do Gemini
+    _TIMEOUT_ERRORS = (asyncio.TimeoutError, TimeoutError, httpx.TimeoutException)
+    _TRANSIENT_ERRORS = _TIMEOUT_ERRORS + (ConnectionError, httpx.NetworkError)
+except Exception:
+    _TIMEOUT_ERRORS = (asyncio.TimeoutError, TimeoutError)
+    _TRANSIENT_ERRORS = _TIMEOUT_ERRORS + (ConnectionError,)
+
+# Códigos HTTP que indicam sobrecarga/cota e justificam nova tentativa
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_RETRY_DELAY_PATTERN = re.compile(r"^\s*([\d.]+)\s*s\s*$")
+
+
+class RateLimitedError(RuntimeError):
+    """Cota do provedor esgotada mesmo após as retentativas"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """Código HTTP de um erro do SDK (APIError.code) ou de clientes HTTP comuns"""
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_timeout_error(error: BaseException) -> bool:
+    """Timeout da chamada (asyncio.wait_for ou do client HTTP do SDK)"""
+    return isinstance(error, _TIMEOUT_ERRORS)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Erros de cota (429), 5xx e timeouts/falhas de rede podem ser repetidos"""
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    return error_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def is_transient_failure(error: BaseException) -> bool:
+    """
+    Falha passageira do backend (timeout, rede, 429/5xx), procurando também
+    nos erros encadeados: o GeminiService embrulha a causa em RuntimeError.
+    Chave ausente, configuração ou requisição inválida não são passageiras
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if is_retryable_error(error):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Atraso sugerido pelo servidor: cabeçalho Retry-After ou o RetryInfo
+    ("retryDelay": "7s") do corpo de erro da API do Google
+
+    Returns:
+        Optional[float]: Segundos a aguardar, se informado
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            value = headers.get("retry-after")
+        except Exception:
+            value = None
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details")
+    if isinstance(details, list):
+        for item in details:
+            delay = item.get("retryDelay") if isinstance(item, dict) else None
+            match = _RETRY_DELAY_PATTERN.match(delay) if isinstance(delay, str) else None
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Atraso antes da próxima tentativa: "full jitter" exponencial, ou o
+    Retry-After do servidor acrescido de um jitter para dessincronizar clientes
+
+    Args:
+        attempt: Tentativa que falhou (0 = primeira)
+        base: Atraso base em segundos
+        cap: Atraso máximo em segundos
+        retry_after: Atraso sugerido pelo servidor (opcional)
+
+    Returns:
+        float: Segundos a aguardar
+    """
+    if retry_after is not None:
+        return min(cap, retry_after) + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Token bucket por minuto com reserva antecipada: cada chamada debita o
+    custo na hora (o saldo pode ficar negativo) e recebe o tempo que deve
+    esperar. Assim as esperas ficam enfileiradas em ordem de chegada, sem
+    vários chamadores acordando ao mesmo tempo para disputar o saldo.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        """
+        Args:
+            per_minute: Reposição por minuto (0 = sem limite)
+            burst: Saldo máximo acumulado (padrão: um segundo de cota, no mínimo 1)
+        """
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        self.capacity = float(burst) if burst is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Debita o custo e retorna quantos segundos o chamador deve aguardar
+
+        Args:
+            amount: Custo da chamada. Acima da capacidade, o excedente vira
+                dívida: o chamador espera até ela ser paga e os próximos
+                esperam atrás dele
+
+        Returns:
+            float: Espera em segundos (0 se havia saldo)
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= float(amount)
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            self.waited_seconds += wait
+            return wait
+
+    def try_reserve(self, amount: float = 1.0) -> bool:
+        """Debita o custo apenas se houver saldo imediato (sem espera)"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def adjust(self, delta: float) -> None:
+        """Corrige o saldo após a chamada (ex.: tokens reais x estimados)"""
+        if not self.enabled or not delta:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "per_minute": self.per_minute,
+                "available": round(self._tokens, 1),
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+class AIMDLimiter:
+    """
+    Limite de concorrência adaptativo (aumento aditivo, redução
+    multiplicativa): cada sucesso soma 1/limite (≈ +1 por rodada de
+    chamadas) e cada sobrecarga multiplica o limite pelo fator de redução.
+    Só chamadas iniciadas depois da última redução podem reduzi-lo de novo,
+    para que uma rajada de 429 simultâneos conte como um único sinal.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease_factor: float = 0.5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._waiters: "collections.deque[asyncio.Future]" = collections.deque()
+        self._last_decrease = 0.0
+        self.decreases = 0
+
+    async def acquire(self) -> float:
+        """
+        Aguarda uma vaga dentro do limite atual
+
+        Returns:
+            float: Instante (monotônico) em que a vaga foi obtida, usado em on_overload
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A vaga já tinha sido concedida: devolve
+                self.release()
+            else:
+                # _wake() pode já ter descartado o future cancelado
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+        return time.monotonic()
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_overload(self, started_at: float) -> None:
+        if started_at < self._last_decrease:
+            return
+        self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "min": self.minimum,
+            "max": self.maximum,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "decreases": self.decreases,
+        }
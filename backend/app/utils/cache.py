@@ -0,0 +1,106 @@
+"""
+Cache em memória com evicção LRU e expiração por TTL
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+
+class TTLCache:
+    """Cache LRU thread-safe com tempo de vida por entrada"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max(0, int(max_size))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Busca um valor no cache
+
+        Args:
+            key: Chave da entrada
+
+        Returns:
+            Optional[Any]: Valor armazenado ou None se ausente/expirado
+        """
+        return self.get_first((key,))
+
+    def get_first(self, keys: Iterable[Hashable]) -> Optional[Any]:
+        """
+        Retorna o valor da primeira chave presente, contabilizando um único
+        hit ou miss para a consulta inteira
+
+        Args:
+            keys: Chaves candidatas, em ordem de preferência
+
+        Returns:
+            Optional[Any]: Valor armazenado ou None se nenhuma chave for válida
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                expires_at, value = item
+                if self.ttl_seconds > 0 and expires_at < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    continue
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Armazena um valor, removendo as entradas menos usadas se necessário
+
+        Args:
+            key: Chave da entrada
+            value: Valor a ser armazenado
+        """
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove todas as entradas do cache"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            Dict: Tamanho, limite, hits, misses, evicções e taxa de acerto
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,187 @@
+"""
+Pré-processamento de emails antes da classificação: remove histórico citado,
+assinaturas e avisos legais e aplica o orçamento de tokens
+"""
+import re
+from typing import Dict, List, Optional
+
+from app.utils.text import estimate_tokens, truncate_head_tail
+
+# Cabeçalhos que iniciam o histórico de uma resposta ou encaminhamento;
+# tudo a partir deles é descartado
+_QUOTE_HEADER_PATTERNS = [
+    re.compile(r"^\s*Em .{0,200}escreveu:?\s*$", re.IGNORECASE),
+    re.compile(r"^\s*On .{0,200}wrote:?\s*$", re.IGNORECASE),
+    re.compile(r"^\s*-{2,}\s*(Mensagem original|Original Message|Mensagem encaminhada|Forwarded message)\s*-{2,}\s*$", re.IGNORECASE),
+    re.compile(r"^\s*_{10,}\s*$"),
+]
+
+# Bloco de cabeçalho do Outlook ("De: ... / Enviado: ...") no início do histórico
+_OUTLOOK_FROM = re.compile(r"^\s*\*?(De|From):\*?\s+\S", re.IGNORECASE)
+_OUTLOOK_NEXT = re.compile(r"^\s*\*?(Enviado|Enviada|Data|Sent|Date|Para|To)( em)?:\*?\s", re.IGNORECASE)
+
+# Linhas citadas no estilo "> texto"
+_QUOTED_LINE = re.compile(r"^\s*>")
+
+# Delimitador padrão de assinatura ("-- ")
+_SIGNATURE_DELIMITER = re.compile(r"^--\s*$")
+
+# Despedidas que costumam abrir a assinatura
+_SIGN_OFF = re.compile(
+    r"^\s*(atenciosamente|att\.?|atte\.?|abs\.?|abra[cç]os?|cordialmente|grato|grata|"
+    r"obrigad[oa]|sauda[cç][oõ]es|um abra[cç]o|best regards|regards|kind regards|thanks|cheers)[\s,.!]*$",
+    re.IGNORECASE,
+)
+
+# Quantidade máxima de linhas após a despedida para que o bloco seja
+# tratado como assinatura (evita cortar um email que só começa com "Obrigado,")
+MAX_SIGNATURE_LINES = 8
+
+# Linhas de assinatura: contato (email, site, telefone) ou nome/cargo curto
+_CONTACT_LINE = re.compile(r"@|https?://|www\.|\+?\d[\d\s().-]{6,}\d")
+MAX_SIGNATURE_LINE_CHARS = 60
+MAX_SIGNATURE_LINE_WORDS = 6
+
+# Saudações de abertura, que sozinhas não contam como conteúdo
+_GREETING = re.compile(
+    r"^\s*(oi|ol[aá]|bom dia|boa tarde|boa noite|prezad[oa]s?|car[oa]s?|hi|hello|dear)\b[^.?!]{0,40}[,.!:]?\s*$",
+    re.IGNORECASE,
+)
+
+# Parágrafos de aviso legal/rodapé: o padrão precisa casar no início do
+# parágrafo, e só os parágrafos do fim do email são candidatos
+_DISCLAIMER = re.compile(
+    r"(?:(esta|essa) (mensagem|e-?mail|comunica[cç][aã]o).{0,200}(confidencia|destinat[aá]ri|sigil)|"
+    r"this (e-?mail|message|communication).{0,200}(confidential|intended)|"
+    r"(aviso legal|disclaimer|confidencialidade|confidentiality notice)\s*[:\-–]|"
+    r"antes de imprimir|pense no meio ambiente|"
+    r"(enviado do meu|sent from my) [\w .-]{1,40}$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Tamanho máximo de um parágrafo de aviso legal; acima disso é conteúdo
+MAX_DISCLAIMER_CHARS = 800
+
+_HORIZONTAL_SPACE = re.compile(r"[ \t\f\v ]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def _strip_quoted_history(lines: List[str]) -> List[str]:
+    """Descarta o histórico a partir do primeiro cabeçalho de citação"""
+    for index, line in enumerate(lines):
+        is_header = any(pattern.match(line) for pattern in _QUOTE_HEADER_PATTERNS)
+        if not is_header and _OUTLOOK_FROM.match(line):
+            following = [l for l in lines[index + 1:index + 4] if l.strip()]
+            is_header = bool(following) and _OUTLOOK_NEXT.match(following[0]) is not None
+        # Só corta se sobrar conteúdo próprio antes do histórico
+        if is_header and any(l.strip() for l in lines[:index]):
+            lines = lines[:index]
+            break
+    kept = [line for line in lines if not _QUOTED_LINE.match(line)]
+    return kept if any(l.strip() for l in kept) else lines
+
+
+def _is_signature_line(line: str) -> bool:
+    """Nome, cargo, empresa ou contato: curta, sem frases e com palavras capitalizadas"""
+    if _CONTACT_LINE.search(line):
+        return len(line) <= MAX_SIGNATURE_LINE_CHARS + 20
+    words = line.split()
+    if len(line) > MAX_SIGNATURE_LINE_CHARS or len(words) > MAX_SIGNATURE_LINE_WORDS or re.search(r"[?!]", line):
+        return False
+    # "Gerente de Compras" passa; "O servidor de produção caiu" não
+    return all(word[0].isupper() or word[0].isdigit() for word in words if len(word) > 3)
+
+
+def _is_signature_block(lines: List[str]) -> bool:
+    filled = [line for line in lines if line.strip()]
+    return len(filled) <= MAX_SIGNATURE_LINES and all(_is_signature_line(line) for line in filled)
+
+
+def _has_content(lines: List[str]) -> bool:
+    """Se há texto próprio além de saudações e despedidas"""
+    return any(
+        line.strip() and not _GREETING.match(line) and not _SIGN_OFF.match(line)
+        for line in lines
+    )
+
+
+def _strip_signature(lines: List[str]) -> List[str]:
+    """
+    Remove a assinatura no fim do email: o que vem depois do delimitador "-- "
+    ou de uma despedida, desde que pareça assinatura (poucas linhas curtas de
+    nome, cargo ou contato) e que sobre conteúdo antes dela
+    """
+    for index in range(len(lines) - 1, -1, -1):
+        if _SIGNATURE_DELIMITER.match(lines[index]):
+            if _has_content(lines[:index]) and _is_signature_block(lines[index + 1:]):
+                return lines[:index]
+            break
+
+    for index in range(len(lines) - 1, -1, -1):
+        if _SIGN_OFF.match(lines[index]):
+            if _has_content(lines[:index]) and _is_signature_block(lines[index + 1:]):
+                # Mantém a despedida; descarta nome, cargo, telefones etc.
+                return lines[:index + 1]
+            break
+    return lines
+
+
+def _is_disclaimer(paragraph: str) -> bool:
+    paragraph = paragraph.strip()
+    return len(paragraph) <= MAX_DISCLAIMER_CHARS and _DISCLAIMER.match(paragraph) is not None
+
+
+def _strip_disclaimers(text: str) -> str:
+    """Remove os avisos legais e rodapés automáticos do fim do email"""
+    paragraphs = text.split("\n\n")
+    end = len(paragraphs)
+    while end > 0 and _is_disclaimer(paragraphs[end - 1]):
+        end -= 1
+    kept = paragraphs[:end]
+    return "\n\n".join(kept) if any(p.strip() for p in kept) else text
+
+
+def clean_email_text(text: str) -> str:
+    """
+    Remove histórico citado, assinatura e avisos legais e colapsa espaços,
+    preservando as quebras de parágrafo
+
+    Args:
+        text: Texto bruto do email
+
+    Returns:
+        str: Texto limpo (o original, se a limpeza não deixar nada)
+    """
+    if not text:
+        return ""
+    normalized = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_HORIZONTAL_SPACE.sub(" ", line).strip() for line in normalized.split("\n")]
+    lines = _strip_quoted_history(lines)
+    lines = _strip_signature(lines)
+    cleaned = _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+    cleaned = _strip_disclaimers(cleaned).strip()
+    return cleaned or text.strip()
+
+
+def preprocess_email(text: str, max_chars: Optional[int] = None, clean: bool = True) -> Dict:
+    """
+    Prepara o texto do email para os prompts
+
+    Args:
+        text: Texto bruto do email
+        max_chars: Orçamento de caracteres do texto enviado (None = sem limite)
+        clean: Se deve remover histórico, assinatura e avisos legais
+
+    Returns:
+        Dict: 'text' (texto a enviar), 'original_tokens', 'sent_tokens' e
+        'truncated' (se houve corte de head+tail)
+    """
+    processed = clean_email_text(text) if clean else text.strip()
+    truncated = max_chars is not None and len(processed) > max_chars
+    processed = truncate_head_tail(processed, max_chars)
+    return {
+        "text": processed,
+        "original_tokens": estimate_tokens(text),
+        "sent_tokens": estimate_tokens(processed),
+        "truncated": truncated,
+    }
@@ -0,0 +1,179 @@
+"""
+Leitura de emails .eml (MIME) com parser incremental
+"""
+import html
+import re
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesFeedParser
+from typing import BinaryIO, Dict, List, Optional
+
+# Tamanho dos blocos entregues ao parser
+EML_CHUNK_SIZE = 64 * 1024
+
+# Blocos HTML cujo conteúdo nunca é texto do email
+_HTML_INVISIBLE = re.compile(r"<(script|style|head|title)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+# Tags que quebram linha ao serem renderizadas
+_HTML_BREAK = re.compile(r"<\s*(br|/p|/div|/tr|/li|/h[1-6]|/table|/blockquote)\b[^>]*>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+# Inclui o espaço não separável (&nbsp; depois do unescape)
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*(\n\s*)+")
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Converte HTML de email em texto simples com expressões regulares
+    (sem montar árvore DOM)
+
+    Args:
+        markup: Conteúdo HTML
+
+    Returns:
+        str: Texto com quebras de linha preservadas
+    """
+    text = _HTML_COMMENT.sub("", markup)
+    text = _HTML_INVISIBLE.sub("", text)
+    text = _HTML_BREAK.sub("\n", text)
+    text = html.unescape(_HTML_TAG.sub("", text))
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def parse_eml_stream(stream: BinaryIO, chunk_size: int = EML_CHUNK_SIZE) -> EmailMessage:
+    """
+    Lê a mensagem MIME em blocos com o parser incremental da biblioteca padrão
+
+    Args:
+        stream: Arquivo binário posicionado no início da mensagem
+        chunk_size: Tamanho dos blocos lidos
+
+    Returns:
+        EmailMessage: Mensagem com as partes ainda codificadas
+    """
+    parser = BytesFeedParser(policy=policy.default)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parser.feed(chunk)
+    return parser.close()
+
+
+def encoded_payload_size(part: EmailMessage) -> int:
+    """
+    Tamanho aproximado da parte decodificada, calculado sobre o payload ainda
+    codificado (base64 ocupa 4/3 do original)
+    """
+    payload = part.get_payload()
+    if not isinstance(payload, str):
+        return 0
+    if part.get("Content-Transfer-Encoding", "").strip().lower() == "base64":
+        return len(payload) * 3 // 4
+    return len(payload)
+
+
+def _part_text(part: EmailMessage) -> str:
+    try:
+        content = part.get_content()
+    except (LookupError, ValueError, AssertionError):
+        raw = part.get_payload(decode=True) or b""
+        content = raw.decode("utf-8", errors="ignore")
+    if not isinstance(content, str):
+        return ""
+    if part.get_content_type() == "text/html":
+        return html_to_text(content)
+    return content.strip()
+
+
+def extract_eml_body(message: EmailMessage) -> str:
+    """
+    Texto do corpo: prefere text/plain e usa text/html convertido como
+    alternativa
+
+    Args:
+        message: Mensagem analisada
+
+    Returns:
+        str: Corpo do email (vazio se não houver parte de texto)
+    """
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is None:
+        return ""
+    text = _part_text(body)
+    if not text and body.get_content_type() == "text/plain":
+        # Alguns clientes mandam text/plain vazio ao lado do HTML
+        html_part = message.get_body(preferencelist=("html",))
+        if html_part is not None:
+            text = _part_text(html_part)
+    return text
+
+
+def eml_headers(message: EmailMessage) -> Dict[str, str]:
+    """Assunto e remetente, usados como sinais de classificação"""
+    headers = {}
+    for key, name in (("sender", "From"), ("subject", "Subject")):
+        try:
+            value = message.get(name)
+        except Exception:
+            value = None
+        if value:
+            headers[key] = _SPACES.sub(" ", str(value)).strip()
+    return headers
+
+
+def iter_pdf_attachments(message: EmailMessage, max_bytes: Optional[int] = None) -> List[Dict]:
+    """
+    Lista os anexos PDF da mensagem sem decodificá-los
+
+    Args:
+        message: Mensagem analisada
+        max_bytes: Tamanho máximo de anexo aceito (None = sem limite)
+
+    Returns:
+        List[Dict]: 'filename', 'size', 'part' e 'skipped' (anexo acima do
+        limite, que não deve ser decodificado)
+    """
+    attachments = []
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        filename = part.get_filename() or ""
+        is_pdf = part.get_content_type() == "application/pdf" or filename.lower().endswith(".pdf")
+        if not is_pdf:
+            continue
+        size = encoded_payload_size(part)
+        attachments.append({
+            "filename": filename or "anexo.pdf",
+            "size": size,
+            "part": part,
+            "skipped": max_bytes is not None and size > max_bytes,
+        })
+    return attachments
+
+
+def compose_eml_content(headers: Dict[str, str], body: str, attachments: List[Dict]) -> str:
+    """
+    Monta o texto enviado à classificação: cabeçalhos, corpo e anexos
+
+    Args:
+        headers: Saída de eml_headers()
+        body: Corpo do email
+        attachments: Dicts com 'filename' e 'text'
+
+    Returns:
+        str: Conteúdo do email
+    """
+    lines = []
+    if headers.get("sender"):
+        lines.append(f"De: {headers['sender']}")
+    if headers.get("subject"):
+        lines.append(f"Assunto: {headers['subject']}")
+    sections = ["\n".join(lines)] if lines else []
+    if body:
+        sections.append(body)
+    for attachment in attachments:
+        if attachment.get("text"):
+            sections.append(f"[Anexo: {attachment['filename']}]\n{attachment['text']}")
+    return "\n\n".join(sections).strip()
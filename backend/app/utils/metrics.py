@@ -0,0 +1,307 @@
+"""
+Métricas no formato de exposição do Prometheus, sem dependências externas
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Limites (em segundos) dos histogramas de latência: de 1 ms a 1 min
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Samples = Dict[Tuple[str, ...], float]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base das métricas: nome, ajuda, rótulos e filhos por valor de rótulo"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Filho da métrica para a combinação de rótulos (criado na primeira vez)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: esperados rótulos {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        return [f"{name}{_label_text(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (ex.: requisições em andamento)"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observa a duração do bloco"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], counts):
+            cumulative += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{name}_bucket{_label_text(labelnames, key, le)} {cumulative}")
+        labels = _label_text(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total_sum)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribuição de durações em buckets cumulativos"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class CallbackMetric(_Metric):
+    """
+    Métrica calculada apenas na coleta, a partir de contadores que os
+    serviços já mantêm: não custa nada no caminho das requisições
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Samples], kind: str = "gauge"):
+        self.kind = kind
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return None
+
+    def render(self) -> List[str]:
+        try:
+            samples = self.callback()
+        except Exception:
+            # Coleta não deve derrubar o endpoint por causa de um serviço
+            return []
+        lines = self._header()
+        for key, value in sorted(samples.items()):
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+def timed(child: _HistogramChild) -> Callable:
+    """Decorator que observa no histograma a duração de cada chamada da função"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def executor_queue_depth(executor) -> Optional[int]:
+    """Tarefas aguardando um worker livre em um ThreadPoolExecutor/ProcessPoolExecutor"""
+    if executor is None:
+        return 0
+    queue = getattr(executor, "_work_queue", None)
+    if queue is not None:
+        return queue.qsize()
+    pending = getattr(executor, "_pending_work_items", None)
+    return len(pending) if pending is not None else None
+
+
+class MetricsRegistry:
+    """Conjunto de métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def callback(self, name: str, documentation: str, labelnames: Sequence[str], callback: Callable[[], Samples], kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, callback, kind))
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro da aplicação e métricas do caminho das requisições
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "autou_http_requests_total", "Requisições HTTP concluídas", ("method", "route", "status")
+)
+http_request_seconds = registry.histogram(
+    "autou_http_request_duration_seconds", "Tempo total das requisições HTTP", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "autou_http_requests_in_flight", "Requisições HTTP em andamento"
+)
+upload_read_seconds = registry.histogram(
+    "autou_upload_read_seconds", "Leitura do upload (memória ou arquivo temporário)", ("format",)
+)
+extraction_seconds = registry.histogram(
+    "autou_extraction_seconds", "Extração de texto de arquivos (library: biblioteca usada ou cache)", ("format", "library")
+)
+prompt_build_seconds = registry.histogram(
+    "autou_prompt_build_seconds", "Montagem dos prompts do Gemini", ("prompt",),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+gemini_call_seconds = registry.histogram(
+    "autou_gemini_call_seconds", "Chamadas ao Gemini, incluindo retentativas", ("call", "outcome")
+)
+normalization_seconds = registry.histogram(
+    "autou_normalization_seconds", "Validação e normalização das respostas do Gemini", ("kind",),
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+errors_total = registry.counter(
+    "autou_errors_total", "Erros por etapa e tipo", ("stage", "type")
+)
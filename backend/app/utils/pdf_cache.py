@@ -0,0 +1,161 @@
+"""
+Cache do texto extraído de PDFs, indexado pelo hash do documento
+"""
+import hashlib
+import mmap
+import os
+import threading
+from typing import Dict, Optional, Union
+
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.persistent_cache import PersistentCache
+
+# Incrementar quando a extração mudar de forma que invalide textos já salvos
+EXTRACTOR_VERSION = "3"
+
+# Blocos lidos ao calcular o hash de arquivos em disco
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def pdf_digest(pdf: Union[bytes, str]) -> str:
+    """
+    Hash BLAKE2b (128 bits) dos bytes do PDF
+
+    Args:
+        pdf: Bytes do PDF ou caminho do arquivo
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(pdf, (bytes, bytearray)):
+        digest.update(pdf)
+        return digest.hexdigest()
+    with open(pdf, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), _HASH_CHUNK_SIZE):
+                        digest.update(view[offset:offset + _HASH_CHUNK_SIZE])
+                finally:
+                    view.release()
+    return digest.hexdigest()
+
+
+class PdfTextCache:
+    """
+    Cache de dois níveis (memória e, opcionalmente, SQLite) do texto extraído.
+
+    Cada entrada guarda o texto e quanto tempo a extração levou, para
+    contabilizar o tempo economizado nos acertos; a chave indica se o texto
+    cobre o documento inteiro.
+    Uma extração completa atende qualquer orçamento de caracteres; uma
+    parcial atende apenas o mesmo orçamento.
+    """
+
+    def __init__(self, memory: TTLCache, disk: Optional[PersistentCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self.seconds_spent = 0.0
+
+    @staticmethod
+    def _keys(digest: str, max_chars: Optional[int]):
+        keys = [f"{digest}:full"]
+        if max_chars is not None:
+            keys.insert(0, f"{digest}:{max_chars}")
+        return keys
+
+    def get(self, digest: str, max_chars: Optional[int]) -> Optional[str]:
+        """
+        Busca o texto já extraído de um documento
+
+        Args:
+            digest: Hash do PDF (pdf_digest)
+            max_chars: Orçamento de caracteres da extração (None = documento inteiro)
+
+        Returns:
+            Optional[str]: Texto dentro do orçamento ou None
+        """
+        keys = self._keys(digest, max_chars)
+        entry = self.memory.get_first(keys)
+        if entry is None and self.disk is not None:
+            entry = self.disk.get_first(keys)
+            if entry is not None:
+                self.memory.set(keys[0], entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.seconds_saved += entry["seconds"]
+        text = entry["text"]
+        return text if max_chars is None else text[:max_chars]
+
+    def set(self, digest: str, max_chars: Optional[int], text: str, seconds: float, complete: bool) -> None:
+        """
+        Armazena o texto extraído
+
+        Args:
+            digest: Hash do PDF
+            max_chars: Orçamento usado na extração
+            text: Texto extraído
+            seconds: Duração da extração
+            complete: Se a extração leu todas as páginas (informado pelo
+                extrator; o tamanho do texto não basta, pois ele é aparado)
+        """
+        complete = complete or max_chars is None
+        key = f"{digest}:full" if complete else f"{digest}:{max_chars}"
+        entry = {"text": text, "seconds": round(seconds, 4)}
+        with self._lock:
+            self.seconds_spent += seconds
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def stats(self) -> Dict:
+        """Acertos, tempo de extração economizado e estado dos níveis"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "enabled": True,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "extraction_seconds_saved": round(self.seconds_saved, 3),
+                "extraction_seconds_spent": round(self.seconds_spent, 3),
+            }
+        memory = self.memory.stats()
+        stats["memory"] = {"size": memory["size"], "max_size": memory["max_size"], "evictions": memory["evictions"]}
+        if self.disk is not None:
+            disk = self.disk.stats()
+            stats["disk"] = {key: disk[key] for key in ("path", "size", "bytes", "max_bytes", "evictions")}
+        else:
+            stats["disk"] = {"enabled": False}
+        return stats
+
+
+def _create_pdf_text_cache() -> Optional[PdfTextCache]:
+    if not settings.PDF_TEXT_CACHE_ENABLED:
+        return None
+    disk = None
+    if settings.PDF_TEXT_CACHE_DISK_PATH:
+        disk = PersistentCache(
+            path=settings.PDF_TEXT_CACHE_DISK_PATH,
+            version=f"{EXTRACTOR_VERSION}:{settings.PDF_LIBRARY_ORDER}",
+            max_bytes=settings.PDF_TEXT_CACHE_DISK_MAX_MB * 1024 * 1024,
+            ttl_seconds=settings.PDF_TEXT_CACHE_TTL_SECONDS,
+        )
+    return PdfTextCache(
+        memory=TTLCache(max_size=settings.PDF_TEXT_CACHE_MAX_ITEMS, ttl_seconds=settings.PDF_TEXT_CACHE_TTL_SECONDS),
+        disk=disk,
+    )
+
+
+# Instância singleton (None quando desabilitado)
+pdf_text_cache = _create_pdf_text_cache()
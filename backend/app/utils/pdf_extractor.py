@@ -2,7 +2,13 @@
 Utilitários para extração de texto de PDFs
 """
 import io
-from typing import Optional
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from app.config import settings
 
 # PDF readers (fallbacks)
 try:
@@ -21,60 +27,431 @@ except Exception:
     pdfplumber = None
 
 
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
+# Marcadores típicos de texto mal extraído (glifos sem mapeamento Unicode)
+_GARBLED_PATTERN = re.compile(r"\(cid:\d+\)|�")
+
+# Proporção mínima de caracteres alfanuméricos/pontuação comum numa página válida
+MIN_PRINTABLE_RATIO = 0.6
+
+# Fração máxima do texto da página ocupada por marcadores de glifo sem mapeamento
+MAX_GARBLED_RATIO = 0.3
+
+# Conteúdo do PDF: bytes em memória ou arquivo mapeado em memória
+PdfSource = Union[bytes, mmap.mmap]
+
+
+def _as_stream(source: PdfSource):
+    """Objeto file-like para as bibliotecas que leem de streams"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+class _FitzDocument:
+    """Acesso página a página via PyMuPDF"""
+
+    def __init__(self, source: PdfSource):
+        self._view = None
+        if not isinstance(source, (bytes, bytearray)):
+            # PyMuPDF aceita buffers, mas não objetos mmap diretamente
+            source = self._view = memoryview(source)
+        self._doc = fitz.open(stream=source, filetype="pdf")
+
+    def __len__(self) -> int:
+        return self._doc.page_count
+
+    def page_text(self, index: int) -> str:
+        return self._doc[index].get_text() or ""
+
+    def has_text_layer(self, index: int) -> Optional[bool]:
+        # Página sem fontes não tem camada de texto (ex.: imagem escaneada)
+        return bool(self._doc[index].get_fonts())
+
+    def close(self) -> None:
+        self._doc.close()
+        if self._view is not None:
+            self._view.release()
+
+
+class _PyPDF2Document:
+    """Acesso página a página via PyPDF2"""
+
+    def __init__(self, source: PdfSource):
+        self._reader = PdfReader(_as_stream(source))
+
+    def __len__(self) -> int:
+        return len(self._reader.pages)
+
+    def page_text(self, index: int) -> str:
+        return self._reader.pages[index].extract_text() or ""
+
+    def has_text_layer(self, index: int) -> Optional[bool]:
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class _PdfplumberDocument:
+    """Acesso página a página via pdfplumber"""
+
+    def __init__(self, source: PdfSource):
+        self._pdf = pdfplumber.open(_as_stream(source))
+
+    def __len__(self) -> int:
+        return len(self._pdf.pages)
+
+    def page_text(self, index: int) -> str:
+        return self._pdf.pages[index].extract_text() or ""
+
+    def has_text_layer(self, index: int) -> Optional[bool]:
+        return None
+
+    def close(self) -> None:
+        self._pdf.close()
+
+
+def _document_openers() -> Dict[str, type]:
+    """Bibliotecas instaladas e a classe que abre documentos em cada uma"""
+    openers = {}
+    if fitz is not None:
+        openers["PyMuPDF"] = _FitzDocument
+    if PdfReader is not None:
+        openers["PyPDF2"] = _PyPDF2Document
+    if pdfplumber is not None:
+        openers["pdfplumber"] = _PdfplumberDocument
+    return openers
+
+
+def resolve_library_order(library_order: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Ordem efetiva das bibliotecas: a configurada, filtrada pelas instaladas
+
+    Args:
+        library_order: Ordem desejada (padrão: settings.PDF_LIBRARY_ORDER)
+
+    Returns:
+        List[str]: Bibliotecas disponíveis na ordem de tentativa
+    """
+    if library_order is None:
+        library_order = [name.strip() for name in settings.PDF_LIBRARY_ORDER.split(",") if name.strip()]
+    openers = _document_openers()
+    return [name for name in library_order if name in openers]
+
+
+def is_page_text_usable(text: str) -> bool:
+    """
+    Verificação barata de qualidade do texto de uma página
+
+    Args:
+        text: Texto extraído da página
+
+    Returns:
+        bool: False se a página estiver vazia ou com texto corrompido
+    """
+    stripped = text.strip()
+    if not stripped:
+        return False
+    garbled = sum(len(marker) for marker in _GARBLED_PATTERN.findall(stripped))
+    if garbled > MAX_GARBLED_RATIO * len(stripped):
+        return False
+    visible = [ch for ch in stripped if not ch.isspace()]
+    readable = sum(1 for ch in visible if ch.isalnum() or ch in ".,;:!?()-/%$@'\"")
+    return readable >= MIN_PRINTABLE_RATIO * len(visible)
+
+
+def _safe_page_text(document, index: int) -> str:
+    try:
+        return document.page_text(index)
+    except Exception:
+        return ""
+
+
+def _open_documents(source: PdfSource, library_order: Optional[Sequence[str]]):
+    """
+    Prepara a abertura preguiçosa dos documentos em cada biblioteca
+
+    Returns:
+        tuple: (ordem efetiva, função open(nome), dict de documentos abertos)
+    """
+    openers = _document_openers()
+    order = resolve_library_order(library_order)
+    documents: Dict[str, object] = {}
+
+    def _open(name: str):
+        if name not in documents:
+            try:
+                documents[name] = openers[name](source)
+            except Exception:
+                documents[name] = None
+        return documents[name]
+
+    return order, _open, documents
+
+
+@contextmanager
+def _mapped_file(path: str) -> Iterator[PdfSource]:
+    """Mapeia o arquivo em memória (somente leitura); arquivo vazio vira bytes vazios"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _close_documents(documents: Dict[str, object]) -> None:
+    for document in documents.values():
+        if document is not None:
+            try:
+                document.close()
+            except Exception:
+                pass
+
+
+def count_pdf_pages(source: PdfSource, library_order: Optional[Sequence[str]] = None) -> int:
+    """
+    Conta as páginas do PDF usando a primeira biblioteca que conseguir abri-lo
+
+    Args:
+        source: Bytes do PDF ou arquivo mapeado em memória
+        library_order: Ordem de tentativa das bibliotecas (opcional)
+
+    Returns:
+        int: Quantidade de páginas (0 se nenhuma biblioteca abrir o arquivo)
+    """
+    if len(source) == 0:
+        return 0
+    order, _open, documents = _open_documents(source, library_order)
+    try:
+        for name in order:
+            document = _open(name)
+            if document is not None:
+                return len(document)
+        return 0
+    finally:
+        _close_documents(documents)
+
+
+def iter_pdf_page_sources(
+    source: PdfSource,
+    library_order: Optional[Sequence[str]] = None,
+    start: int = 0,
+    stop: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Gera o texto do PDF página a página, sob demanda, junto com a
+    biblioteca que o produziu
+
+    O documento é aberto apenas na primeira biblioteca da ordem (por padrão
+    a mais rápida). Uma sondagem da camada de texto pula páginas escaneadas,
+    e só as páginas vazias ou corrompidas são repassadas às bibliotecas
+    seguintes, abertas sob demanda. Interromper a iteração fecha os
+    documentos abertos.
+
+    Args:
+        source: Bytes do PDF ou arquivo mapeado em memória
+        library_order: Ordem de tentativa das bibliotecas (opcional)
+        start: Primeira página (inclusive)
+        stop: Última página (exclusive; None = até o fim)
+
+    Yields:
+        Tuple[str, Optional[str]]: Texto de cada página, em ordem, e a
+            biblioteca que o extraiu (None quando nenhuma obteve texto)
+    """
+    if len(source) == 0:
+        return
+
+    order, _open, documents = _open_documents(source, library_order)
+
+    try:
+        primary_name = next((name for name in order if _open(name) is not None), None)
+        if primary_name is None:
+            return
+        primary = documents[primary_name]
+
+        page_count = len(primary)
+        for index in range(start, page_count if stop is None else min(stop, page_count)):
+            # Sondagem: página sem camada de texto não passa por nenhuma biblioteca
+            if primary.has_text_layer(index) is False:
+                yield "", None
+                continue
+            text = _safe_page_text(primary, index)
+            library = primary_name
+            if not is_page_text_usable(text):
+                library = None
+                for name in order:
+                    if name == primary_name:
+                        continue
+                    document = _open(name)
+                    if document is None:
+                        continue
+                    alternative = _safe_page_text(document, index)
+                    if is_page_text_usable(alternative):
+                        text = alternative
+                        library = name
+                        break
+            yield text, library
+    finally:
+        _close_documents(documents)
+
+
+def iter_pdf_pages(
+    source: PdfSource,
+    library_order: Optional[Sequence[str]] = None,
+    start: int = 0,
+    stop: Optional[int] = None
+) -> Iterator[str]:
+    """Como iter_pdf_page_sources, gerando apenas o texto de cada página"""
+    pages = iter_pdf_page_sources(source, library_order, start, stop)
+    try:
+        for text, _ in pages:
+            yield text
+    finally:
+        pages.close()
+
+
+def main_library(page_counts: Dict[str, int]) -> str:
+    """
+    Biblioteca que extraiu mais páginas (rótulo das métricas de extração)
+
+    Args:
+        page_counts: Páginas extraídas por biblioteca, na ordem em que
+            apareceram (empates ficam com a primeira)
+
+    Returns:
+        str: Nome da biblioteca ou "none" se nenhuma página teve texto
+    """
+    if not page_counts:
+        return "none"
+    return max(page_counts, key=page_counts.get)
+
+
+def _count_library(page_counts: Dict[str, int], library: Optional[str]) -> None:
+    if library is not None:
+        page_counts[library] = page_counts.get(library, 0) + 1
+
+
+def extract_pdf_page_range(
+    path: str, start: int, stop: int, library_order: Optional[Sequence[str]] = None
+) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Extrai um intervalo de páginas de um PDF em disco, mapeando o arquivo em
+    memória (usado pelos workers da extração paralela)
+
+    Args:
+        path: Caminho do arquivo PDF
+        start: Primeira página (inclusive)
+        stop: Última página (exclusive)
+        library_order: Ordem de tentativa das bibliotecas (opcional)
+
+    Returns:
+        Tuple[List[str], Dict[str, int]]: Texto de cada página do intervalo
+            e quantas páginas cada biblioteca extraiu
+    """
+    pages: List[str] = []
+    page_counts: Dict[str, int] = {}
+    with _mapped_file(path) as mapped:
+        for text, library in iter_pdf_page_sources(mapped, library_order, start, stop):
+            pages.append(text)
+            _count_library(page_counts, library)
+    return pages, page_counts
+
+
+def extract_text_from_pdf_file(path: str, library_order: Optional[Sequence[str]] = None, max_chars: Optional[int] = None) -> str:
+    """
+    Extrai texto de um PDF em disco, mapeado em memória em vez de lido por inteiro
+
+    Args:
+        path: Caminho do arquivo PDF
+        library_order: Ordem de tentativa das bibliotecas (opcional)
+        max_chars: Orçamento de caracteres (None = documento inteiro)
+
+    Returns:
+        str: Texto extraído do PDF
+    """
+    return extract_pdf_file_text(path, library_order, max_chars)[0]
+
+
+def extract_pdf_file_text(
+    path: str, library_order: Optional[Sequence[str]] = None, max_chars: Optional[int] = None
+) -> Tuple[str, bool, str]:
+    """Como extract_pdf_text, para um PDF em disco mapeado em memória"""
+    with _mapped_file(path) as mapped:
+        return extract_pdf_text(mapped, library_order, max_chars)
+
+
+def count_pdf_file_pages(path: str, library_order: Optional[Sequence[str]] = None) -> int:
+    """Conta as páginas de um PDF em disco"""
+    with _mapped_file(path) as mapped:
+        return count_pdf_pages(mapped, library_order)
+
+
+def extract_text_from_pdf_bytes(
+    pdf_bytes: PdfSource,
+    library_order: Optional[Sequence[str]] = None,
+    max_chars: Optional[int] = None
+) -> str:
     """
     Extrai texto de bytes de PDF usando múltiplas bibliotecas como fallback
-    
+
     Args:
         pdf_bytes: Bytes do arquivo PDF
-        
+        library_order: Ordem de tentativa das bibliotecas (opcional)
+        max_chars: Orçamento de caracteres; a extração para assim que ele
+            é atingido (None = documento inteiro)
+
     Returns:
         str: Texto extraído do PDF
     """
-    if len(pdf_bytes) == 0:
-        return ""
-    
-    # 1) Tentativa com PyPDF2
-    if PdfReader is not None:
-        try:
-            reader = PdfReader(io.BytesIO(pdf_bytes))
-            pages = [(p.extract_text() or "") for p in reader.pages]
-            text = "\n".join(pages).strip()
-            if text:
-                return text
-        except Exception:
-            pass
-    
-    # 2) Tentativa com PyMuPDF (fitz)
-    if fitz is not None:
-        try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            pages = [page.get_text() or "" for page in doc]
-            doc.close()
-            text = "\n".join(pages).strip()
-            if text:
-                return text
-        except Exception:
-            pass
-    
-    # 3) Tentativa com pdfplumber
-    if pdfplumber is not None:
-        try:
-            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-                pages = [p.extract_text() or "" for p in pdf.pages]
-            text = "\n".join(pages).strip()
-            if text:
-                return text
-        except Exception:
-            pass
-    
-    return ""
+    return extract_pdf_text(pdf_bytes, library_order, max_chars)[0]
+
+
+def extract_pdf_text(
+    pdf_bytes: PdfSource,
+    library_order: Optional[Sequence[str]] = None,
+    max_chars: Optional[int] = None
+) -> Tuple[str, bool, str]:
+    """
+    Extrai texto de um PDF informando se o documento foi lido até o fim e
+    qual biblioteca o extraiu
+
+    Args:
+        pdf_bytes: Bytes do arquivo PDF
+        library_order: Ordem de tentativa das bibliotecas (opcional)
+        max_chars: Orçamento de caracteres (None = documento inteiro)
+
+    Returns:
+        Tuple[str, bool, str]: Texto extraído, se todas as páginas foram
+            lidas (False quando a extração parou no orçamento) e a
+            biblioteca que extraiu mais páginas (main_library)
+    """
+    parts: List[str] = []
+    page_counts: Dict[str, int] = {}
+    total = 0
+    complete = True
+    pages = iter_pdf_page_sources(pdf_bytes, library_order)
+    try:
+        for text, library in pages:
+            parts.append(text)
+            _count_library(page_counts, library)
+            total += len(text) + 1
+            if max_chars is not None and total >= max_chars:
+                complete = False
+                break
+    finally:
+        pages.close()
+
+    text = "\n".join(parts).strip()
+    if max_chars is not None:
+        text = text[:max_chars]
+    return text, complete, main_library(page_counts)
 
 
 def get_available_pdf_libraries() -> list[str]:
     """
     Retorna lista das bibliotecas PDF disponíveis
-    
+
     Returns:
         list[str]: Lista de bibliotecas disponíveis
     """
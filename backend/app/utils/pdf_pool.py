@@ -0,0 +1,258 @@
+"""
+Pool de processos dedicado à extração de texto de PDFs
+"""
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple, Union
+
+from app.config import settings
+from app.utils.metrics import executor_queue_depth
+from app.utils.pdf_extractor import (
+    count_pdf_file_pages,
+    count_pdf_pages,
+    extract_pdf_file_text,
+    extract_pdf_page_range,
+    extract_pdf_text,
+    get_available_pdf_libraries,
+    main_library,
+)
+
+logger = logging.getLogger("autou")
+
+# Tamanho mínimo de cada intervalo na extração paralela
+PARALLEL_MIN_CHUNK_PAGES = 8
+
+
+def _init_worker(memory_limit_mb: int) -> None:
+    """Aplica o limite de memória (RLIMIT_AS) no processo worker"""
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        # Plataforma sem suporte a rlimit (ex.: Windows)
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _write_temp_pdf(pdf_bytes: bytes) -> str:
+    """Grava os bytes em um arquivo temporário e retorna o caminho"""
+    fd, path = tempfile.mkstemp(prefix="autou-pdf-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    return path
+
+
+class PdfProcessPool:
+    """
+    Executa extract_pdf_text fora do event loop, em processos
+    separados, com timeout por documento e limite de memória por worker.
+    Um documento que estoura o timeout derruba e recria o pool, para que o
+    worker travado não continue ocupando CPU.
+    """
+
+    def __init__(self, workers: int, timeout_seconds: float, memory_limit_mb: int, parallel_min_pages: int = 0):
+        self.workers = max(1, workers)
+        self.parallel_min_pages = parallel_min_pages
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._ready: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.completed = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.restarts = 0
+        self.parallel_runs = 0
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn evita herdar threads e locks do processo do servidor
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb,),
+                )
+            return self._executor
+
+    def _restart(self, broken: concurrent.futures.ProcessPoolExecutor) -> None:
+        """Mata os workers do pool informado e força a criação de um novo"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.restarts += 1
+        # Não há API pública para matar um worker específico
+        for process in list((getattr(broken, "_processes", None) or {}).values()):
+            process.kill()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _ready_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        Retorna um pool com todos os workers já inicializados, para que o
+        custo de subida (spawn + import das bibliotecas de PDF) não conte
+        no timeout de nenhum documento
+        """
+        executor = self._executor
+        if executor is not None and executor is self._ready:
+            return executor
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            executor = self._get_executor()
+            if executor is not self._ready:
+                await asyncio.gather(*(
+                    asyncio.wrap_future(executor.submit(get_available_pdf_libraries))
+                    for _ in range(self.workers)
+                ))
+                self._ready = executor
+            return executor
+    
+    async def start(self) -> None:
+        """Sobe os workers antecipadamente (chamado na inicialização da app)"""
+        await self._ready_executor()
+    
+    async def extract(self, pdf: Union[bytes, str], max_chars: Optional[int] = None) -> Tuple[str, bool, str]:
+        """
+        Extrai o texto de um PDF em um processo do pool
+
+        Documentos completos (sem orçamento) com pelo menos parallel_min_pages
+        páginas são divididos em intervalos extraídos em paralelo pelos workers.
+
+        Args:
+            pdf: Bytes do arquivo PDF ou caminho de um arquivo em disco
+            max_chars: Orçamento de caracteres (None = documento inteiro)
+
+        Returns:
+            Tuple[str, bool, str]: Texto extraído, se o documento foi lido até
+                o fim e a biblioteca que extraiu mais páginas
+
+        Raises:
+            ValueError: Se a extração exceder o timeout ou o limite de memória
+        """
+        for attempt in range(2):
+            executor = await self._ready_executor()
+            try:
+                result = await asyncio.wait_for(self._run(executor, pdf, max_chars), self.timeout_seconds)
+                self.completed += 1
+                return result
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                logger.warning("Extração de PDF excedeu %.1fs; reiniciando o pool", self.timeout_seconds)
+                self._restart(executor)
+                raise ValueError("Tempo limite excedido ao extrair texto do PDF.")
+            except BrokenProcessPool:
+                # Pool reiniciado por outro documento ou worker morto: tenta de novo uma vez
+                self._restart(executor)
+                if attempt == 0:
+                    continue
+                self.failures += 1
+                raise ValueError("Falha no processo de extração do PDF.")
+            except MemoryError:
+                self.failures += 1
+                raise ValueError("PDF excede o limite de memória para extração.")
+        raise ValueError("Falha no processo de extração do PDF.")
+
+    async def _run(
+        self, executor: concurrent.futures.ProcessPoolExecutor, pdf: Union[bytes, str], max_chars: Optional[int]
+    ) -> Tuple[str, bool, str]:
+        """
+        Escolhe entre extração sequencial e paralela por intervalos de páginas.
+        A contagem de páginas também roda no pool: um PDF malicioso trava ou
+        estoura a memória de um worker (sujeito ao timeout e ao reinício),
+        não o processo da API
+        """
+        is_path = isinstance(pdf, str)
+        if max_chars is None and self.parallel_min_pages > 0 and self.workers > 1:
+            counter = count_pdf_file_pages if is_path else count_pdf_pages
+            page_count = await asyncio.wrap_future(executor.submit(counter, pdf))
+            if page_count >= self.parallel_min_pages:
+                text, library = await self._extract_parallel(executor, pdf, page_count)
+                return text, True, library
+        if is_path:
+            # O worker mapeia o arquivo; só o caminho atravessa o processo
+            future = executor.submit(extract_pdf_file_text, pdf, None, max_chars)
+        else:
+            future = executor.submit(extract_pdf_text, pdf, None, max_chars)
+        return await asyncio.wrap_future(future)
+
+    async def _extract_parallel(
+        self, executor: concurrent.futures.ProcessPoolExecutor, pdf: Union[bytes, str], page_count: int
+    ) -> Tuple[str, str]:
+        """
+        Distribui intervalos de páginas entre os workers, que mapeiam o mesmo
+        arquivo em memória em vez de receber cópias serializadas dos bytes.
+        PDFs recebidos em memória são gravados uma única vez em arquivo temporário.
+
+        Returns:
+            Tuple[str, str]: Texto do documento e a biblioteca que extraiu mais páginas
+        """
+        owns_file = not isinstance(pdf, str)
+        path = await asyncio.to_thread(_write_temp_pdf, pdf) if owns_file else pdf
+        try:
+            # Mais intervalos que workers equilibra páginas de custo desigual
+            chunk = max(PARALLEL_MIN_CHUNK_PAGES, -(-page_count // (self.workers * 2)))
+            ranges = await asyncio.gather(*(
+                asyncio.wrap_future(executor.submit(extract_pdf_page_range, path, start, min(start + chunk, page_count)))
+                for start in range(0, page_count, chunk)
+            ))
+        finally:
+            if owns_file:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        self.parallel_runs += 1
+        page_counts: Dict[str, int] = {}
+        for _, counts in ranges:
+            for library, pages in counts.items():
+                page_counts[library] = page_counts.get(library, 0) + pages
+        text = "\n".join(page for pages, _ in ranges for page in pages).strip()
+        return text, main_library(page_counts)
+
+    def shutdown(self) -> None:
+        """Encerra os processos do pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def queue_depth(self) -> Optional[int]:
+        """Extrações enviadas ao pool e ainda não concluídas"""
+        return executor_queue_depth(self._executor)
+
+    def stats(self) -> Dict:
+        """Contadores do pool"""
+        return {
+            "workers": self.workers,
+            "timeout_seconds": self.timeout_seconds,
+            "memory_limit_mb": self.memory_limit_mb,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "parallel_min_pages": self.parallel_min_pages,
+            "parallel_runs": self.parallel_runs,
+        }
+
+
+# Instância singleton do pool
+pdf_pool = PdfProcessPool(
+    workers=settings.PDF_POOL_WORKERS,
+    timeout_seconds=settings.PDF_EXTRACTION_TIMEOUT_SECONDS,
+    memory_limit_mb=settings.PDF_WORKER_MEMORY_LIMIT_MB,
+    parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+)
@@ -0,0 +1,203 @@
+"""
+Cache de resultados persistente em SQLite, compartilhado entre processos
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    version TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+# Intervalo mínimo entre atualizações de last_access da mesma entrada
+# (evita uma escrita a cada leitura)
+TOUCH_INTERVAL_SECONDS = 60.0
+
+# Quantidade de gravações entre verificações do limite de tamanho
+EVICTION_CHECK_EVERY = 64
+
+
+class PersistentCache:
+    """
+    Cache chave/valor JSON em SQLite (modo WAL), seguro para vários workers
+    do uvicorn no mesmo nó. Entradas expiram por TTL, e as menos acessadas
+    são removidas quando o tamanho total passa de max_bytes. Entradas de
+    outra versão (ex.: prompt alterado) são ignoradas nas leituras, mas não
+    apagadas: durante um deploy gradual, workers com a versão anterior ainda
+    as usam. Sem acessos, saem pela expiração ou pela evicção por tamanho.
+    """
+
+    def __init__(self, path: str, version: str, max_bytes: int, ttl_seconds: float):
+        """
+        Args:
+            path: Caminho do arquivo SQLite
+            version: Versão atual dos valores (entradas de outras versões são ignoradas)
+            max_bytes: Tamanho máximo somado dos valores (0 = sem limite)
+            ttl_seconds: Tempo de vida das entradas (0 = sem expiração)
+        """
+        self.path = path
+        self.version = version
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_seconds = float(ttl_seconds)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_first(self, keys: Iterable[str]) -> Optional[Any]:
+        """
+        Retorna o valor da primeira chave válida, na ordem de preferência
+
+        Args:
+            keys: Chaves candidatas
+
+        Returns:
+            Optional[Any]: Valor armazenado ou None
+        """
+        keys = list(keys)
+        if not keys:
+            return None
+        now = time.time()
+        placeholders = ",".join("?" for _ in keys)
+        try:
+            with self._lock:
+                conn = self._connection()
+                rows = conn.execute(
+                    f"SELECT key, value, expires_at, last_access FROM entries "
+                    f"WHERE key IN ({placeholders}) AND version = ?",
+                    (*keys, self.version),
+                ).fetchall()
+                found = {row[0]: row for row in rows if not (row[2] > 0 and row[2] < now)}
+                for key in keys:
+                    row = found.get(key)
+                    if row is None:
+                        continue
+                    if now - row[3] > TOUCH_INTERVAL_SECONDS:
+                        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+                    self.hits += 1
+                    return json.loads(row[1])
+                self.misses += 1
+                return None
+        except sqlite3.Error:
+            # Cache indisponível (disco cheio, banco travado) não deve derrubar a requisição
+            self.errors += 1
+            return None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Busca um valor pela chave"""
+        return self.get_first((key,))
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Armazena um valor JSON-serializável
+
+        Args:
+            key: Chave da entrada
+            value: Valor a ser armazenado
+        """
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, version, size, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, data, self.version, len(data), expires_at, now),
+                )
+                self._writes += 1
+                if (self._writes - 1) % EVICTION_CHECK_EVERY == 0:
+                    self._evict(conn, now)
+        except sqlite3.Error:
+            self.errors += 1
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Remove expiradas e, acima de max_bytes, as menos acessadas"""
+        conn.execute("DELETE FROM entries WHERE expires_at > 0 AND expires_at < ?", (now,))
+        if self.max_bytes == 0:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Remove até ficar 10% abaixo do limite, para não repetir a cada gravação
+        excess = total - int(self.max_bytes * 0.9)
+        removed = 0
+        freed = 0
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if freed >= excess:
+                break
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            freed += size
+            removed += 1
+        self.evictions += removed
+
+    def clear(self) -> None:
+        """Remove todas as entradas"""
+        with self._lock:
+            self._connection().execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna os contadores deste processo e o tamanho atual do banco
+
+        Returns:
+            Dict: Entradas, bytes, limites, hits, misses e evicções
+        """
+        try:
+            with self._lock:
+                count, total = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "version": self.version,
+            "size": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,44 @@
+"""
+Payload público dos resultados de classificação (API, lote e jobs)
+"""
+from typing import Dict
+
+
+def build_classification_response(result: Dict) -> Dict:
+    """
+    Monta o payload de resposta a partir do resultado do EmailService
+    
+    Args:
+        result: Resultado da classificação
+        
+    Returns:
+        Dict: Payload exposto pela API
+    """
+    stage = result.get("stage", "gemini")
+    response_data = {
+        "categoria": result["categoria"],
+        "prioridade": result.get("prioridade"),
+        "label": stage.upper(),
+        "stage": stage,
+        "gemini_raw": result.get("gemini_raw")
+    }
+    
+    if "confidence" in result:
+        response_data["confidence"] = result["confidence"]
+    
+    if "reply" in result:
+        response_data["reply"] = result["reply"]
+    
+    if "detailed_analysis" in result:
+        response_data["detailed_analysis"] = result["detailed_analysis"]
+    
+    if "partial_errors" in result:
+        response_data["partial_errors"] = result["partial_errors"]
+    
+    if "degraded" in result:
+        response_data["degraded"] = result["degraded"]
+    
+    if "tokens" in result:
+        response_data["tokens"] = result["tokens"]
+    
+    return response_data
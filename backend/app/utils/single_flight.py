@@ -0,0 +1,55 @@
+"""
+Coalescência de chamadas assíncronas idênticas em andamento (single-flight)
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Garante que apenas uma execução por chave esteja em andamento. Chamadas
+    concorrentes com a mesma chave aguardam o mesmo resultado; o cancelamento
+    de um chamador não cancela a execução compartilhada com os demais.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Executa factory() ou se junta a uma execução já em andamento
+
+        Args:
+            key: Chave que identifica chamadas equivalentes
+            factory: Função que cria a corrotina a ser executada
+
+        Returns:
+            Any: Resultado da execução compartilhada
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._forget(k, _t))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        # shield: cancelar este chamador não cancela a task compartilhada
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Evita o aviso "exception was never retrieved" quando todos desistiram
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de execuções e chamadas coalescidas"""
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
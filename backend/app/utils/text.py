@@ -0,0 +1,115 @@
+"""
+Utilitários de texto compartilhados entre os serviços
+"""
+import hashlib
+import re
+from typing import Optional
+
+from app.config import settings
+
+# Caracteres por token usados nas estimativas
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens de um texto (aprox. 4 caracteres por token)
+
+    Args:
+        text: Texto a ser estimado
+
+    Returns:
+        int: Quantidade aproximada de tokens
+    """
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def prompt_char_budget() -> Optional[int]:
+    """
+    Orçamento de caracteres do email enviado nos prompts de classificação,
+    derivado de settings.PROMPT_MAX_TOKENS (None = sem limite)
+    """
+    if settings.PROMPT_MAX_TOKENS <= 0:
+        return None
+    return settings.PROMPT_MAX_TOKENS * CHARS_PER_TOKEN
+
+
+def extraction_char_budget() -> Optional[int]:
+    """
+    Orçamento de caracteres da extração de uploads para classificação:
+    EXTRACTION_BUDGET_FACTOR vezes o do prompt (None = documento inteiro)
+    """
+    budget = prompt_char_budget()
+    if budget is None or settings.EXTRACTION_BUDGET_FACTOR <= 0:
+        return None
+    return int(budget * max(1.0, settings.EXTRACTION_BUDGET_FACTOR))
+
+
+def truncate_to_budget(text: str, max_chars: Optional[int] = None) -> str:
+    """
+    Corta o texto no orçamento de caracteres do prompt
+
+    Args:
+        text: Texto original
+        max_chars: Orçamento (padrão: prompt_char_budget())
+
+    Returns:
+        str: Texto dentro do orçamento
+    """
+    if max_chars is None:
+        max_chars = prompt_char_budget()
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    return text[:max_chars]
+
+
+def truncate_head_tail(text: str, max_chars: Optional[int], head_ratio: float = 0.7, marker: str = "\n[...]\n") -> str:
+    """
+    Corta o meio do texto, preservando o início (assunto, pedido) e o fim
+    (fechamento, prazos) dentro do orçamento
+
+    Args:
+        text: Texto original
+        max_chars: Orçamento de caracteres (None = sem limite)
+        head_ratio: Fração do orçamento reservada ao início
+        marker: Marcador inserido no ponto do corte
+
+    Returns:
+        str: Texto dentro do orçamento
+    """
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    available = max_chars - len(marker)
+    if available <= 0:
+        return text[:max_chars]
+    head = int(available * head_ratio)
+    tail = available - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Colapsa sequências de espaços em branco e remove bordas
+
+    Args:
+        text: Texto original
+
+    Returns:
+        str: Texto normalizado
+    """
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash SHA-256 do texto com espaços normalizados
+
+    Args:
+        text: Texto original
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    return hashlib.sha256(normalize_whitespace(text).encode("utf-8")).hexdigest()
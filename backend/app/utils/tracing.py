@@ -0,0 +1,142 @@
+"""
+Spans leves por requisição, propagados por contextvars, para o cabeçalho
+Server-Timing e o detalhamento de tempos (debug=timing)
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("autou_trace", default=None)
+
+
+class Trace:
+    """
+    Lista de spans (nome, descrição, início e duração) de uma requisição.
+    Spans podem se sobrepor (etapas em paralelo) e o mesmo nome pode se
+    repetir (ex.: uma entrada por chamada ao Gemini).
+    """
+
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+
+    def add(self, name: str, seconds: float, description: Optional[str] = None, started: Optional[float] = None) -> None:
+        """
+        Registra um span já medido
+
+        Args:
+            name: Nome do span (token do Server-Timing: letras, números, '-' e '_')
+            seconds: Duração em segundos
+            description: Detalhe opcional (ex.: etapa da chamada ao Gemini)
+            started: Início (time.perf_counter); padrão: fim menos a duração
+        """
+        if started is None:
+            started = time.perf_counter() - seconds
+        # list.append é atômico: spans podem vir de threads do executor
+        self.spans.append({"name": name, "desc": description, "start": started, "seconds": seconds})
+
+    @contextmanager
+    def span(self, name: str, description: Optional[str] = None) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, description, started)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Valor do cabeçalho Server-Timing, com um 'total' ao final
+
+        Returns:
+            str: Ex.: 'extraction;dur=12.3, gemini;desc="classify";dur=801.2, total;dur=820.4'
+        """
+        entries = []
+        for span in self.spans:
+            entry = span["name"]
+            if span["desc"]:
+                entry += f';desc="{span["desc"]}"'
+            entries.append(f'{entry};dur={span["seconds"] * 1000:.1f}')
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self) -> Dict:
+        """Detalhamento em JSON: início relativo e duração de cada span, em ms"""
+        return {
+            "total_ms": round(self.elapsed() * 1000, 2),
+            "spans": [
+                {
+                    "name": span["name"],
+                    **({"desc": span["desc"]} if span["desc"] else {}),
+                    "start_ms": round((span["start"] - self.started) * 1000, 2),
+                    "duration_ms": round(span["seconds"] * 1000, 2),
+                }
+                for span in sorted(self.spans, key=lambda s: s["start"])
+            ],
+        }
+
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    """Ativa um novo trace para o contexto atual (a requisição) até o fim do bloco"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def detach_trace() -> None:
+    """
+    Desliga o trace no contexto atual. Usado em tasks compartilhadas por
+    várias requisições, que herdariam o trace de quem as criou
+    """
+    _current_trace.set(None)
+
+
+@contextmanager
+def span(name: str, description: Optional[str] = None) -> Iterator[None]:
+    """Mede o bloco no trace ativo; sem trace, não faz nada"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name, description):
+        yield
+
+
+def record(name: str, seconds: float, description: Optional[str] = None) -> None:
+    """Registra no trace ativo um intervalo medido fora de um bloco"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds, description)
+
+
+def traced_callable(func: Callable, *args, **kwargs) -> Callable[[], object]:
+    """
+    Prepara func para rodar em uma thread de executor: leva o contexto (e o
+    trace) da requisição e registra quanto tempo a tarefa esperou na fila
+
+    Returns:
+        Callable: Função sem argumentos para run_in_executor/submit
+    """
+    context = contextvars.copy_context()
+    trace = context.get(_current_trace)
+    submitted = time.perf_counter()
+
+    def runner():
+        if trace is not None:
+            trace.add("executor_wait", time.perf_counter() - submitted, started=submitted)
+        return context.run(func, *args, **kwargs)
+
+    return runner
@@ -0,0 +1,94 @@
+"""
+Utilitários para leitura de uploads sem carregar o arquivo inteiro em memória
+"""
+import asyncio
+import codecs
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import UploadFile
+
+# Tamanho dos blocos lidos do upload
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+
+async def upload_size(file: UploadFile) -> int:
+    """
+    Tamanho do upload em bytes, sem lê-lo
+
+    Args:
+        file: Arquivo enviado via upload
+
+    Returns:
+        int: Tamanho em bytes
+    """
+    if file.size is not None:
+        return file.size
+    await file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    await file.seek(0)
+    return size
+
+
+async def read_upload_bytes(file: UploadFile) -> bytes:
+    """Lê o upload inteiro (usado apenas para arquivos pequenos)"""
+    await file.seek(0)
+    return await file.read()
+
+
+async def spool_upload_to_temp_file(file: UploadFile, suffix: str = "") -> str:
+    """
+    Copia o upload em blocos para um arquivo temporário nomeado, que pode ser
+    mapeado em memória ou aberto por outros processos
+
+    Args:
+        file: Arquivo enviado via upload
+        suffix: Extensão do arquivo temporário
+
+    Returns:
+        str: Caminho do arquivo temporário (o chamador deve removê-lo)
+    """
+    fd, path = tempfile.mkstemp(prefix="autou-upload-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            await file.seek(0)
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+async def decode_text_upload(file: UploadFile, max_chars: Optional[int] = None) -> str:
+    """
+    Decodifica um upload de texto UTF-8 de forma incremental, parando assim
+    que o orçamento de caracteres é atingido
+
+    Args:
+        file: Arquivo enviado via upload
+        max_chars: Orçamento de caracteres (None = arquivo inteiro)
+
+    Returns:
+        str: Texto decodificado (bytes inválidos são ignorados)
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+    total = 0
+    await file.seek(0)
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            parts.append(decoder.decode(b"", final=True))
+            break
+        text = decoder.decode(chunk)
+        parts.append(text)
+        total += len(text)
+        if max_chars is not None and total >= max_chars:
+            break
+    content = "".join(parts)
+    return content[:max_chars] if max_chars is not None else content
@@ -0,0 +1,81 @@
+"""
+Validação e envio dos webhooks (callback_url) dos jobs
+"""
+import ipaddress
+import json
+import socket
+import urllib.request
+from typing import Dict, Sequence
+from urllib.parse import urlparse
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Redirecionamentos levariam o POST a um destino que não foi validado"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _host_allowed(host: str, allowed_hosts: Sequence[str]) -> bool:
+    """Host igual a um item da lista, ou subdomínio de um item iniciado por '.'"""
+    for allowed in allowed_hosts:
+        allowed = allowed.lower()
+        if host == allowed or (allowed.startswith(".") and host.endswith(allowed)):
+            return True
+    return False
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    mapped = getattr(ip, "ipv4_mapped", None)
+    if mapped is not None:
+        ip = mapped
+    # is_global exclui redes privadas, loopback, link-local, reservadas,
+    # não especificadas e o espaço compartilhado (100.64.0.0/10)
+    return ip.is_global and not ip.is_multicast
+
+
+def validate_callback_url(url: str, allowed_hosts: Sequence[str] = ()) -> None:
+    """
+    Garante que o webhook não aponta para a rede interna (SSRF). Com uma
+    lista de hosts permitidos, só eles são aceitos; sem ela, todos os
+    endereços resolvidos para o host precisam ser públicos. Faz consulta
+    DNS: chamar fora do event loop
+
+    Args:
+        url: URL informada pelo cliente
+        allowed_hosts: Hosts permitidos (JOBS_CALLBACK_ALLOWED_HOSTS)
+
+    Raises:
+        ValueError: Se a URL não for http(s) ou o destino não for permitido
+    """
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme not in ("http", "https") or not host:
+        raise ValueError("callback_url deve ser uma URL http(s).")
+    if allowed_hosts:
+        if not _host_allowed(host, allowed_hosts):
+            raise ValueError("callback_url aponta para um host não permitido.")
+        return
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError):
+        raise ValueError("callback_url: host não resolvido.")
+    if not addresses or not all(_is_public_address(address) for address in addresses):
+        raise ValueError("callback_url deve apontar para um endereço público.")
+
+
+def post_json(url: str, body: Dict, timeout: float) -> int:
+    """POST do corpo em JSON, sem seguir redirecionamentos"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with _opener.open(request, timeout=timeout) as response:
+        return response.status
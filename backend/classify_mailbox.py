@@ -0,0 +1,260 @@
+"""
+Classificação em lote de caixas de email (mbox ou maildir), sem passar pela API
+
+Uso:
+    python classify_mailbox.py caixa.mbox -o resultados.jsonl
+    python classify_mailbox.py ~/Maildir -o resultados.csv --concurrency 32
+
+As mensagens são lidas uma a uma e classificadas pelo EmailService. Cada
+resultado é gravado assim que fica pronto, e o id da mensagem vai para o
+arquivo de checkpoint (padrão: <saída>.checkpoint). Ao rodar de novo com a
+mesma saída, as mensagens já registradas são puladas, sem repetir chamadas
+pagas. Falhas e classificações degradadas (stage "fallback", feitas pelo
+classificador local com o backend indisponível) ficam na saída mas não no
+checkpoint, e são refeitas na próxima execução.
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import logging
+import mailbox
+import os
+import sys
+import time
+from typing import Dict, Iterator, Optional, Set
+
+from app.config import settings
+from app.services.email_service import email_service
+from app.utils.eml_parser import eml_headers, parse_eml_stream
+from app.utils.pdf_pool import pdf_pool
+from app.utils.text import extraction_char_budget
+
+logger = logging.getLogger("autou")
+
+CSV_FIELDS = [
+    "id", "ok", "sender", "subject", "categoria", "prioridade", "stage", "confidence",
+    "reply", "detailed_analysis", "tokens_original", "tokens_sent", "tokens_truncated", "error",
+]
+
+# Intervalo (em mensagens) entre os logs de progresso
+PROGRESS_EVERY = 500
+
+
+def open_mailbox(path: str) -> mailbox.Mailbox:
+    """Abre um diretório maildir ou um arquivo mbox (somente leitura)"""
+    if os.path.isdir(path):
+        return mailbox.Maildir(path, factory=None, create=False)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Caixa de email não encontrada: {path}")
+    return mailbox.mbox(path, factory=None, create=False)
+
+
+def iter_raw_messages(box: mailbox.Mailbox) -> Iterator[bytes]:
+    """Gera os bytes de cada mensagem, uma por vez"""
+    for key in box.iterkeys():
+        try:
+            yield box.get_bytes(key)
+        except (KeyError, OSError) as e:
+            # Mensagem removida ou ilegível durante a leitura
+            logger.warning("Mensagem %s ignorada: %s", key, e)
+
+
+def message_id(message, raw: bytes) -> str:
+    """Id estável da mensagem: Message-ID ou hash do conteúdo bruto"""
+    value = message.get("Message-ID")
+    if value:
+        return str(value).strip()
+    return "sha256:" + hashlib.sha256(raw).hexdigest()
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Ids já classificados com sucesso em execuções anteriores"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+class ResultWriter:
+    """Grava resultados (JSONL ou CSV) e o checkpoint linha a linha"""
+
+    def __init__(self, output_path: str, checkpoint_path: str, fmt: str):
+        self.fmt = fmt
+        resuming = os.path.exists(output_path) and os.path.getsize(output_path) > 0
+        self._output = open(output_path, "a", encoding="utf-8", newline="")
+        self._checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+        self._csv = None
+        if fmt == "csv":
+            fields = CSV_FIELDS
+            if resuming:
+                # Mantém as colunas do arquivo existente (saída de uma versão anterior)
+                with open(output_path, encoding="utf-8", newline="") as f:
+                    fields = next(csv.reader(f), None) or CSV_FIELDS
+            self._csv = csv.DictWriter(self._output, fieldnames=fields, extrasaction="ignore")
+            if not resuming:
+                self._csv.writeheader()
+
+    def write(self, row: Dict) -> None:
+        if self._csv is not None:
+            # CSV é plano: a contagem de tokens vira colunas próprias
+            tokens = row.get("tokens") or {}
+            self._csv.writerow({**row, **{f"tokens_{key}": value for key, value in tokens.items()}})
+        else:
+            self._output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._output.flush()
+        # O checkpoint só é gravado depois do resultado
+        if row["ok"]:
+            self._checkpoint.write(row["id"] + "\n")
+            self._checkpoint.flush()
+
+    def close(self) -> None:
+        self._output.close()
+        self._checkpoint.close()
+
+
+async def classify_message(message, msg_id: str, generate_reply: bool, detailed_analysis: bool) -> Dict:
+    """
+    Classifica uma mensagem já analisada
+
+    Returns:
+        Dict: Linha de resultado ('ok' indica sucesso definitivo; resultados
+            degradados saem com 'ok' falso e 'degraded' para serem refeitos)
+    """
+    row = {"id": msg_id, **eml_headers(message)}
+    try:
+        max_chars = None if detailed_analysis else extraction_char_budget()
+        content = await email_service.extract_content_from_message(message, max_chars)
+        result = await email_service.process_email_request(
+            text=content, generate_reply=generate_reply, detailed_analysis=detailed_analysis
+        )
+    except (ValueError, RuntimeError) as e:
+        row.update({"ok": False, "error": str(e)})
+        return row
+    degraded = result.get("stage") == "fallback"
+    row.update({
+        "ok": not degraded,
+        "categoria": result["categoria"],
+        "prioridade": result.get("prioridade"),
+        "stage": result.get("stage"),
+    })
+    if degraded:
+        row["degraded"] = True
+        row["error"] = f"Classificação degradada ({result['degraded']['reason']}); refeita na próxima execução"
+    for key in ("confidence", "reply", "detailed_analysis", "tokens"):
+        if key in result:
+            row[key] = result[key]
+    return row
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    """Lê a caixa, classifica com concorrência limitada e grava os resultados"""
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        logger.info("Retomando: %d mensagens já classificadas serão puladas", len(done))
+
+    box = open_mailbox(args.mailbox)
+    writer = ResultWriter(args.output, checkpoint_path, fmt)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    counts = {"read": 0, "skipped": 0, "succeeded": 0, "degraded": 0, "failed": 0}
+    inflight: Set[str] = set()
+    started = time.perf_counter()
+
+    async def produce() -> None:
+        messages = iter_raw_messages(box)
+        while True:
+            raw = await asyncio.to_thread(next, messages, None)
+            if raw is None:
+                break
+            if args.limit and counts["read"] >= args.limit:
+                break
+            counts["read"] += 1
+            await queue.put(raw)
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    async def consume() -> None:
+        while True:
+            raw = await queue.get()
+            if raw is None:
+                return
+            message = await asyncio.to_thread(parse_eml_stream, io.BytesIO(raw))
+            msg_id = message_id(message, raw)
+            # Pula mensagens já feitas (ou duplicadas em andamento) antes da chamada paga
+            if msg_id in done or msg_id in inflight:
+                counts["skipped"] += 1
+                continue
+            inflight.add(msg_id)
+            try:
+                row = await classify_message(message, msg_id, args.reply, args.analysis)
+            finally:
+                inflight.discard(msg_id)
+            writer.write(row)
+            if row["ok"]:
+                done.add(msg_id)
+                counts["succeeded"] += 1
+            elif row.get("degraded"):
+                counts["degraded"] += 1
+            else:
+                counts["failed"] += 1
+            processed = counts["succeeded"] + counts["degraded"] + counts["failed"]
+            if processed % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                logger.info("%d mensagens classificadas (%.1f/s)", processed, processed / elapsed)
+
+    if settings.PDF_POOL_ENABLED:
+        await pdf_pool.start()
+    try:
+        await asyncio.gather(produce(), *(consume() for _ in range(args.concurrency)))
+    finally:
+        writer.close()
+        box.close()
+        if settings.PDF_POOL_ENABLED:
+            pdf_pool.shutdown()
+
+    counts["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return counts
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Classifica todas as mensagens de um mbox ou maildir, com checkpoint para retomar."
+    )
+    parser.add_argument("mailbox", help="Arquivo mbox ou diretório maildir")
+    parser.add_argument("-o", "--output", required=True, help="Arquivo de resultados (.jsonl ou .csv)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="Formato da saída (padrão: pela extensão)")
+    parser.add_argument("--checkpoint", help="Arquivo de checkpoint (padrão: <saída>.checkpoint)")
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.BATCH_MAX_CONCURRENCY,
+        help="Mensagens classificadas em paralelo (padrão: BATCH_MAX_CONCURRENCY)"
+    )
+    parser.add_argument("--limit", type=int, default=0, help="Lê no máximo N mensagens (0 = todas)")
+    parser.add_argument("--reply", action="store_true", help="Gera também a resposta sugerida")
+    parser.add_argument("--analysis", action="store_true", help="Gera também a análise detalhada")
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.concurrency < 1:
+        print("--concurrency deve ser pelo menos 1", file=sys.stderr)
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    try:
+        counts = asyncio.run(run(args))
+    except FileNotFoundError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("Interrompido; rode novamente com a mesma saída para retomar.", file=sys.stderr)
+        return 130
+    print(json.dumps(counts, ensure_ascii=False))
+    return 0 if counts["failed"] == 0 and counts["degraded"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
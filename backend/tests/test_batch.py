@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import create_app
+from app.services.classifier_backend import ClassifierBackend
+from app.services.email_service import email_service
+
+
+class _EchoBackend(ClassifierBackend):
+    """Devolve o número do email; os primeiros do lote respondem por último"""
+
+    name = "echo"
+
+    async def classify(self, content, generate_reply=False, detailed_analysis=False):
+        number = int(content.split()[-1])
+        await asyncio.sleep(0.02 * (5 - number))
+        return {"categoria": "Produtivo", "prioridade": "Alta", "gemini_raw": str(number)}
+
+    def is_available(self):
+        return True
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(email_service, "backend", _EchoBackend())
+    monkeypatch.setattr(email_service, "circuit_breaker", None)
+    return TestClient(create_app())
+
+
+def test_results_follow_input_order_with_per_item_errors(client):
+    emails = ["Email número 1", "", "Email número 3", "   ", "Email número 5"]
+    response = client.post("/api/classify/batch", json={"emails": emails})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 5
+    assert body["succeeded"] == 3
+    assert [item["index"] for item in body["results"]] == [0, 1, 2, 3, 4]
+    assert [item["ok"] for item in body["results"]] == [True, False, True, False, True]
+    assert [item["gemini_raw"] for item in body["results"] if item["ok"]] == ["1", "3", "5"]
+    for failure in (body["results"][1], body["results"][3]):
+        assert failure["status"] == 400
+        assert failure["error"]
+
+
+def test_unsupported_file_fails_only_its_item(client):
+    files = [
+        ("files", ("a.txt", b"Email numero 1", "text/plain")),
+        ("files", ("b.docx", b"conteudo", "application/octet-stream")),
+    ]
+    body = client.post("/api/classify/batch/files", files=files).json()
+    assert [item["ok"] for item in body["results"]] == [True, False]
+    assert body["results"][1]["status"] == 400
+    assert "Formato não suportado" in body["results"][1]["error"]
+
+
+def test_batch_limits(client, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 2)
+    assert client.post("/api/classify/batch", json={"emails": []}).status_code == 400
+    assert client.post("/api/classify/batch", json={"emails": ["a 1", "b 2", "c 3"]}).status_code == 413
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.circuit_breaker import CIRCUIT_CLOSED, CIRCUIT_OPEN, CircuitBreaker
+from app.services.classifier_backend import ClassifierBackend
+from app.services.email_service import EmailService
+from app.services.rate_limiter import is_transient_failure
+
+
+class _FailingBackend(ClassifierBackend):
+    name = "failing"
+
+    def __init__(self, error):
+        self.error = error
+
+    async def classify(self, content, generate_reply=False, detailed_analysis=False):
+        try:
+            raise self.error
+        except Exception as e:
+            raise RuntimeError(f"Erro ao chamar Gemini AI: {e}") from e
+
+    def is_available(self):
+        return True
+
+
+def _classify(service):
+    return asyncio.run(service.classify_email_async("Preciso do status do chamado 123", detailed_analysis=True))
+
+
+def test_transient_failure_falls_back_to_local_classifier(monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", True)
+    result = _classify(EmailService(backend=_FailingBackend(ConnectionError("reset"))))
+    assert result["stage"] == "fallback"
+    assert result["degraded"]["reason"] == "backend_error"
+
+
+def test_configuration_error_propagates(monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", True)
+    service = EmailService(backend=_FailingBackend(RuntimeError("GEMINI_API_KEY não definida.")))
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        _classify(service)
+    assert service.circuit_breaker.stats()["window_calls"] == 0
+
+
+def test_breaker_opens_only_on_counted_failures():
+    breaker = CircuitBreaker(min_calls=2, window_size=2, is_failure=is_transient_failure)
+
+    async def fail(error):
+        raise error
+
+    async def scenario():
+        for error in (ValueError("400"), ValueError("400")):
+            with pytest.raises(ValueError):
+                await breaker.call(lambda: fail(error))
+        assert breaker.state == CIRCUIT_CLOSED
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await breaker.call(lambda: fail(TimeoutError()))
+        assert breaker.state == CIRCUIT_OPEN
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import csv
+import json
+import mailbox
+from email.message import EmailMessage
+
+import pytest
+
+import classify_mailbox
+from app.config import settings
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.classifier_backend import ClassifierBackend
+from app.services.email_service import email_service
+from app.services.rate_limiter import is_transient_failure
+
+
+class _ScriptedBackend(ClassifierBackend):
+    """Falha nos emails que contêm uma das palavras em 'failing'"""
+
+    name = "scripted"
+
+    def __init__(self, failing=(), error=RuntimeError):
+        self.failing = failing
+        self.error = error
+        self.calls = []
+
+    async def classify(self, content, generate_reply=False, detailed_analysis=False):
+        self.calls.append(content)
+        if any(word in content for word in self.failing):
+            raise self.error("backend recusou o email")
+        return {"categoria": "Produtivo", "prioridade": "Alta", "gemini_raw": "Produtivo"}
+
+    def is_available(self):
+        return True
+
+
+@pytest.fixture
+def mbox_path(tmp_path):
+    path = tmp_path / "caixa.mbox"
+    box = mailbox.mbox(str(path))
+    for index, body in enumerate(["Status do chamado 1", "Email problemático", "Status do chamado 3"]):
+        message = EmailMessage()
+        message["Message-ID"] = f"<msg-{index}@example.com>"
+        message["From"] = "cliente@example.com"
+        message["Subject"] = f"Assunto {index}"
+        message.set_content(body)
+        box.add(message)
+    box.close()
+    return str(path)
+
+
+@pytest.fixture
+def use_backend(monkeypatch):
+    monkeypatch.setattr(settings, "PDF_POOL_ENABLED", False)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(email_service, "circuit_breaker", None)
+
+    def install(backend):
+        monkeypatch.setattr(email_service, "backend", backend)
+        return backend
+
+    return install
+
+
+def _rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failures_exit_nonzero_and_are_retried_on_resume(mbox_path, tmp_path, use_backend):
+    output = str(tmp_path / "resultados.jsonl")
+    use_backend(_ScriptedBackend(failing=("problemático",)))
+    assert classify_mailbox.main([mbox_path, "-o", output, "--concurrency", "2"]) == 1
+    assert classify_mailbox.load_checkpoint(output + ".checkpoint") == {"<msg-0@example.com>", "<msg-2@example.com>"}
+
+    backend = use_backend(_ScriptedBackend())
+    assert classify_mailbox.main([mbox_path, "-o", output]) == 0
+    # Só a mensagem que falhou é classificada de novo
+    assert len(backend.calls) == 1 and "problemático" in backend.calls[0]
+    rows = _rows(output)
+    assert [row["ok"] for row in rows if row["id"] == "<msg-1@example.com>"] == [False, True]
+    assert len(classify_mailbox.load_checkpoint(output + ".checkpoint")) == 3
+
+
+def test_degraded_results_are_not_checkpointed(mbox_path, tmp_path, use_backend, monkeypatch):
+    output = str(tmp_path / "resultados.jsonl")
+    use_backend(_ScriptedBackend(failing=("problemático",), error=ConnectionError))
+    monkeypatch.setattr(email_service, "circuit_breaker", CircuitBreaker(is_failure=is_transient_failure))
+
+    assert classify_mailbox.main([mbox_path, "-o", output]) == 1
+    degraded = [row for row in _rows(output) if row.get("degraded")]
+    assert [row["id"] for row in degraded] == ["<msg-1@example.com>"]
+    assert degraded[0]["ok"] is False and degraded[0]["stage"] == "fallback"
+    assert "<msg-1@example.com>" not in classify_mailbox.load_checkpoint(output + ".checkpoint")
+
+
+def test_csv_resume_keeps_existing_header(mbox_path, tmp_path, use_backend):
+    output = tmp_path / "resultados.csv"
+    old_fields = ["id", "ok", "categoria", "error"]
+    output.write_text(",".join(old_fields) + "\n", encoding="utf-8")
+    use_backend(_ScriptedBackend())
+
+    assert classify_mailbox.main([mbox_path, "-o", str(output)]) == 0
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == old_fields
+    assert all(len(row) == len(old_fields) for row in rows)
+    assert len(rows) == 4
+
+
+def test_missing_mailbox_exits_with_usage_error(tmp_path):
+    assert classify_mailbox.main([str(tmp_path / "nada.mbox"), "-o", str(tmp_path / "out.jsonl")]) == 2
@@ -0,0 +1,50 @@
+from app.utils.email_preprocessing import clean_email_text
+
+
+def test_trailing_disclaimer_and_mobile_footer_are_removed():
+    text = (
+        "Olá, preciso da segunda via do boleto de março.\n\n"
+        "Esta mensagem pode conter informação confidencial e é destinada apenas ao destinatário.\n\n"
+        "Enviado do meu iPhone"
+    )
+    assert clean_email_text(text) == "Olá, preciso da segunda via do boleto de março."
+
+
+def test_body_mentioning_legal_notice_is_kept():
+    text = "Bom dia, equipe.\n\nSegue o aviso legal que pedi, favor revisar."
+    assert clean_email_text(text) == text
+
+
+def test_disclaimer_like_paragraph_before_content_is_kept():
+    text = (
+        "Aviso legal: a cláusula 4 do contrato mudou.\n\n"
+        "Podem confirmar se o novo texto já vale para a renovação?"
+    )
+    assert clean_email_text(text) == text
+
+
+def test_signature_after_sign_off_is_removed():
+    text = (
+        "Preciso da segunda via do boleto de março.\n"
+        "Atenciosamente,\n"
+        "Maria Souza\n"
+        "Gerente Financeira - ACME Ltda\n"
+        "(11) 4002-8922\n"
+        "maria@acme.com.br"
+    )
+    assert clean_email_text(text) == "Preciso da segunda via do boleto de março.\nAtenciosamente,"
+
+
+def test_request_after_early_thanks_is_kept():
+    text = "Bom dia,\nObrigado!\nVocês podem me enviar o status do pedido 123? É urgente"
+    assert clean_email_text(text) == text
+
+
+def test_incident_after_sign_off_is_kept():
+    text = "Oi equipe\nObrigada\nO servidor de produção caiu e ninguém consegue acessar o sistema"
+    assert clean_email_text(text) == text
+
+
+def test_request_after_signature_delimiter_is_kept():
+    text = "Segue abaixo.\n--\nPreciso que resolvam o erro no relatório de vendas hoje"
+    assert clean_email_text(text) == text
@@ -0,0 +1,98 @@
+import asyncio
+import base64
+import io
+import os
+from email.message import EmailMessage
+
+import fitz
+
+from app.config import settings
+from app.services.email_service import EmailService
+from app.utils.eml_parser import (
+    encoded_payload_size,
+    extract_eml_body,
+    html_to_text,
+    iter_pdf_attachments,
+    parse_eml_stream,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return parse_eml_stream(f, chunk_size=64)
+
+
+def _pdf(text):
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def _with_attachments(*attachments):
+    message = EmailMessage()
+    message["From"] = "cliente@example.com"
+    message["Subject"] = "Anexos"
+    message.set_content("Seguem os anexos.")
+    for data, maintype, subtype, filename in attachments:
+        message.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+    return parse_eml_stream(io.BytesIO(message.as_bytes()))
+
+
+def test_plain_text_is_preferred_over_html():
+    assert extract_eml_body(_load("alternative.eml")) == "Versão em texto: preciso do status do chamado 123."
+
+
+def test_html_body_is_converted_to_text():
+    body = extract_eml_body(_load("html_only.eml"))
+    assert body == "Segue a fatura de março.\nValor: R$ 100\n\nObrigado"
+
+
+def test_empty_plain_part_falls_back_to_html():
+    assert extract_eml_body(_load("empty_plain.eml")) == "Conteúdo só no HTML"
+
+
+def test_html_to_text_drops_invisible_blocks_and_collapses_blank_lines():
+    markup = "<style>x</style><p>Um</p><p></p><p></p><p></p><p>Dois &amp; três</p><!-- <p>oculto</p> -->"
+    assert html_to_text(markup) == "Um\n\nDois & três"
+
+
+def test_encoded_size_estimates_decoded_size():
+    data = os.urandom(50_000)
+    message = _with_attachments((data, "application", "pdf", "grande.pdf"))
+    (attachment,) = iter_pdf_attachments(message)
+    # Quebras de linha do base64 tornam a estimativa um pouco maior, nunca menor
+    assert len(data) <= attachment["size"] <= len(data) * 1.03
+    assert attachment["size"] == encoded_payload_size(attachment["part"])
+
+
+def test_only_pdf_attachments_are_listed_and_oversized_ones_skipped():
+    small, large = _pdf("Fatura de março"), os.urandom(20_000)
+    message = _with_attachments(
+        (b"\x89PNG", "image", "png", "foto.png"),
+        (small, "application", "pdf", "fatura.pdf"),
+        (large, "application", "octet-stream", "contrato.PDF"),
+    )
+    attachments = iter_pdf_attachments(message, max_bytes=10_000)
+    assert [(a["filename"], a["skipped"]) for a in attachments] == [("fatura.pdf", False), ("contrato.PDF", True)]
+
+
+def test_skipped_attachment_is_not_decoded(monkeypatch):
+    monkeypatch.setattr(settings, "EML_MAX_ATTACHMENT_BYTES", 10_000)
+    monkeypatch.setattr(settings, "PDF_POOL_ENABLED", False)
+    message = _with_attachments(
+        (_pdf("Fatura de março"), "application", "pdf", "fatura.pdf"),
+        (_pdf("Contrato") + b"\0" * 20_000, "application", "pdf", "contrato.pdf"),
+    )
+    decoded = []
+    large = iter_pdf_attachments(message)[1]["part"]
+    original = large.get_payload
+    monkeypatch.setattr(large, "get_payload", lambda *a, **kw: decoded.append(kw) or original(*a, **kw))
+
+    content = asyncio.run(EmailService(backend=None).extract_content_from_message(message))
+    assert "[Anexo: fatura.pdf]\nFatura de março" in content
+    assert "contrato" not in content.lower()
+    assert {"decode": True} not in decoded
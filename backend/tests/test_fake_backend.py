@@ -0,0 +1,61 @@
+import asyncio
+import json
+import statistics
+
+import pytest
+
+from app.config import settings
+from app.services.fake_backend import FakeBackend
+from app.services.rate_limiter import is_transient_failure
+
+
+def test_latency_follows_configured_median():
+    backend = FakeBackend(latency_median_ms=100, latency_sigma=0.5, seed=1)
+    samples = [backend._sample_latency() for _ in range(2000)]
+    assert statistics.median(samples) == pytest.approx(0.1, rel=0.1)
+    assert min(samples) < 0.1 < max(samples)
+
+
+def test_zero_sigma_gives_fixed_latency():
+    backend = FakeBackend(latency_median_ms=50, latency_sigma=0)
+    assert {backend._sample_latency() for _ in range(10)} == {0.05}
+
+
+def test_same_seed_gives_same_sequence():
+    first, second = FakeBackend(seed=7), FakeBackend(seed=7)
+    assert [first._sample_latency() for _ in range(5)] == [second._sample_latency() for _ in range(5)]
+
+
+def test_errors_follow_configured_rate_and_are_transient():
+    backend = FakeBackend(latency_median_ms=0, error_rate=0.3, seed=3)
+
+    async def scenario():
+        return await asyncio.gather(*(backend.classify(f"email {i}") for i in range(1000)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    errors = [result for result in results if isinstance(result, BaseException)]
+    assert backend.calls == 1000
+    assert backend.errors == len(errors)
+    assert 0.25 < len(errors) / 1000 < 0.35
+    # Mesmo formato do GeminiService: a fallback do circuit breaker a reconhece
+    assert all(isinstance(error, RuntimeError) and is_transient_failure(error) for error in errors)
+
+
+def test_same_content_gets_same_canned_answer():
+    backend = FakeBackend(latency_median_ms=0)
+    first = asyncio.run(backend.classify("Preciso do status do chamado 123", generate_reply=True))
+    second = asyncio.run(backend.classify("Preciso do status do chamado 123", generate_reply=True))
+    assert first == second
+    assert "reply" in first and "detailed_analysis" not in first
+
+
+def test_from_settings_reads_outputs_file(tmp_path, monkeypatch):
+    outputs = tmp_path / "outputs.json"
+    outputs.write_text(json.dumps([{"categoria": "Improdutivo", "prioridade": "Baixa", "reply": "Obrigado!"}]))
+    monkeypatch.setattr(settings, "FAKE_BACKEND_OUTPUTS_PATH", str(outputs))
+    monkeypatch.setattr(settings, "FAKE_BACKEND_LATENCY_MEDIAN_MS", 0)
+    monkeypatch.setattr(settings, "FAKE_BACKEND_ERROR_RATE", 0)
+
+    result = asyncio.run(FakeBackend.from_settings().classify("qualquer", generate_reply=True))
+    assert result["categoria"] == "Improdutivo"
+    assert result["reply"] == "Obrigado!"
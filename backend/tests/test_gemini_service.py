@@ -0,0 +1,231 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.gemini_service import GeminiService
+
+EMAIL = "Preciso do status do chamado 123."
+
+
+@pytest.fixture
+def make_service(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "RESULT_CACHE_DISK_ENABLED", True)
+    monkeypatch.setattr(settings, "RESULT_CACHE_DISK_PATH", str(tmp_path / "results.sqlite3"))
+    monkeypatch.setattr(settings, "GEMINI_MICROBATCH_ENABLED", False)
+    monkeypatch.setattr(settings, "GEMINI_HEDGE_ENABLED", False)
+    services = []
+
+    def factory():
+        service = GeminiService()
+        service.calls = []
+
+        async def call(content, generate_reply, detailed_analysis=False):
+            service.calls.append((content, generate_reply, detailed_analysis))
+            result = {"categoria": "Produtivo", "gemini_raw": "Produtivo", "extra": {"tags": ["suporte"]}}
+            if generate_reply:
+                result["reply"] = "Olá, vamos verificar."
+            return result
+
+        service._call_gemini_classify_and_optional_reply_async = call
+        services.append(service)
+        return service
+
+    yield factory
+    for service in services:
+        service.disk_cache.close()
+
+
+def test_cache_key_ignores_whitespace_but_not_flags(make_service):
+    service = make_service()
+    key = service._cache_key(EMAIL, False, False)
+    assert service._cache_key("  Preciso do status\n do chamado 123.  ", False, False) == key
+    assert service._cache_key(EMAIL, True, False) != key
+    assert service._cache_key(EMAIL, False, True) != key
+    assert service._cache_key("Outro email", False, False) != key
+
+
+def test_cache_key_changes_with_model(make_service, monkeypatch):
+    key = make_service()._cache_key(EMAIL, False, False)
+    monkeypatch.setattr(settings, "GEMINI_MODEL", "outro-modelo")
+    assert make_service()._cache_key(EMAIL, False, False) != key
+
+
+def test_hit_returns_a_copy(make_service):
+    service = make_service()
+    first = asyncio.run(service.classify_email_async(EMAIL))
+    first["categoria"] = "Improdutivo"
+    first["extra"]["tags"].append("alterado")
+
+    second = asyncio.run(service.classify_email_async(EMAIL))
+    assert len(service.calls) == 1
+    assert second["categoria"] == "Produtivo"
+    assert second["extra"] == {"tags": ["suporte"]}
+
+
+def test_entry_with_reply_serves_plain_classification(make_service):
+    service = make_service()
+    asyncio.run(service.classify_email_async(EMAIL, generate_reply=True))
+    result = asyncio.run(service.classify_email_async(EMAIL))
+    assert len(service.calls) == 1
+    assert "reply" not in result
+
+
+def test_disk_tier_is_shared_between_instances(make_service):
+    asyncio.run(make_service().classify_email_async(EMAIL))
+    other = make_service()
+    result = asyncio.run(other.classify_email_async(EMAIL))
+    assert other.calls == []
+    assert result["categoria"] == "Produtivo"
+    assert other.disk_cache.hits == 1
+
+
+def test_partial_results_are_not_cached(make_service):
+    service = make_service()
+    original = service._call_gemini_classify_and_optional_reply_async
+
+    async def partial(*args, **kwargs):
+        result = await original(*args, **kwargs)
+        result["partial_errors"] = {"reply": "timeout"}
+        return result
+
+    service._call_gemini_classify_and_optional_reply_async = partial
+    asyncio.run(service.classify_email_async(EMAIL))
+    asyncio.run(service.classify_email_async(EMAIL))
+    assert len(service.calls) == 2
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    """Serviço sem cache cujo _generate/_generate_async respondem por etapa (call)"""
+    monkeypatch.setattr(settings, "RESULT_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "GEMINI_MICROBATCH_ENABLED", False)
+    monkeypatch.setattr(settings, "GEMINI_HEDGE_ENABLED", False)
+    monkeypatch.setattr(settings, "GEMINI_STRUCTURED_OUTPUT", True)
+
+    def factory(responses):
+        service = GeminiService()
+        service.calls = []
+
+        def respond(call):
+            service.calls.append(call)
+            response = responses[call]
+            if isinstance(response, BaseException):
+                raise response
+            return response
+
+        async def generate_async(prompt, config=None, hedge=False, call="classify"):
+            response = responses[call]
+            if callable(response):
+                service.calls.append(call)
+                return await response()
+            return respond(call)
+
+        service._generate_async = generate_async
+        service._generate = lambda prompt, config=None, call="classify", deadline=None: respond(call)
+        return service
+
+    return factory
+
+
+def test_valid_structured_response_needs_a_single_call(scripted):
+    service = scripted({
+        "structured": '{"categoria": "Produtivo", "prioridade": "Alta", "reply": "Vamos verificar."}',
+    })
+    result = asyncio.run(service.classify_email_async(EMAIL, generate_reply=True))
+    assert service.calls == ["structured"]
+    assert result["categoria"] == "Produtivo"
+    assert result["prioridade"] == "Alta"
+    assert result["reply"] == "Vamos verificar."
+
+
+@pytest.mark.parametrize("structured", [
+    "CATEGORIA: Produtivo",  # não é JSON
+    '["Produtivo"]',  # JSON que não é objeto
+    '{"categoria": "Urgente", "prioridade": "Alta"}',  # categoria inválida
+    '{"categoria": "Produtivo", "prioridade": "Alta"}',  # falta a resposta pedida
+])
+def test_unusable_structured_response_falls_back_to_sequential_calls(scripted, structured):
+    responses = {
+        "structured": structured,
+        "classify": "CATEGORIA: Produtivo\nPRIORIDADE: Média",
+        "reply": "Olá, vamos verificar.",
+    }
+    service = scripted(responses)
+    result = asyncio.run(service.classify_email_async(EMAIL, generate_reply=True))
+    assert service.calls == ["structured", "classify", "reply"]
+    assert result["categoria"] == "Produtivo"
+    assert result["prioridade"] == "Média"
+    assert result["reply"] == "Olá, vamos verificar."
+    assert result["gemini_raw"] == responses["classify"]
+
+
+def test_sync_path_falls_back_too(scripted):
+    service = scripted({"structured": "não é JSON", "classify": "CATEGORIA: Improdutivo\nPRIORIDADE: Baixa"})
+    result = service.classify_email(EMAIL)
+    assert service.calls == ["structured", "classify"]
+    assert result["categoria"] == "Improdutivo"
+
+
+@pytest.mark.parametrize("text, categoria", [
+    ("CATEGORIA: Improdutivo\nPRIORIDADE: Baixa", "Improdutivo"),
+    ("CATEGORIA: Produtivo\nPRIORIDADE: Alta", "Produtivo"),
+    ("O email é improdutivo.", "Improdutivo"),
+    ("O email é produtivo.", "Produtivo"),
+])
+def test_free_text_labels_use_canonical_category(scripted, text, categoria):
+    assert scripted({})._normalize_classification(text)["categoria"] == categoria
+
+
+def _branching(scripted, monkeypatch, analysis, reply="Olá, vamos verificar."):
+    monkeypatch.setattr(settings, "GEMINI_STRUCTURED_OUTPUT", False)
+    monkeypatch.setattr(settings, "GEMINI_BRANCH_TIMEOUT_SECONDS", 0.1)
+    return scripted({"classify": "CATEGORIA: Produtivo\nPRIORIDADE: Alta", "analysis": analysis, "reply": reply})
+
+
+def test_failed_branch_returns_partial_result(scripted, monkeypatch):
+    service = _branching(scripted, monkeypatch, analysis=ConnectionError("reset"))
+    for result in (
+        asyncio.run(service.classify_email_async(EMAIL, generate_reply=True, detailed_analysis=True)),
+        service.classify_email(EMAIL, generate_reply=True, detailed_analysis=True),
+    ):
+        assert result["categoria"] == "Produtivo"
+        assert result["reply"] == "Olá, vamos verificar."
+        assert "detailed_analysis" not in result
+        assert result["partial_errors"] == {"detailed_analysis": "reset"}
+
+
+def test_slow_branch_times_out_into_partial_result(scripted, monkeypatch):
+    async def slow():
+        await asyncio.sleep(1.0)
+
+    service = _branching(scripted, monkeypatch, analysis=slow)
+    result = asyncio.run(service.classify_email_async(EMAIL, generate_reply=True, detailed_analysis=True))
+    assert result["reply"] == "Olá, vamos verificar."
+    assert "tempo limite" in result["partial_errors"]["detailed_analysis"]
+
+
+def test_slow_branch_times_out_on_sync_path(scripted, monkeypatch):
+    service = _branching(scripted, monkeypatch, analysis="Análise")
+    respond = service._generate
+
+    def generate(prompt, config=None, call="classify", deadline=None):
+        if call == "analysis":
+            time.sleep(0.5)
+        return respond(prompt, config, call, deadline)
+
+    service._generate = generate
+    started = time.monotonic()
+    result = service.classify_email(EMAIL, generate_reply=True, detailed_analysis=True)
+    # Responde no prazo da etapa, sem esperar a thread que continua rodando
+    assert time.monotonic() - started < 0.4
+    assert result["reply"] == "Olá, vamos verificar."
+    assert "tempo limite" in result["partial_errors"]["detailed_analysis"]
+
+
+def test_all_branches_failing_raises(scripted, monkeypatch):
+    service = _branching(scripted, monkeypatch, analysis=ConnectionError("reset"), reply=TimeoutError("lento"))
+    with pytest.raises(RuntimeError, match="reset"):
+        asyncio.run(service.classify_email_async(EMAIL, generate_reply=True, detailed_analysis=True))
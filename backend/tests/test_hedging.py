@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.hedging import Hedger, LatencyTracker
+
+
+def _hedger(max_per_minute=60.0):
+    tracker = LatencyTracker(window=10, min_samples=1)
+    tracker.observe(0.01)
+    return Hedger(percentile=50, max_per_minute=max_per_minute, min_delay_seconds=0.01, tracker=tracker)
+
+
+def test_refused_hedge_does_not_spend_budget():
+    hedger = _hedger(max_per_minute=1.0)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert asyncio.run(hedger.run(slow, can_hedge=lambda: False)) == "ok"
+    assert hedger.hedges_skipped == 1
+    # O único token do orçamento continua disponível
+    assert hedger.budget.try_reserve(1)
+
+
+def test_losing_attempt_is_cancelled_before_returning():
+    hedger = _hedger()
+    attempts = []
+
+    async def call():
+        index = len(attempts)
+        attempts.append("running")
+        try:
+            await asyncio.sleep(1.0 if index == 0 else 0.02)
+            return index
+        except asyncio.CancelledError:
+            attempts[index] = "cancelled"
+            raise
+
+    async def scenario():
+        result = await hedger.run(call)
+        # Sem ceder o loop: o cancelamento da perdedora já foi concluído
+        return result, list(attempts)
+
+    result, seen = asyncio.run(scenario())
+    assert result == 1
+    assert hedger.hedges_won == 1
+    assert seen == ["cancelled", "running"]
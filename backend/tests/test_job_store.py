@@ -0,0 +1,68 @@
+import time
+
+from app.services.job_store import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JobStore
+
+
+def _store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_claim_is_exclusive(tmp_path):
+    store = _store(tmp_path)
+    job = store.create({"content": "oi"})
+    other = JobStore(store.path)  # outro processo no mesmo banco
+    assert store.claim(job["id"], 60)["status"] == JOB_RUNNING
+    assert other.claim(job["id"], 60) is None
+    assert store.get(job["id"])["attempts"] == 1
+
+
+def test_recover_requeues_only_expired_leases(tmp_path):
+    store = _store(tmp_path)
+    alive = store.create({"content": "a"})
+    dead = store.create({"content": "b"})
+    store.claim(alive["id"], 60)
+    store.claim(dead["id"], 0.01)
+    time.sleep(0.05)
+
+    assert store.recover(max_attempts=3) == [dead["id"]]
+    assert store.get(alive["id"])["status"] == JOB_RUNNING
+    assert store.get(dead["id"])["status"] == JOB_QUEUED
+
+
+def test_recover_fails_jobs_out_of_attempts(tmp_path):
+    store = _store(tmp_path)
+    job = store.create({"content": "a"})
+    store.claim(job["id"], 0)
+    assert store.recover(max_attempts=1) == []
+    assert store.get(job["id"])["status"] == JOB_FAILED
+
+
+def test_renew_lease_keeps_job_running(tmp_path):
+    store = _store(tmp_path)
+    job = store.create({"content": "a"})
+    store.claim(job["id"], 0.01)
+    assert store.renew_lease(job["id"], 60)
+    time.sleep(0.05)
+    assert store.recover(max_attempts=3) == []
+
+
+def test_queue_counts_are_cached_between_scrapes(tmp_path, monkeypatch):
+    import asyncio
+
+    from app.services.job_queue import JobQueue
+
+    store = _store(tmp_path)
+    store.create({"content": "a"})
+    queue = JobQueue(store, service=None, workers=1, max_attempts=3,
+                     callback_timeout_seconds=1, callback_max_attempts=1)
+    calls = []
+    original = store.counts
+    monkeypatch.setattr(store, "counts", lambda: calls.append(1) or original())
+
+    assert queue.cached_counts() == {}
+    first = asyncio.run(queue.refresh_counts())
+    store.create({"content": "b"})
+    second = asyncio.run(queue.refresh_counts())
+    assert first[JOB_QUEUED] == second[JOB_QUEUED] == 1
+    assert len(calls) == 1
+    assert queue.cached_counts()[JOB_QUEUED] == 1
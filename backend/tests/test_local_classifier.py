@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from app.services.local_classifier import DEFAULT_MODEL_PATH, FEATURE_VERSION, LocalClassifier
+
+
+def test_bundled_model_matches_current_features():
+    with open(DEFAULT_MODEL_PATH, encoding="utf-8") as f:
+        assert json.load(f)["feature_version"] == FEATURE_VERSION
+    result = LocalClassifier().load(DEFAULT_MODEL_PATH).predict("Feliz aniversário! Parabéns pela festa")
+    assert result["categoria"] == "Improdutivo"
+
+
+def test_model_with_other_feature_version_is_rejected(tmp_path):
+    with open(DEFAULT_MODEL_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    data["feature_version"] = FEATURE_VERSION + 1
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    with pytest.raises(ValueError):
+        LocalClassifier().load(str(path))
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.services.gemini_service import GeminiService
+from app.services.micro_batcher import MicroBatchDispatcher
+from app.services.rate_limiter import RateLimitedError
+
+
+class _FakeService:
+    """Registra os lotes e as chamadas individuais feitas pelo dispatcher"""
+
+    def __init__(self, parse=None, batch_error=None):
+        self.batches = []
+        self.singles = []
+        self.parse = parse or (lambda contents: [{"categoria": "Produtivo", "via": "lote", "email": c} for c in contents])
+        self.batch_error = batch_error
+
+    async def classify_many_async(self, contents):
+        self.batches.append(list(contents))
+        if self.batch_error is not None:
+            raise self.batch_error
+        return self.parse(contents)
+
+    async def classify_single_async(self, content):
+        self.singles.append(content)
+        return {"categoria": "Produtivo", "via": "individual", "email": content}
+
+
+def _submit_all(dispatcher, contents):
+    async def scenario():
+        return await asyncio.gather(*(dispatcher.submit(content) for content in contents), return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_batches_are_split_by_item_count():
+    service = _FakeService()
+    dispatcher = MicroBatchDispatcher(service, window_seconds=0.05, max_items=2, max_tokens=10_000)
+    contents = [f"email {index}" for index in range(5)]
+
+    results = _submit_all(dispatcher, contents)
+    assert service.batches == [contents[0:2], contents[2:4]]
+    # O último fica sozinho na janela e vai como chamada individual
+    assert service.singles == [contents[4]]
+    assert [result["email"] for result in results] == contents
+
+
+def test_batches_are_split_by_token_budget():
+    service = _FakeService()
+    dispatcher = MicroBatchDispatcher(service, window_seconds=0.05, max_items=10, max_tokens=25)
+    contents = ["a" * 40, "b" * 40, "c" * 40, "d" * 40]  # 10 tokens cada: dois por lote
+
+    _submit_all(dispatcher, contents)
+    assert [len(batch) for batch in service.batches] == [2, 2]
+
+
+def test_email_over_the_budget_skips_batching():
+    service = _FakeService()
+    dispatcher = MicroBatchDispatcher(service, window_seconds=0.05, max_items=10, max_tokens=10)
+
+    (result,) = _submit_all(dispatcher, ["x" * 400])
+    assert service.batches == []
+    assert result["via"] == "individual"
+
+
+def test_unparsed_items_fall_back_to_single_calls():
+    service = _FakeService(parse=lambda contents: [{"categoria": "Produtivo", "via": "lote", "email": contents[0]}, None, None])
+    dispatcher = MicroBatchDispatcher(service, window_seconds=0.05, max_items=3, max_tokens=10_000)
+
+    results = _submit_all(dispatcher, ["um", "dois", "três"])
+    assert [result["via"] for result in results] == ["lote", "individual", "individual"]
+    assert service.singles == ["dois", "três"]
+    assert dispatcher.fallbacks == 2
+
+
+def test_failed_batch_falls_back_to_single_calls():
+    service = _FakeService(batch_error=ConnectionError("reset"))
+    dispatcher = MicroBatchDispatcher(service, window_seconds=0.05, max_items=2, max_tokens=10_000)
+
+    results = _submit_all(dispatcher, ["um", "dois"])
+    assert [result["via"] for result in results] == ["individual", "individual"]
+    assert dispatcher.batches_sent == 0
+
+
+def test_rate_limited_batch_is_not_retried_item_by_item():
+    service = _FakeService(batch_error=RateLimitedError("cota esgotada", retry_after=3))
+    dispatcher = MicroBatchDispatcher(service, window_seconds=0.05, max_items=2, max_tokens=10_000)
+
+    results = _submit_all(dispatcher, ["um", "dois"])
+    assert all(isinstance(result, RateLimitedError) for result in results)
+    assert service.singles == []
+
+
+@pytest.mark.parametrize("response, expected", [
+    ('[{"id": 1, "categoria": "Improdutivo", "prioridade": "Baixa"}, '
+     '{"id": 0, "categoria": "Produtivo", "prioridade": "Alta"}]', ["Produtivo", "Improdutivo"]),
+    ('[{"id": 0, "categoria": "Produtivo", "prioridade": "Alta"}, {"id": 5, "categoria": "Produtivo"}]', ["Produtivo", None]),
+    ('[{"id": 1, "categoria": "Talvez"}]', [None, None]),
+    ("não é JSON", [None, None]),
+])
+def test_multi_classification_is_matched_by_id(response, expected):
+    results = GeminiService()._parse_multi_classification(response, 2)
+    assert [result and result["categoria"] for result in results] == expected
@@ -0,0 +1,15 @@
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import create_app
+
+
+def test_request_size_rejection_carries_cors_headers(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_REQUEST_BYTES", 10)
+    client = TestClient(create_app())
+    origin = "http://localhost:3000"
+    response = client.post(
+        "/api/classify", data={"text": "x" * 100}, headers={"Origin": origin}
+    )
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == origin
@@ -0,0 +1,56 @@
+import fitz
+import pytest
+
+from app.utils.cache import TTLCache
+from app.utils.pdf_cache import PdfTextCache
+from app.utils.pdf_extractor import extract_pdf_text
+
+
+def _pdf(pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+@pytest.mark.parametrize("max_chars", [20, 30])
+def test_budget_stop_is_reported_even_when_text_is_shorter_than_budget(max_chars):
+    # A última página lida tem espaços ao fim, removidos pelo strip:
+    # o texto sai menor que o orçamento, mas o documento não foi lido todo
+    pdf = _pdf(["a" * 10, "b" * 10 + " " * 10, "c" * 10])
+    text, complete, _ = extract_pdf_text(pdf, max_chars=max_chars)
+    assert not complete
+    assert "c" not in text
+
+
+def test_whole_document_is_complete():
+    text, complete, _ = extract_pdf_text(_pdf(["abc", "def"]), max_chars=1000)
+    assert complete
+    assert "def" in text
+
+
+def test_cache_keeps_partial_extraction_under_its_budget():
+    cache = PdfTextCache(TTLCache(max_size=10, ttl_seconds=60))
+    cache.set("digest", 30, "partial", 0.1, complete=False)
+    assert cache.get("digest", None) is None
+    assert cache.get("digest", 500) is None
+    assert cache.get("digest", 30) == "partial"
+
+    cache.set("digest", 30, "whole", 0.1, complete=True)
+    assert cache.get("digest", None) == "whole"
+
+
+def test_seconds_saved_and_hit_ratio_are_exported(monkeypatch):
+    from app.routes import metrics_routes
+
+    cache = PdfTextCache(TTLCache(max_size=10, ttl_seconds=60))
+    monkeypatch.setattr(metrics_routes, "pdf_text_cache", cache)
+    cache.set("digest", None, "text", 1.5, complete=True)
+    assert cache.get("digest", 100) == "text"
+    assert cache.get("other", 100) is None
+
+    rendered = metrics_routes.registry.render()
+    assert "autou_pdf_cache_seconds_saved_total 1.5" in rendered
+    assert "autou_pdf_cache_hit_ratio 0.5" in rendered
@@ -0,0 +1,137 @@
+import fitz
+import pytest
+
+from app.utils.pdf_extractor import extract_pdf_text, is_page_text_usable, iter_pdf_page_sources, main_library
+
+
+def _pdf(pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def test_reports_the_library_that_extracted_the_pages():
+    pdf = _pdf(["Primeira página", "Segunda página"])
+    assert extract_pdf_text(pdf, ["PyMuPDF", "PyPDF2"])[2] == "PyMuPDF"
+    assert extract_pdf_text(pdf, ["PyPDF2", "PyMuPDF"])[2] == "PyPDF2"
+
+
+def test_main_library_prefers_most_pages_then_first_seen():
+    assert main_library({}) == "none"
+    assert main_library({"PyMuPDF": 1, "PyPDF2": 3}) == "PyPDF2"
+    assert main_library({"PyMuPDF": 2, "PyPDF2": 2}) == "PyMuPDF"
+
+
+class _FakeDocument:
+    """Documento com o texto de cada página por biblioteca; registra as leituras"""
+
+    pages = {}
+    text_layer = {}
+    opened = []
+    reads = []
+
+    def __init__(self, source):
+        self.opened.append(self.name)
+
+    def __len__(self):
+        return len(self.pages[self.name])
+
+    def page_text(self, index):
+        self.reads.append((self.name, index))
+        return self.pages[self.name][index]
+
+    def has_text_layer(self, index):
+        return self.text_layer.get(index)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_libraries(monkeypatch):
+    from app.utils import pdf_extractor
+
+    def install(pages, text_layer=None):
+        _FakeDocument.pages = pages
+        _FakeDocument.text_layer = text_layer or {}
+        _FakeDocument.opened = []
+        _FakeDocument.reads = []
+        openers = {name: type(name, (_FakeDocument,), {"name": name}) for name in pages}
+        monkeypatch.setattr(pdf_extractor, "_document_openers", lambda: openers)
+        return _FakeDocument
+
+    return install
+
+
+def test_only_unusable_pages_fall_back_to_the_next_library(fake_libraries):
+    fake = fake_libraries({
+        "rápida": ["Página um", "(cid:1)(cid:2)(cid:3)", "Página três"],
+        "lenta": ["Página um (lenta)", "Página dois", "Página três (lenta)"],
+    })
+    pages = list(iter_pdf_page_sources(b"%PDF", ["rápida", "lenta"]))
+    assert pages == [("Página um", "rápida"), ("Página dois", "lenta"), ("Página três", "rápida")]
+    assert [read for read in fake.reads if read[0] == "lenta"] == [("lenta", 1)]
+
+
+def test_secondary_library_is_opened_only_when_needed(fake_libraries):
+    fake = fake_libraries({"rápida": ["Um", "Dois"], "lenta": ["Um", "Dois"]})
+    assert extract_pdf_text(b"%PDF", ["rápida", "lenta"]) == ("Um\nDois", True, "rápida")
+    assert fake.opened == ["rápida"]
+
+
+def test_page_without_text_layer_is_not_retried(fake_libraries):
+    fake = fake_libraries(
+        {"rápida": ["Um", ""], "lenta": ["Um", "texto que não deveria ser lido"]},
+        text_layer={0: True, 1: False},
+    )
+    assert list(iter_pdf_page_sources(b"%PDF", ["rápida", "lenta"])) == [("Um", "rápida"), ("", None)]
+    assert ("rápida", 1) not in fake.reads
+    assert "lenta" not in fake.opened
+
+
+@pytest.mark.parametrize("text, usable", [
+    ("Texto normal da página.", True),
+    ("   \n ", False),
+    ("(cid:12)(cid:13)(cid:14) abc", False),
+    ("��� ��", False),
+    ("R$ 1.234,56 - 10% (à vista)", True),
+])
+def test_page_text_quality_check(text, usable):
+    assert is_page_text_usable(text) is usable
+
+
+def test_page_made_of_unmapped_glyphs_is_unusable():
+    assert not is_page_text_usable("(cid:12)(cid:13)(cid:14)(cid:15)")
+    assert not is_page_text_usable("(cid:123)(cid:124) ok")
+    assert is_page_text_usable("Fatura de março (cid:3) com um glifo perdido")
+
+
+def test_extraction_stops_reading_pages_at_the_budget(fake_libraries):
+    fake = fake_libraries({"rápida": ["a" * 100 for _ in range(50)]})
+    text, complete, _ = extract_pdf_text(b"%PDF", ["rápida"], max_chars=250)
+    assert len(text) == 250
+    assert not complete
+    # Três páginas bastam para 250 caracteres; as demais nem são lidas
+    assert len(fake.reads) == 3
+
+
+def test_budget_larger_than_document_reads_everything(fake_libraries):
+    fake = fake_libraries({"rápida": ["Um", "Dois", "Três"]})
+    text, complete, _ = extract_pdf_text(b"%PDF", ["rápida"], max_chars=1000)
+    assert (text, complete) == ("Um\nDois\nTrês", True)
+    assert len(fake.reads) == 3
+
+
+def test_page_range_reads_only_its_pages(fake_libraries, tmp_path):
+    from app.utils.pdf_extractor import extract_pdf_page_range
+
+    fake = fake_libraries({"rápida": [f"Página {index}" for index in range(10)]})
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF")
+    pages, counts = extract_pdf_page_range(str(path), 4, 7, ["rápida"])
+    assert pages == ["Página 4", "Página 5", "Página 6"]
+    assert counts == {"rápida": 3}
+    assert [index for _, index in fake.reads] == [4, 5, 6]
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import fitz
+import pytest
+
+from app.utils.pdf_pool import PdfProcessPool
+
+
+def _pdf(pages):
+    document = fitz.open()
+    for text in pages:
+        document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+PDF = _pdf([f"Página {index:02d}" for index in range(40)])
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def factory(**kwargs):
+        options = {"workers": 1, "timeout_seconds": 30, "memory_limit_mb": 0}
+        options.update(kwargs)
+        pool = PdfProcessPool(**options)
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_timeout_kills_the_pool_and_next_document_gets_a_new_one(make_pool):
+    pool = make_pool(timeout_seconds=0.5)
+
+    async def scenario():
+        executor = await pool._ready_executor()
+        # Ocupa o único worker: o documento fica na fila até estourar o timeout
+        executor.submit(time.sleep, 30)
+        processes = list(executor._processes.values())
+        with pytest.raises(ValueError, match="Tempo limite"):
+            await pool.extract(PDF)
+        text, complete, library = await pool.extract(PDF)
+        return executor, processes, text, complete
+
+    old_executor, processes, text, complete = asyncio.run(scenario())
+    assert pool.timeouts == 1
+    assert pool.restarts == 1
+    assert pool._executor is not old_executor
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+    assert complete and "Página 39" in text
+
+
+def test_document_in_flight_when_pool_breaks_is_retried(make_pool):
+    pool = make_pool()
+
+    async def scenario():
+        executor = await pool._ready_executor()
+        executor.submit(time.sleep, 30)
+        extraction = asyncio.ensure_future(pool.extract(PDF, max_chars=50))
+        await asyncio.sleep(0.2)
+        assert not extraction.done()
+        # Simula o reinício causado pelo timeout de outro documento
+        pool._restart(executor)
+        return await extraction
+
+    text, complete, _ = asyncio.run(scenario())
+    assert text.startswith("Página 00")
+    assert not complete
+    assert pool.completed == 1
+    assert pool.failures == 0
+    # A retentativa não reinicia de novo um pool que já foi substituído
+    assert pool.restarts == 1
+
+
+def test_parallel_page_ranges_keep_document_order(make_pool):
+    pool = make_pool(workers=2, parallel_min_pages=10)
+
+    text, complete, library = asyncio.run(pool.extract(PDF))
+    assert pool.parallel_runs == 1
+    assert complete
+    assert library == "PyMuPDF"
+    assert [line for line in text.splitlines() if line] == [f"Página {index:02d}" for index in range(40)]
+
+
+def test_email_service_extracts_pdfs_through_the_pool(make_pool, monkeypatch):
+    from app.config import settings
+    from app.services import email_service as email_module
+
+    pool = make_pool(timeout_seconds=10)
+    monkeypatch.setattr(settings, "PDF_POOL_ENABLED", True)
+    monkeypatch.setattr(email_module, "pdf_pool", pool)
+    monkeypatch.setattr(email_module, "pdf_text_cache", None)
+    service = email_module.EmailService(backend=None)
+
+    text = asyncio.run(service._extract_pdf(PDF, 30))
+    assert text.startswith("Página 00")
+    assert len(text) <= 30
+    assert pool.completed == 1
+
+
+def test_pool_timeout_surfaces_as_invalid_input(make_pool, monkeypatch):
+    from app.config import settings
+    from app.services import email_service as email_module
+
+    pool = make_pool(timeout_seconds=0.3)
+    monkeypatch.setattr(settings, "PDF_POOL_ENABLED", True)
+    monkeypatch.setattr(email_module, "pdf_pool", pool)
+    monkeypatch.setattr(email_module, "pdf_text_cache", None)
+    service = email_module.EmailService(backend=None)
+
+    async def scenario():
+        executor = await pool._ready_executor()
+        executor.submit(time.sleep, 30)
+        await service._extract_pdf(PDF, None)
+
+    # ValueError vira 400 na rota, como qualquer PDF ilegível
+    with pytest.raises(ValueError, match="Tempo limite"):
+        asyncio.run(scenario())
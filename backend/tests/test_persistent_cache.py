@@ -0,0 +1,68 @@
+import json
+import time
+
+from app.utils import persistent_cache
+from app.utils.persistent_cache import PersistentCache
+
+
+def _cache(tmp_path, version="v1", max_bytes=0, ttl_seconds=0):
+    return PersistentCache(str(tmp_path / "cache.db"), version, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+
+
+def test_entries_of_another_version_are_ignored(tmp_path):
+    old = _cache(tmp_path, version="v1")
+    old.set("key", {"categoria": "Produtivo"})
+    new = _cache(tmp_path, version="v2")
+    assert new.get("key") is None
+    new.set("key", {"categoria": "Improdutivo"})
+    # A mesma chave com outra versão substitui a entrada
+    assert new.get("key") == {"categoria": "Improdutivo"}
+    assert old.get("key") is None
+
+
+def test_opening_with_a_new_version_keeps_rows_of_the_old_one(tmp_path):
+    # Deploy gradual: workers com versões diferentes compartilham o banco
+    old = _cache(tmp_path, version="v1")
+    old.set("a", 1)
+    new = _cache(tmp_path, version="v2")
+    new.set("b", 2)
+    assert old.get("a") == 1
+    assert new.get("b") == 2
+    assert len(new) == 2
+
+
+def test_expired_entries_are_not_returned_and_are_swept(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, ttl_seconds=10)
+    now = time.time()
+    monkeypatch.setattr(persistent_cache.time, "time", lambda: now)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    monkeypatch.setattr(persistent_cache.time, "time", lambda: now + 11)
+    assert cache.get("key") is None
+    # A primeira gravação dispara a varredura, que remove a entrada expirada
+    cache._writes = 0
+    cache.set("other", "value")
+    assert len(cache) == 1
+
+
+def test_size_limit_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    value = "x" * 100
+    size = len(json.dumps(value))
+    cache = _cache(tmp_path, max_bytes=size * 3)
+    monkeypatch.setattr(persistent_cache, "EVICTION_CHECK_EVERY", 1)
+    now = time.time()
+    for i, key in enumerate(("a", "b", "c")):
+        monkeypatch.setattr(persistent_cache.time, "time", lambda t=now + i: t)
+        cache.set(key, value)
+
+    # Uma leitura atualiza last_access de "a" depois do intervalo mínimo
+    monkeypatch.setattr(persistent_cache.time, "time", lambda: now + 1000)
+    assert cache.get("a") == value
+    cache.set("d", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("d") == value
+    assert cache.evictions >= 1
+    assert cache.stats()["bytes"] <= size * 3
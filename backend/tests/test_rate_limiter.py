@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from app.services.rate_limiter import AIMDLimiter, TokenBucket
+
+
+def test_aimd_cancel_then_release_keeps_cancelled_error():
+    async def scenario():
+        limiter = AIMDLimiter(initial=1, minimum=1, maximum=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        # release() roda antes do handler de cancelamento e descarta o future
+        limiter.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.in_flight == 0
+        assert not limiter._waiters
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_charges_oversized_reservation_as_debt():
+    bucket = TokenBucket(per_minute=600, burst=10)  # 10 tokens por segundo
+    wait = bucket.reserve(40)
+    assert wait == pytest.approx(3.0, abs=0.01)
+    # A dívida inteira fica registrada: o próximo chamador espera atrás dela
+    assert bucket.reserve(10) == pytest.approx(4.0, abs=0.01)
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.classifier_backend import ClassifierBackend
+from app.services.email_service import EmailService
+from app.utils.single_flight import SingleFlight
+
+EMAIL = "Preciso do status do chamado 123, que está parado desde ontem."
+
+
+class _GatedBackend(ClassifierBackend):
+    """Backend que só responde quando o teste libera a chamada"""
+
+    name = "gated"
+
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def classify(self, content, generate_reply=False, detailed_analysis=False):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        return {"categoria": "Produtivo", "gemini_raw": "Produtivo", "partial_errors": {"nested": ["x"]}}
+
+    def is_available(self):
+        return True
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLE_FLIGHT_ENABLED", True)
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", False)
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    return EmailService(backend=_GatedBackend())
+
+
+def test_concurrent_identical_requests_make_one_backend_call(service):
+    async def scenario():
+        callers = [asyncio.ensure_future(service.process_email_request(text=EMAIL)) for _ in range(5)]
+        await service.backend.started.wait()
+        service.backend.release.set()
+        return await asyncio.gather(*callers)
+
+    results = asyncio.run(scenario())
+    assert service.backend.calls == 1
+    assert service.single_flight.stats() == {"inflight": 0, "leaders": 1, "coalesced": 4}
+    assert all(result["categoria"] == "Produtivo" for result in results)
+
+
+def test_each_caller_gets_its_own_copy(service):
+    async def scenario():
+        callers = [asyncio.ensure_future(service.process_email_request(text=EMAIL)) for _ in range(2)]
+        await service.backend.started.wait()
+        service.backend.release.set()
+        return await asyncio.gather(*callers)
+
+    first, second = asyncio.run(scenario())
+    first["categoria"] = "Improdutivo"
+    first["partial_errors"]["nested"].append("y")
+    assert second["categoria"] == "Produtivo"
+    assert second["partial_errors"] == {"nested": ["x"]}
+
+
+def test_cancelled_leader_does_not_cancel_followers(service):
+    async def scenario():
+        leader = asyncio.ensure_future(service.process_email_request(text=EMAIL))
+        await service.backend.started.wait()
+        follower = asyncio.ensure_future(service.process_email_request(text=EMAIL))
+        await asyncio.sleep(0)
+        leader.cancel()
+        service.backend.release.set()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["categoria"] == "Produtivo"
+    assert service.backend.calls == 1
+    # A execução compartilhada terminou e foi removida (_forget)
+    assert service.single_flight.stats()["inflight"] == 0
+
+
+def test_failure_after_every_caller_gave_up_is_consumed():
+    flight = SingleFlight()
+    errors = []
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend fora do ar")
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda _loop, context: errors.append(context))
+        caller = asyncio.ensure_future(flight.do("key", fail))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert flight.stats()["inflight"] == 0
+    assert errors == []
@@ -0,0 +1,21 @@
+from app.config import settings
+from app.utils.email_preprocessing import preprocess_email
+from app.utils.text import extraction_char_budget, prompt_char_budget
+
+
+def test_extraction_budget_leaves_room_for_head_tail_cut(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_MAX_TOKENS", 100)
+    monkeypatch.setattr(settings, "EXTRACTION_BUDGET_FACTOR", 4)
+    assert extraction_char_budget() == 4 * prompt_char_budget()
+
+    document = "início do pedido. " + "x" * 1500 + " prazo: sexta-feira"
+    extracted = document[:extraction_char_budget()]
+    prepared = preprocess_email(extracted, max_chars=prompt_char_budget(), clean=False)
+    assert prepared["truncated"]
+    assert prepared["text"].endswith("prazo: sexta-feira")
+
+
+def test_extraction_budget_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_MAX_TOKENS", 100)
+    monkeypatch.setattr(settings, "EXTRACTION_BUDGET_FACTOR", 0)
+    assert extraction_char_budget() is None
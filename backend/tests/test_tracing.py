@@ -0,0 +1,128 @@
+import asyncio
+import concurrent.futures
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import create_app
+from app.services.classifier_backend import ClassifierBackend
+from app.services.email_service import email_service
+from app.utils.tracing import Trace, current_trace, detach_trace, record, span, start_trace, traced_callable
+
+_ENTRY = re.compile(r'^[\w-]+(;desc="[^"]*")?;dur=\d+\.\d$')
+
+
+class _QuickBackend(ClassifierBackend):
+    name = "quick"
+
+    async def classify(self, content, generate_reply=False, detailed_analysis=False):
+        with span("gemini", "classify"):
+            await asyncio.sleep(0.01)
+        return {"categoria": "Produtivo", "prioridade": "Alta", "gemini_raw": "Produtivo"}
+
+    def is_available(self):
+        return True
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", True)
+    monkeypatch.setattr(email_service, "backend", _QuickBackend())
+    monkeypatch.setattr(email_service, "circuit_breaker", None)
+    return TestClient(create_app())
+
+
+def _entries(response):
+    return [entry.strip() for entry in response.headers["server-timing"].split(",")]
+
+
+def test_server_timing_lists_each_stage(client):
+    response = client.post("/api/classify", data={"text": "Preciso do status do chamado 123"})
+    assert response.status_code == 200
+    entries = _entries(response)
+    assert all(_ENTRY.match(entry) for entry in entries)
+    names = [entry.split(";")[0] for entry in entries]
+    for name in ("extraction", "preprocess", "gemini", "classification", "serialization"):
+        assert name in names
+    assert names[-1] == "total"
+    assert 'gemini;desc="classify"' in response.headers["server-timing"]
+    assert "timing" not in response.json()
+
+
+def test_debug_timing_adds_spans_to_the_body(client):
+    response = client.post("/api/classify", data={"text": "Preciso do status do chamado 123", "debug": "timing"})
+    timing = response.json()["timing"]
+    spans = timing["spans"]
+    assert [s["start_ms"] for s in spans] == sorted(s["start_ms"] for s in spans)
+    gemini = next(s for s in spans if s["name"] == "gemini")
+    classification = next(s for s in spans if s["name"] == "classification")
+    assert gemini["desc"] == "classify"
+    assert gemini["duration_ms"] >= 10
+    # A chamada ao backend fica dentro da etapa de classificação
+    assert classification["start_ms"] <= gemini["start_ms"]
+    assert classification["duration_ms"] >= gemini["duration_ms"]
+    assert timing["total_ms"] >= classification["duration_ms"]
+    # A serialização só aparece no cabeçalho
+    assert "serialization" not in {s["name"] for s in spans}
+
+
+def test_errors_carry_the_header_too(client):
+    response = client.post("/api/classify", data={"text": "   "})
+    assert response.status_code == 400
+    assert _entries(response)[-1].startswith("total;dur=")
+
+
+def test_header_can_be_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", False)
+    response = client.post("/api/classify", data={"text": "Preciso do status do chamado 123"})
+    assert "server-timing" not in response.headers
+
+
+def test_executor_work_is_recorded_in_the_request_trace():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor, start_trace() as trace:
+        def work():
+            record("gemini", 0.05, "reply")
+            return current_trace()
+
+        assert executor.submit(traced_callable(work)).result() is trace
+    names = [s["name"] for s in trace.spans]
+    assert names == ["executor_wait", "gemini"]
+
+
+def test_traces_do_not_leak_between_requests():
+    async def request(name):
+        with start_trace() as trace:
+            with span(name):
+                await asyncio.sleep(0.01)
+            return trace
+
+    async def scenario():
+        return await asyncio.gather(request("a"), request("b"))
+
+    first, second = asyncio.run(scenario())
+    assert [s["name"] for s in first.spans] == ["a"]
+    assert [s["name"] for s in second.spans] == ["b"]
+
+
+def test_detached_task_does_not_write_to_the_request_trace():
+    async def shared():
+        detach_trace()
+        with span("batch"):
+            pass
+
+    async def scenario():
+        with start_trace() as trace:
+            await asyncio.create_task(shared())
+            return trace
+
+    assert asyncio.run(scenario()).spans == []
+
+
+def test_span_without_trace_is_a_no_op():
+    with span("nada"):
+        record("nada", 1.0)
+    assert current_trace() is None
+    assert Trace().server_timing().startswith("total;dur=")
@@ -0,0 +1,30 @@
+import pytest
+
+from app.utils.webhooks import validate_callback_url
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://0.0.0.0/hook",
+    "ftp://example.com/hook",
+])
+def test_rejects_internal_or_non_http_targets(url):
+    with pytest.raises(ValueError):
+        validate_callback_url(url)
+
+
+def test_public_address_is_accepted():
+    validate_callback_url("https://8.8.8.8/hook")
+
+
+def test_allow_list_restricts_hosts():
+    validate_callback_url("https://hooks.example.com/x", [".example.com"])
+    validate_callback_url("http://10.0.0.5/x", ["10.0.0.5"])
+    with pytest.raises(ValueError):
+        validate_callback_url("https://evil.com/x", [".example.com"])
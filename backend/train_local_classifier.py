@@ -0,0 +1,44 @@
+"""
+Treina o classificador local e grava os pesos em JSON
+
+Uso:
+    python train_local_classifier.py
+    python train_local_classifier.py --data exemplos.jsonl -o modelo.json
+
+Sem argumentos, treina com o conjunto semente e atualiza o modelo que
+acompanha o código (app/data/local_classifier_model.json), carregado pelos
+workers na inicialização em vez de treinar a cada subida. Rode de novo
+sempre que o conjunto semente ou as features mudarem.
+"""
+import argparse
+import json
+import sys
+from typing import Optional
+
+from app.services.local_classifier import DEFAULT_MODEL_PATH, SEED_DATA_PATH, LocalClassifier
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Treina o classificador local e grava os pesos.")
+    parser.add_argument("--data", default=SEED_DATA_PATH, help="Exemplos em JSONL (text, categoria, prioridade)")
+    parser.add_argument("-o", "--output", default=DEFAULT_MODEL_PATH, help="Arquivo JSON de saída")
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+    classifier = LocalClassifier()
+    examples = classifier.load_examples(args.data)
+    classifier.train(examples)
+    classifier.save(args.output)
+    print(json.dumps({
+        "examples": len(examples),
+        "output": args.output,
+        "category_temperature": classifier.category_model.temperature,
+        "priority_temperature": classifier.priority_model.temperature,
+    }, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
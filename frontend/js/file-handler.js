@@ -62,11 +62,11 @@ export class FileHandler {
     }
 
     // Validar tipo de arquivo
-    const allowedTypes = ['.txt', '.pdf'];
+    const allowedTypes = ['.txt', '.pdf', '.eml'];
     const fileExtension = fileName.toLowerCase().substring(fileName.lastIndexOf('.'));
     
     if (!allowedTypes.includes(fileExtension)) {
-      this.ui.showToast("Tipo de arquivo não suportado. Use .txt ou .pdf", TOAST_TYPES.ERROR);
+      this.ui.showToast("Tipo de arquivo não suportado. Use .txt, .pdf ou .eml", TOAST_TYPES.ERROR);
       this.clearFileSelection();
       return;
     }